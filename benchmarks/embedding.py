@@ -0,0 +1,157 @@
+"""Measure the embedding throughput of indexing with more processes.
+
+The issues of a synthetic repository are embedded with each number of worker
+processes, and each embedding batch size, and the documents embedded per
+second are reported against the single process baseline:
+
+.. code-block:: bash
+
+  $ python -m benchmarks.embedding --documents 4000 --parallel 1 --parallel 8
+
+Starting the workers and loading the model in each of them is timed apart
+from the throughput, as it is only paid once per indexing process. The
+embedding model must already be in the fastembed cache.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from benchmarks.fakes import SyntheticRepository
+from benchmarks.pipeline import current_commit
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.embedding import EmbeddingOptions
+from github_search_engine.normalization import TextNormalizer
+
+
+def default_parallel() -> list[int]:
+  """Return 1, 2, 4, ... processes, up to one per CPU."""
+  cpus = os.cpu_count() or 1
+  parallel = [1]
+  while parallel[-1] * 2 < cpus:
+    parallel.append(parallel[-1] * 2)
+  if cpus > 1:
+    parallel.append(cpus)
+  return parallel
+
+
+def make_documents(repository: SyntheticRepository) -> list[str]:
+  """Return the documents embedded for the issues of a repository."""
+  text_normalizer = TextNormalizer()
+  return [
+    text_normalizer.issue_document(*repository.issue_text(number))
+    for number in range(1, repository.issues + 1)
+  ]
+
+
+def benchmark_options(
+  options: EmbeddingOptions, documents: list[str]
+) -> dict[str, Any]:
+  embedding_model = EmbeddingModel(options=options)
+  try:
+    start = time.perf_counter()
+    embedding_model.embed_documents(
+      documents[: embedding_model.documents_per_round]
+    )
+    startup_seconds = time.perf_counter() - start
+
+    # Embed the documents in index batches, as index_repository does.
+    index_batch_size = max(64, embedding_model.documents_per_round)
+    start = time.perf_counter()
+    for batch_start in range(0, len(documents), index_batch_size):
+      embedding_model.embed_documents(
+        documents[batch_start : batch_start + index_batch_size]
+      )
+    seconds = time.perf_counter() - start
+  finally:
+    embedding_model.close()
+
+  return {
+    "batch_size": options.batch_size,
+    "parallel": options.parallel,
+    "threads": options.threads,
+    "startup_seconds": startup_seconds,
+    "seconds": seconds,
+    "documents_per_second": len(documents) / seconds,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--documents", type=int, default=2000)
+  parser.add_argument("--mean-body-length", type=int, default=800)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument(
+    "--parallel",
+    type=int,
+    action="append",
+    help="A number of processes. Default is 1, 2, 4, ... up to the CPUs.",
+  )
+  parser.add_argument(
+    "--batch-size",
+    type=int,
+    action="append",
+    help="An embedding batch size. Default is 64.",
+  )
+  parser.add_argument(
+    "--threads",
+    type=int,
+    help="ONNX Runtime threads per process. Default is ONNX Runtime's.",
+  )
+  parser.add_argument("--output", help="Write the results to this file.")
+  arguments = parser.parse_args()
+
+  repository = SyntheticRepository(
+    issues=arguments.documents,
+    mean_comments=0,
+    mean_body_length=arguments.mean_body_length,
+    seed=arguments.seed,
+  )
+  documents = make_documents(repository)
+
+  configurations = []
+  for batch_size in arguments.batch_size or [64]:
+    for parallel in arguments.parallel or default_parallel():
+      configuration = benchmark_options(
+        EmbeddingOptions(
+          batch_size=batch_size, parallel=parallel, threads=arguments.threads
+        ),
+        documents,
+      )
+      configurations.append(configuration)
+
+  baselines = {
+    configuration["batch_size"]: configuration["documents_per_second"]
+    for configuration in configurations
+    if configuration["parallel"] == 1
+  }
+  for configuration in configurations:
+    baseline = baselines.get(configuration["batch_size"])
+    if baseline:
+      configuration["speedup"] = (
+        configuration["documents_per_second"] / baseline
+      )
+
+  results = {
+    "benchmark": "embedding",
+    "commit": current_commit(),
+    "created_at": datetime.now(timezone.utc).isoformat(),
+    "cpus": os.cpu_count(),
+    "parameters": vars(arguments),
+    "configurations": configurations,
+  }
+  output = json.dumps(results, indent=2) + "\n"
+  if arguments.output:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+  else:
+    sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,547 @@
+"""Local stand-ins for the GitHub REST API and Ollama.
+
+Both servers run in a background thread on a free local port and answer every
+request after a configurable latency, so the benchmarks exercise the real
+clients without any network access.
+"""
+
+import bisect
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+
+BASE_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+ISSUE_INTERVAL = timedelta(minutes=1)
+COMMENT_INTERVAL = timedelta(seconds=1)
+
+VOCABULARY = (
+  "api async authentication build cache callback cli client commit config "
+  "connection crash database debug decode dependency deploy deprecated "
+  "docker documentation download embedding encoding error event exception "
+  "export feature file filter fork format function github gpu hang header "
+  "import index install iterator json kernel latency leak linux lock log "
+  "macos memory merge migration model module network null option package "
+  "parser patch path performance permission plugin pool proxy python query "
+  "queue race regression release request response retry runtime schema "
+  "search segfault serialization server session socket sql ssl stack "
+  "storage stream support sync template test thread timeout token trace "
+  "type unicode update upload url validation version warning windows worker"
+).split()
+
+
+def words(rng: random.Random, length: int) -> str:
+  """Return roughly ``length`` characters of random vocabulary words."""
+  text = []
+  size = 0
+  while size < length:
+    word = rng.choice(VOCABULARY)
+    text.append(word)
+    size += len(word) + 1
+  return " ".join(text)
+
+
+def variable_length(rng: random.Random, mean: int) -> int:
+  """Return a log-normally distributed length with the given mean."""
+  if mean <= 0:
+    return 0
+  sigma = 0.75
+  return int(rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma))
+
+
+def pasted_noise(rng: random.Random) -> str:
+  """Return text pasted into issues which does not describe them.
+
+  Either the instructions and empty sections of an issue template, a long
+  log, a stack trace, an inline screenshot or a dump of the environment.
+  """
+  kind = rng.choice(("template", "log", "stack_trace", "image", "details"))
+  if kind == "template":
+    return (
+      "<!-- Thanks for reporting an issue! Please search the existing issues "
+      "first, fill in every section below and remove the ones which do not "
+      "apply. -->\n\n### Steps to reproduce\n\n_No response_\n\n"
+      "### Additional context\n\n_No response_"
+    )
+  if kind == "log":
+    lines = [
+      f"2024-01-01 10:{minute % 60:02d}:00 {rng.choice(('INFO', 'DEBUG'))} "
+      f"{words(rng, 60)}"
+      for minute in range(rng.randint(20, 200))
+    ]
+    return "```\n" + "\n".join(lines) + "\n```"
+  if kind == "stack_trace":
+    frames = [
+      f'  File "/usr/lib/python3/{rng.choice(VOCABULARY)}.py", line '
+      f"{rng.randint(1, 999)}, in {rng.choice(VOCABULARY)}\n"
+      f"    {words(rng, 40)}"
+      for _ in range(rng.randint(10, 60))
+    ]
+    return "\n".join(
+      ["Traceback (most recent call last):", *frames, "RuntimeError: crash"]
+    )
+  if kind == "image":
+    data = "".join(
+      rng.choice(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+      )
+      for _ in range(rng.randint(2000, 20000))
+    )
+    return f"![screenshot](data:image/png;base64,{data})"
+  packages = [
+    f"{rng.choice(VOCABULARY)}-{rng.choice(VOCABULARY)}==1.{index}.0"
+    for index in range(rng.randint(30, 150))
+  ]
+  return (
+    "<details><summary>Environment</summary>\n\n"
+    + "\n".join(packages)
+    + "\n</details>"
+  )
+
+
+def timestamp(moment: datetime) -> str:
+  return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyntheticRepository:
+  def __init__(
+    self,
+    owner: str = "benchmark",
+    name: str = "repository",
+    issues: int = 1000,
+    mean_comments: float = 3,
+    mean_body_length: int = 800,
+    mean_comment_length: int = 300,
+    noise: float = 0,
+    seed: int = 0,
+    id_offset: int = 0,
+  ):
+    """A deterministic synthetic repository.
+
+    Issues and comments are generated on demand from the seed, so even
+    repositories with 100k issues do not need to be held in memory. Issue
+    ``n`` was last updated ``n`` minutes after ``BASE_TIME``, and comments
+    are updated one second apart in the order they are listed.
+
+    Args:
+        owner: The owner of the repository.
+        name: The name of the repository.
+        issues: The number of issues. Default is 1000.
+        mean_comments: The mean number of comments per issue. Default is 3.
+        mean_body_length: The mean length of an issue body in characters.
+          Default is 800.
+        mean_comment_length: The mean length of a comment in characters.
+          Default is 300.
+        noise: The share of issue bodies and comments followed by pasted
+          text, such as logs or issue template instructions. Default is 0.
+        seed: The seed of the generated content. Default is 0.
+        id_offset: Added to the ids of the issues and comments, which GitHub
+          numbers across every repository. Default is 0.
+    """
+    self.owner = owner
+    self.name = name
+    self.issues = issues
+    self.mean_body_length = mean_body_length
+    self.mean_comment_length = mean_comment_length
+    self.noise = noise
+    self.seed = seed
+    self.id_offset = id_offset
+
+    counts_rng = random.Random(f"{seed}-comments")
+    self._comment_counts = [
+      counts_rng.randint(0, round(2 * mean_comments)) for _ in range(issues)
+    ]
+    # The index of the first comment of each issue, and the total at the end.
+    self._comment_offsets = [0, *itertools.accumulate(self._comment_counts)]
+
+  @property
+  def comments(self) -> int:
+    """The total number of comments."""
+    return self._comment_offsets[-1]
+
+  def issue_text(self, number: int) -> tuple[str, str | None]:
+    """Return the title and the body of an issue."""
+    rng = random.Random(f"{self.seed}-issue-{number}")
+    title = words(rng, rng.randint(20, 60))
+    # One issue in twenty has no description.
+    body = None
+    if rng.random() >= 0.05:
+      body = self._add_noise(
+        words(rng, variable_length(rng, self.mean_body_length)),
+        f"issue-{number}",
+      )
+    return title, body
+
+  def _add_noise(self, text: str, name: str) -> str:
+    # A separate generator keeps the text itself the same with any noise.
+    rng = random.Random(f"{self.seed}-noise-{name}")
+    if rng.random() < self.noise:
+      return f"{text}\n\n{pasted_noise(rng)}"
+    return text
+
+  def issue(self, api_url: str, number: int) -> dict[str, Any]:
+    title, body = self.issue_text(number)
+    updated_at = timestamp(BASE_TIME + number * ISSUE_INTERVAL)
+    url = f"{api_url}/repos/{self.owner}/{self.name}/issues/{number}"
+    issue_id = self.id_offset + number
+    return {
+      "id": issue_id,
+      "node_id": f"I_{issue_id}",
+      "url": url,
+      "repository_url": f"{api_url}/repos/{self.owner}/{self.name}",
+      "labels_url": f"{url}/labels{{/name}}",
+      "comments_url": f"{url}/comments",
+      "events_url": f"{url}/events",
+      "html_url": (
+        f"https://github.com/{self.owner}/{self.name}/issues/{number}"
+      ),
+      "number": number,
+      "state": "open",
+      "title": title,
+      "body": body,
+      "user": None,
+      "labels": [],
+      "assignee": None,
+      "milestone": None,
+      "locked": False,
+      "comments": self._comment_counts[number - 1],
+      "closed_at": None,
+      "created_at": updated_at,
+      "updated_at": updated_at,
+      "author_association": "NONE",
+    }
+
+  def comment(self, api_url: str, index: int) -> dict[str, Any]:
+    number = bisect.bisect_right(self._comment_offsets, index)
+    rng = random.Random(f"{self.seed}-comment-{index}")
+    updated_at = timestamp(BASE_TIME + index * COMMENT_INTERVAL)
+    repository_url = f"{api_url}/repos/{self.owner}/{self.name}"
+    comment_id = self.id_offset + index + 1
+    return {
+      "id": comment_id,
+      "node_id": f"IC_{comment_id}",
+      "url": f"{repository_url}/issues/comments/{comment_id}",
+      "html_url": (
+        f"https://github.com/{self.owner}/{self.name}/issues/{number}"
+        f"#issuecomment-{comment_id}"
+      ),
+      "body": self._add_noise(
+        words(rng, variable_length(rng, self.mean_comment_length)),
+        f"comment-{index}",
+      ),
+      "user": None,
+      "created_at": updated_at,
+      "updated_at": updated_at,
+      "issue_url": f"{repository_url}/issues/{number}",
+      "author_association": "NONE",
+      "reactions": {
+        "url": f"{repository_url}/issues/comments/{comment_id}/reactions",
+        "total_count": rng.randint(0, 5),
+        "+1": 0,
+        "-1": 0,
+        "laugh": 0,
+        "confused": 0,
+        "heart": 0,
+        "hooray": 0,
+        "eyes": 0,
+        "rocket": 0,
+      },
+    }
+
+  def issue_numbers(self, since: datetime | None) -> range:
+    """Return the numbers of the issues updated at or after ``since``."""
+    first = 1
+    if since is not None:
+      first = max(1, math.ceil((since - BASE_TIME) / ISSUE_INTERVAL))
+    return range(first, self.issues + 1)
+
+  def comment_indexes(self, since: datetime | None) -> range:
+    """Return the indexes of the comments updated at or after ``since``."""
+    first = 0
+    if since is not None:
+      first = max(0, math.ceil((since - BASE_TIME) / COMMENT_INTERVAL))
+    return range(first, self.comments)
+
+  def issue_comment_indexes(self, number: int) -> range:
+    """Return the indexes of the comments of an issue."""
+    return range(
+      self._comment_offsets[number - 1], self._comment_offsets[number]
+    )
+
+
+class FakeServer:
+  def __init__(self, latency: float = 0):
+    """A JSON HTTP server running in a background thread.
+
+    Args:
+        latency: The number of seconds to wait before answering each request.
+          Default is 0.
+    """
+    self.latency = latency
+    self.requests = 0
+    self._lock = threading.Lock()
+    fake_server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_GET(self):  # noqa: N802
+        fake_server._respond(self, "GET")
+
+      def do_POST(self):  # noqa: N802
+        fake_server._respond(self, "POST")
+
+      def log_message(self, format, *args):
+        pass
+
+    self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self._server.daemon_threads = True
+    self._thread = threading.Thread(
+      target=self._server.serve_forever, daemon=True
+    )
+
+  @property
+  def url(self) -> str:
+    host, port = self._server.server_address[:2]
+    return f"http://{host}:{port}"
+
+  def __enter__(self):
+    self._thread.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self._server.shutdown()
+    self._server.server_close()
+
+  def handle(
+    self,
+    method: str,
+    path: str,
+    query: dict[str, str],
+    body: Any,
+    headers: Mapping[str, str],
+  ) -> tuple[int, Any] | tuple[int, Any, dict[str, str]]:
+    """Return the status, the JSON body and optionally the headers of the
+    response to a request."""
+    raise NotImplementedError
+
+  def _respond(self, handler: BaseHTTPRequestHandler, method: str):
+    with self._lock:
+      self.requests += 1
+    if self.latency:
+      time.sleep(self.latency)
+
+    url = urlparse(handler.path)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    body = None
+    length = int(handler.headers.get("Content-Length") or 0)
+    if length:
+      body = json.loads(handler.rfile.read(length))
+
+    status, response, *headers = self.handle(
+      method, url.path, query, body, handler.headers
+    )
+    # A 304 Not Modified has no body.
+    content = b"" if status == 304 else json.dumps(response).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(content)))
+    for name, value in (headers[0] if headers else {}).items():
+      handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(content)
+
+
+class FakeGithub(FakeServer):
+  def __init__(
+    self,
+    repository: SyntheticRepository,
+    latency: float = 0,
+    rate_limit: int | None = None,
+    rate_limit_window: float = 60,
+    error_rate: float = 0,
+    seed: int = 0,
+  ):
+    """Serve the issues and comments of a synthetic repository.
+
+    Only the endpoints used by the search engine are implemented, with page
+    based pagination and the ``since`` filter. Responses carry an ETag, and
+    requests sending it back in If-None-Match are answered with a 304 Not
+    Modified, which does not count against the rate limit.
+
+    Args:
+        repository: The repository to serve.
+        latency: The number of seconds to wait before answering each request.
+          Default is 0.
+        rate_limit: The number of requests allowed per token and window,
+          reported in X-RateLimit headers. Default is None, which allows
+          every request without rate limit headers.
+        rate_limit_window: The length of a rate limit window, in seconds.
+          Default is 60.
+        error_rate: The fraction of requests answered with a 502 error.
+          Default is 0.
+        seed: The seed of the errors. Default is 0.
+    """
+    super().__init__(latency)
+    self.repository = repository
+    self.rate_limit = rate_limit
+    self.rate_limit_window = rate_limit_window
+    self.error_rate = error_rate
+    self.rate_limited_requests = 0
+    self.failed_requests = 0
+    self.not_modified_requests = 0
+    self._random = random.Random(seed)
+    # The start of the current window and its requests, by token.
+    self._windows: dict[str, tuple[float, int]] = {}
+
+  def _rate_limit_headers(self, token: str) -> tuple[bool, dict[str, str]]:
+    """Count a request of a token against its rate limit.
+
+    Returns:
+        Whether the request is allowed, and the rate limit headers.
+    """
+    with self._lock:
+      now = time.time()
+      start, used = self._windows.get(token, (now, 0))
+      if now >= start + self.rate_limit_window:
+        start, used = now, 0
+      allowed = used < self.rate_limit
+      if allowed:
+        used += 1
+      else:
+        self.rate_limited_requests += 1
+      self._windows[token] = (start, used)
+    return allowed, {
+      "X-RateLimit-Limit": str(self.rate_limit),
+      "X-RateLimit-Remaining": str(self.rate_limit - used),
+      "X-RateLimit-Reset": str(math.ceil(start + self.rate_limit_window)),
+      "X-RateLimit-Resource": "core",
+    }
+
+  def _refund(self, token: str) -> dict[str, str]:
+    """Give a request back to a token, as GitHub does for a 304 Not Modified.
+
+    Returns:
+        The rate limit headers.
+    """
+    with self._lock:
+      start, used = self._windows[token]
+      self._windows[token] = (start, used - 1)
+    return {
+      "X-RateLimit-Limit": str(self.rate_limit),
+      "X-RateLimit-Remaining": str(self.rate_limit - used + 1),
+      "X-RateLimit-Reset": str(math.ceil(start + self.rate_limit_window)),
+      "X-RateLimit-Resource": "core",
+    }
+
+  def handle(self, method, path, query, body, headers):
+    response_headers = {}
+    if self.rate_limit is not None:
+      allowed, response_headers = self._rate_limit_headers(
+        headers.get("Authorization", "")
+      )
+      if not allowed:
+        return (
+          403,
+          {"message": "API rate limit exceeded for user."},
+          response_headers,
+        )
+    if self.error_rate:
+      with self._lock:
+        failed = self._random.random() < self.error_rate
+        self.failed_requests += failed
+      if failed:
+        return 502, {"message": "Server Error"}, response_headers
+
+    status, response = self._handle(method, path, query)
+    if status == 200:
+      digest = hashlib.sha256(json.dumps(response).encode()).hexdigest()
+      etag = f'"{digest}"'
+      response_headers["ETag"] = etag
+      if headers.get("If-None-Match") == etag:
+        with self._lock:
+          self.not_modified_requests += 1
+        if self.rate_limit is not None:
+          response_headers = {
+            **self._refund(headers.get("Authorization", "")),
+            "ETag": etag,
+          }
+        return 304, None, response_headers
+    return status, response, response_headers
+
+  def _handle(self, method, path, query):
+    prefix = f"/repos/{self.repository.owner}/{self.repository.name}/issues"
+    if method != "GET" or not path.startswith(prefix):
+      return 404, {"message": "Not Found"}
+
+    since = None
+    if "since" in query:
+      # An unescaped "+" of the UTC offset is decoded as a space.
+      since = datetime.fromisoformat(
+        query["since"].replace(" ", "+").replace("Z", "+00:00")
+      )
+    page = int(query.get("page", 1))
+    per_page = int(query.get("per_page", 30))
+    page_slice = slice((page - 1) * per_page, page * per_page)
+
+    parts = path[len(prefix) :].strip("/").split("/")
+    if parts == [""]:
+      numbers = self.repository.issue_numbers(since)[page_slice]
+      return 200, [self.repository.issue(self.url, n) for n in numbers]
+    if parts == ["comments"]:
+      indexes = self.repository.comment_indexes(since)[page_slice]
+      return 200, [self.repository.comment(self.url, i) for i in indexes]
+    if len(parts) == 1 and parts[0].isdigit():
+      number = int(parts[0])
+      if not 1 <= number <= self.repository.issues:
+        return 404, {"message": "Not Found"}
+      return 200, self.repository.issue(self.url, number)
+    if len(parts) == 2 and parts[0].isdigit() and parts[1] == "comments":
+      number = int(parts[0])
+      if not 1 <= number <= self.repository.issues:
+        return 404, {"message": "Not Found"}
+      indexes = self.repository.issue_comment_indexes(number)[page_slice]
+      return 200, [self.repository.comment(self.url, i) for i in indexes]
+    return 404, {"message": "Not Found"}
+
+
+class FakeOllama(FakeServer):
+  def __init__(self, latency: float = 0):
+    """Answer Ollama generate requests with a canned summary.
+
+    Args:
+        latency: The number of seconds to wait before answering each request.
+          Default is 0.
+    """
+    super().__init__(latency)
+    self.prompt_characters = 0
+    # The context window asked for by each request.
+    self.context_sizes: list[int] = []
+
+  def handle(self, method, path, query, body, headers):
+    if method != "POST" or path != "/api/generate":
+      return 404, {"error": "not found"}
+    prompt = body.get("prompt", "")
+    with self._lock:
+      self.prompt_characters += len(prompt)
+      self.context_sizes.append((body.get("options") or {}).get("num_ctx"))
+    return 200, {
+      "model": body.get("model"),
+      "created_at": timestamp(datetime.now(timezone.utc)),
+      "response": f"A summary of a {len(prompt)} character prompt.",
+      "done": True,
+      "done_reason": "stop",
+      "prompt_eval_count": len(prompt) // 4,
+      "eval_count": 16,
+    }
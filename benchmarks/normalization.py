@@ -0,0 +1,121 @@
+"""Measure the tokens and embedding time saved by normalising issue texts.
+
+The issues and comments of a synthetic repository, with pasted logs, stack
+traces, screenshots and issue templates, are embedded and inlined in
+summarisation prompts both as they are and once normalised:
+
+.. code-block:: bash
+
+  $ python -m benchmarks.normalization --issues 2000 --noise 0.3
+
+Tokens are approximated as words and punctuation marks. The embedding model
+must already be in the fastembed cache, unless ``--skip-embedding`` is given.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from benchmarks.fakes import SyntheticRepository
+from benchmarks.pipeline import current_commit
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.normalization import count_tokens
+
+
+def token_summary(
+  raw_texts: list[str], normalized_texts: list[str]
+) -> dict[str, Any]:
+  raw_tokens = sum(map(count_tokens, raw_texts))
+  normalized_tokens = sum(map(count_tokens, normalized_texts))
+  return {
+    "raw_tokens": raw_tokens,
+    "normalized_tokens": normalized_tokens,
+    "tokens_saved": 1 - normalized_tokens / raw_tokens if raw_tokens else 0,
+  }
+
+
+def embedding_seconds(documents: list[str]) -> float:
+  embedding_model = EmbeddingModel()
+  embedding_model.load()
+  start = time.perf_counter()
+  for batch_start in range(0, len(documents), 64):
+    embedding_model.embed_documents(documents[batch_start : batch_start + 64])
+  return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--issues", type=int, default=2000)
+  parser.add_argument("--mean-comments", type=float, default=3)
+  parser.add_argument("--noise", type=float, default=0.3)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--skip-embedding", action="store_true")
+  parser.add_argument("--output", help="Write the results to this file.")
+  arguments = parser.parse_args()
+
+  repository = SyntheticRepository(
+    issues=arguments.issues,
+    mean_comments=arguments.mean_comments,
+    noise=arguments.noise,
+    seed=arguments.seed,
+  )
+  text_normalizer = TextNormalizer()
+  raw_documents = []
+  bodies = []
+  for number in range(1, repository.issues + 1):
+    title, body = repository.issue_text(number)
+    raw_documents.append(f"{title}\n\n{body or ''}")
+    bodies.append(body or "")
+  comments = [
+    repository.comment("", index)["body"]
+    for index in range(repository.comments)
+  ]
+
+  start = time.perf_counter()
+  documents = [
+    text_normalizer.normalize(document, text_normalizer.max_document_tokens)
+    for document in raw_documents
+  ]
+  prompt_texts = [
+    text_normalizer.normalize(text, text_normalizer.max_prompt_tokens)
+    for text in bodies + comments
+  ]
+  normalize_seconds = time.perf_counter() - start
+
+  results = {
+    "benchmark": "normalization",
+    "commit": current_commit(),
+    "created_at": datetime.now(timezone.utc).isoformat(),
+    "parameters": vars(arguments),
+    "normalize_us_per_text": (
+      normalize_seconds / (len(documents) + len(prompt_texts)) * 1e6
+    ),
+    "embedding": token_summary(raw_documents, documents),
+    "summary_prompts": token_summary(bodies + comments, prompt_texts),
+  }
+  if not arguments.skip_embedding:
+    raw_seconds = embedding_seconds(raw_documents)
+    normalized_seconds = embedding_seconds(documents)
+    results["embedding"].update(
+      {
+        "raw_seconds": raw_seconds,
+        "normalized_seconds": normalized_seconds,
+        "speedup": raw_seconds / normalized_seconds,
+      }
+    )
+
+  output = json.dumps(results, indent=2) + "\n"
+  if arguments.output:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+  else:
+    sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,377 @@
+"""Benchmark indexing, searching and summarising against local stand-ins.
+
+A synthetic repository is served by a fake GitHub REST API and summaries are
+generated by a fake Ollama server, both with a configurable latency. Only the
+embedding model runs for real, so it must already be in the fastembed cache:
+
+.. code-block:: bash
+
+  $ python -m benchmarks.pipeline --issues 10000 --output before.json
+  $ python -m benchmarks.pipeline --issues 10000 --compare before.json
+
+The results are written as JSON. With ``--compare``, the headline metrics are
+also compared against a previous result.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from benchmarks.fakes import FakeGithub
+from benchmarks.fakes import FakeOllama
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine import metrics
+from github_search_engine.github_search_engine import DEFAULT_SEARCH_MODE
+from github_search_engine.github_search_engine import SEARCH_MODES
+from github_search_engine.github_search_engine import GithubSearchEngine
+from github_search_engine.github_search_engine import IndexProgress
+
+
+# The metrics compared by --compare, and whether higher values are better.
+HEADLINE_METRICS = {
+  ("index", "issues_per_second"): True,
+  ("index", "seconds"): False,
+  ("index", "reindex_seconds"): False,
+  ("search", "p50_ms"): False,
+  ("search", "p95_ms"): False,
+  ("search", "source_hit_rate"): True,
+  ("summarise", "cold_p50_ms"): False,
+  ("summarise", "warm_p50_ms"): False,
+  ("summarise", "max_context_size"): False,
+  ("peak_rss_mb", "total"): False,
+}
+
+
+# The stages of indexing reported by the benchmark, as timed by the engine.
+INDEX_STAGES = (
+  "store_issues",
+  "embed_documents",
+  "qdrant_upsert",
+  "store_comments",
+)
+
+
+def stage_totals(stages: tuple[str, ...]) -> dict[str, tuple[float, int]]:
+  """Return the seconds spent in, and the calls of, each stage so far."""
+  return {
+    stage: (
+      metrics.STAGE_SECONDS.sum(stage=stage),
+      metrics.STAGE_SECONDS.count(stage=stage),
+    )
+    for stage in stages
+  }
+
+
+def peak_rss_mb() -> float:
+  peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports kilobytes, macOS reports bytes.
+  if sys.platform == "darwin":
+    return peak_rss / 1024**2
+  return peak_rss / 1024
+
+
+def latency_summary(durations: list[float]) -> dict[str, float]:
+  """Return the mean and percentiles of durations given in seconds."""
+  if not durations:
+    return {}
+  milliseconds = [duration * 1000 for duration in durations]
+  if len(milliseconds) == 1:
+    milliseconds *= 2
+  percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+  return {
+    "count": len(durations),
+    "mean_ms": statistics.fmean(milliseconds),
+    "p50_ms": percentiles[49],
+    "p95_ms": percentiles[94],
+    "p99_ms": percentiles[98],
+    "max_ms": max(milliseconds),
+  }
+
+
+def current_commit() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "HEAD"],
+      capture_output=True,
+      text=True,
+      check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def make_queries(
+  repository: SyntheticRepository, count: int, seed: int
+) -> list[tuple[int, str]]:
+  """Return queries built from the titles of random issues.
+
+  Returns:
+      The number of the issue each query was built from, and the query.
+  """
+  rng = random.Random(f"{seed}-queries")
+  queries = []
+  for _ in range(count):
+    number = rng.randint(1, repository.issues)
+    title, _ = repository.issue_text(number)
+    queries.append((number, " ".join(title.split()[:6])))
+  return queries
+
+
+def benchmark_index(
+  search_engine: GithubSearchEngine,
+  repository: SyntheticRepository,
+  github: FakeGithub,
+  batch_size: int,
+) -> dict[str, Any]:
+  start = time.perf_counter()
+  search_engine.load_models()
+  load_model_seconds = time.perf_counter() - start
+
+  progress = IndexProgress()
+  requests = github.requests
+  not_modified_requests = github.not_modified_requests
+  stages_before = stage_totals(INDEX_STAGES)
+  start = time.perf_counter()
+  asyncio.run(
+    search_engine.index_repository(
+      repository.owner,
+      repository.name,
+      batch_size=batch_size,
+      progress=progress,
+    )
+  )
+  seconds = time.perf_counter() - start
+  stages = {"load_model_seconds": load_model_seconds}
+  for stage, (stage_seconds, calls) in stage_totals(INDEX_STAGES).items():
+    seconds_before, calls_before = stages_before[stage]
+    stages[f"{stage}_seconds"] = stage_seconds - seconds_before
+    stages[f"{stage}_calls"] = calls - calls_before
+
+  start = time.perf_counter()
+  asyncio.run(
+    search_engine.index_repository(
+      repository.owner, repository.name, incremental=True
+    )
+  )
+  incremental_seconds = time.perf_counter() - start
+
+  # A full re-index of unchanged issues reuses their cached embeddings.
+  cache_hits = metrics.EMBEDDING_CACHE_REQUESTS.get(result="hit")
+  start = time.perf_counter()
+  asyncio.run(
+    search_engine.index_repository(
+      repository.owner, repository.name, batch_size=batch_size
+    )
+  )
+  reindex_seconds = time.perf_counter() - start
+
+  return {
+    "seconds": seconds,
+    "issues": progress.issues_upserted,
+    "comments": progress.comments_upserted,
+    "issues_per_second": progress.issues_upserted / seconds,
+    "github_requests": github.requests - requests,
+    "github_not_modified_requests": (
+      github.not_modified_requests - not_modified_requests
+    ),
+    "stages": stages,
+    "incremental_noop_seconds": incremental_seconds,
+    "reindex_seconds": reindex_seconds,
+    "reindex_embedding_cache_hits": (
+      metrics.EMBEDDING_CACHE_REQUESTS.get(result="hit") - cache_hits
+    ),
+  }
+
+
+def benchmark_search(
+  search_engine: GithubSearchEngine,
+  repository: SyntheticRepository,
+  queries: list[tuple[int, str]],
+  mode: str,
+) -> tuple[dict[str, Any], list[tuple[str, list]]]:
+  durations = []
+  found = []
+  source_hits = 0
+  for number, query in queries:
+    start = time.perf_counter()
+    results = search_engine.search(
+      repository.owner, repository.name, query, mode=mode
+    )
+    durations.append(time.perf_counter() - start)
+    if results:
+      found.append((query, results))
+    # Issues without a body are never returned.
+    source_hits += any(
+      result.metadata["number"] == number for result in results
+    )
+
+  return {
+    **latency_summary(durations),
+    "mode": mode,
+    "queries_with_results": len(found),
+    "results_per_query": sum(len(results) for _, results in found)
+    / max(len(queries), 1),
+    "source_hit_rate": source_hits / max(len(queries), 1),
+  }, found
+
+
+def benchmark_summarise(
+  search_engine: GithubSearchEngine,
+  repository: SyntheticRepository,
+  ollama: FakeOllama,
+  searches: list[tuple[str, list]],
+) -> dict[str, Any]:
+  requests = ollama.requests
+  prompt_characters = ollama.prompt_characters
+  context_sizes = len(ollama.context_sizes)
+  durations = {"cold": [], "warm": []}
+  for query, results in searches:
+    for run in ("cold", "warm"):
+      start = time.perf_counter()
+      search_engine.summarise_results(
+        results, repository.owner, repository.name, query
+      )
+      durations[run].append(time.perf_counter() - start)
+
+  cold = latency_summary(durations["cold"])
+  warm = latency_summary(durations["warm"])
+  return {
+    "count": len(searches),
+    "cold_p50_ms": cold.get("p50_ms"),
+    "cold_p95_ms": cold.get("p95_ms"),
+    "warm_p50_ms": warm.get("p50_ms"),
+    "warm_p95_ms": warm.get("p95_ms"),
+    "ollama_requests": ollama.requests - requests,
+    "prompt_characters": ollama.prompt_characters - prompt_characters,
+    "max_context_size": max(
+      ollama.context_sizes[context_sizes:], default=None
+    ),
+    "cache_hit_rate": search_engine.summary_cache.hit_rate,
+  }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> str:
+  """Describe the change of the headline metrics since a baseline."""
+  lines = [f"Compared with {baseline.get('commit') or 'the baseline'}:"]
+  for (section, metric), higher_is_better in HEADLINE_METRICS.items():
+    before = baseline.get(section, {}).get(metric)
+    after = results.get(section, {}).get(metric)
+    if not before or after is None:
+      continue
+    change = (after - before) / before
+    improved = (change > 0) == higher_is_better
+    lines.append(
+      f"  {section}.{metric}: {before:.1f} -> {after:.1f} "
+      f"({change:+.1%}, {'better' if improved else 'worse'})"
+    )
+  return "\n".join(lines) + "\n"
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--issues", type=int, default=1000)
+  parser.add_argument("--mean-comments", type=float, default=3)
+  parser.add_argument("--mean-body-length", type=int, default=800)
+  parser.add_argument("--mean-comment-length", type=int, default=300)
+  parser.add_argument(
+    "--noise",
+    type=float,
+    default=0,
+    help="Share of bodies and comments with pasted logs or templates.",
+  )
+  parser.add_argument("--github-latency-ms", type=float, default=20)
+  parser.add_argument("--ollama-latency-ms", type=float, default=250)
+  parser.add_argument("--searches", type=int, default=100)
+  parser.add_argument("--summaries", type=int, default=5)
+  parser.add_argument("--batch-size", type=int, default=64)
+  parser.add_argument(
+    "--search-mode", choices=SEARCH_MODES, default=DEFAULT_SEARCH_MODE
+  )
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument(
+    "--db-path",
+    help="Qdrant storage path. Default is a temporary directory.",
+  )
+  parser.add_argument("--output", help="Write the results to this file.")
+  parser.add_argument("--compare", help="A previous result to compare to.")
+  arguments = parser.parse_args()
+
+  repository = SyntheticRepository(
+    issues=arguments.issues,
+    mean_comments=arguments.mean_comments,
+    mean_body_length=arguments.mean_body_length,
+    mean_comment_length=arguments.mean_comment_length,
+    noise=arguments.noise,
+    seed=arguments.seed,
+  )
+  queries = make_queries(repository, arguments.searches, arguments.seed)
+
+  with (
+    FakeGithub(repository, arguments.github_latency_ms / 1000) as github,
+    FakeOllama(arguments.ollama_latency_ms / 1000) as ollama,
+    tempfile.TemporaryDirectory() as temporary_directory,
+  ):
+    search_engine = GithubSearchEngine(
+      "benchmark",
+      qdrant_path=arguments.db_path or temporary_directory,
+      github_base_url=github.url,
+      ollama_host=ollama.url,
+    )
+
+    peak_rss = {"start": peak_rss_mb()}
+    index = benchmark_index(
+      search_engine, repository, github, arguments.batch_size
+    )
+    peak_rss["index"] = peak_rss_mb()
+    search, found = benchmark_search(
+      search_engine, repository, queries, arguments.search_mode
+    )
+    peak_rss["search"] = peak_rss_mb()
+    summarise = benchmark_summarise(
+      search_engine, repository, ollama, found[: arguments.summaries]
+    )
+    peak_rss["summarise"] = peak_rss_mb()
+    peak_rss["total"] = peak_rss_mb()
+
+  results = {
+    "benchmark": "pipeline",
+    "commit": current_commit(),
+    "created_at": datetime.now(timezone.utc).isoformat(),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "parameters": vars(arguments),
+    "repository": {
+      "issues": repository.issues,
+      "comments": repository.comments,
+    },
+    "index": index,
+    "search": search,
+    "summarise": summarise,
+    "peak_rss_mb": peak_rss,
+  }
+
+  output = json.dumps(results, indent=2) + "\n"
+  if arguments.output:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+  else:
+    sys.stdout.write(output)
+
+  if arguments.compare:
+    with open(arguments.compare) as file:
+      sys.stderr.write(compare(results, json.load(file)))
+
+
+if __name__ == "__main__":
+  main()
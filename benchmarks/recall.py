@@ -0,0 +1,223 @@
+"""Measure the recall and latency of quantization and HNSW settings.
+
+The issues of a synthetic repository are embedded once, then uploaded to one
+collection per configuration. Each configuration answers the same queries,
+and its results are compared with an exact search of the full precision
+vectors:
+
+.. code-block:: bash
+
+  $ docker run -p 6333:6333 qdrant/qdrant
+  $ python -m benchmarks.recall --issues 20000 --db-location localhost
+
+The local Qdrant modes always search exhaustively and ignore quantization and
+HNSW settings, so this benchmark is only meaningful against a Qdrant server.
+The embedding model must already be in the fastembed cache.
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import SearchParams
+
+from benchmarks.fakes import SyntheticRepository
+from benchmarks.pipeline import current_commit
+from benchmarks.pipeline import latency_summary
+from benchmarks.pipeline import make_queries
+from github_search_engine.collection_options import CollectionOptions
+from github_search_engine.embedding import EmbeddingModel
+
+
+CONFIGURATIONS = {
+  "baseline": CollectionOptions(),
+  "hnsw_ef_32": CollectionOptions(search_ef=32),
+  "hnsw_m_32_ef_256": CollectionOptions(
+    hnsw_m=32, hnsw_ef_construct=256, search_ef=256
+  ),
+  "scalar": CollectionOptions(quantization="scalar"),
+  "scalar_on_disk": CollectionOptions(
+    quantization="scalar", on_disk_vectors=True, on_disk_payload=True
+  ),
+  "scalar_no_rescore": CollectionOptions(quantization="scalar", rescore=False),
+  "binary_oversampling_2": CollectionOptions(
+    quantization="binary", oversampling=2
+  ),
+  "binary_oversampling_4": CollectionOptions(
+    quantization="binary", oversampling=4
+  ),
+}
+
+
+def embed_repository(
+  embedding_model: EmbeddingModel, repository: SyntheticRepository
+) -> list[PointStruct]:
+  """Return one point per issue, embedded like the search engine does."""
+  documents = []
+  for number in range(1, repository.issues + 1):
+    title, body = repository.issue_text(number)
+    documents.append(f"{title}\n{body or ''}")
+  embeddings = embedding_model.embed_documents(documents)
+  return [
+    PointStruct(
+      id=number,
+      vector={embedding_model.vector_name: list(map(float, embedding))},
+      payload={"number": number},
+    )
+    for number, embedding in enumerate(embeddings, start=1)
+  ]
+
+
+def benchmark_configuration(
+  client: QdrantClient,
+  embedding_model: EmbeddingModel,
+  options: CollectionOptions,
+  points: list[PointStruct],
+  query_vectors: list[list[float]],
+  expected: list[set[int]],
+  limit: int,
+) -> dict[str, Any]:
+  collection_name = f"recall_benchmark_{uuid.uuid4().hex}"
+  client.create_collection(
+    collection_name=collection_name,
+    **options.create_collection_arguments(
+      embedding_model.vector_name, embedding_model.vector_params
+    ),
+  )
+  try:
+    start = time.perf_counter()
+    client.upload_points(collection_name, points, wait=True)
+    upload_seconds = time.perf_counter() - start
+
+    durations = []
+    recalls = []
+    for query_vector, expected_ids in zip(query_vectors, expected):
+      start = time.perf_counter()
+      response = client.query_points(
+        collection_name=collection_name,
+        query=query_vector,
+        using=embedding_model.vector_name,
+        limit=limit,
+        search_params=options.search_params(),
+      )
+      durations.append(time.perf_counter() - start)
+      found_ids = {point.id for point in response.points}
+      recalls.append(len(found_ids & expected_ids) / len(expected_ids))
+  finally:
+    client.delete_collection(collection_name)
+
+  return {
+    f"recall_at_{limit}": sum(recalls) / len(recalls),
+    "upload_seconds": upload_seconds,
+    **latency_summary(durations),
+  }
+
+
+def exact_results(
+  client: QdrantClient,
+  embedding_model: EmbeddingModel,
+  points: list[PointStruct],
+  query_vectors: list[list[float]],
+  limit: int,
+) -> list[set[int]]:
+  """Return the ids of the true nearest neighbours of every query."""
+  collection_name = f"recall_benchmark_{uuid.uuid4().hex}"
+  client.create_collection(
+    collection_name=collection_name,
+    vectors_config={
+      embedding_model.vector_name: embedding_model.vector_params
+    },
+  )
+  try:
+    client.upload_points(collection_name, points, wait=True)
+    return [
+      {
+        point.id
+        for point in client.query_points(
+          collection_name=collection_name,
+          query=query_vector,
+          using=embedding_model.vector_name,
+          limit=limit,
+          search_params=SearchParams(exact=True),
+        ).points
+      }
+      for query_vector in query_vectors
+    ]
+  finally:
+    client.delete_collection(collection_name)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--issues", type=int, default=10000)
+  parser.add_argument("--mean-body-length", type=int, default=800)
+  parser.add_argument("--queries", type=int, default=200)
+  parser.add_argument("--limit", type=int, default=10)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument(
+    "--configuration",
+    action="append",
+    choices=sorted(CONFIGURATIONS),
+    help="A configuration to benchmark. Default is every configuration.",
+  )
+  parser.add_argument(
+    "--db-location",
+    default="localhost",
+    help="Location of the Qdrant server. Default is localhost.",
+  )
+  parser.add_argument("--output", help="Write the results to this file.")
+  arguments = parser.parse_args()
+
+  repository = SyntheticRepository(
+    issues=arguments.issues,
+    mean_comments=0,
+    mean_body_length=arguments.mean_body_length,
+    seed=arguments.seed,
+  )
+  embedding_model = EmbeddingModel()
+  points = embed_repository(embedding_model, repository)
+  query_vectors = [
+    list(map(float, embedding_model.embed_query(query)))
+    for _, query in make_queries(repository, arguments.queries, arguments.seed)
+  ]
+
+  client = QdrantClient(location=arguments.db_location)
+  expected = exact_results(
+    client, embedding_model, points, query_vectors, arguments.limit
+  )
+  configurations = {}
+  for name in arguments.configuration or CONFIGURATIONS:
+    configurations[name] = benchmark_configuration(
+      client,
+      embedding_model,
+      CONFIGURATIONS[name],
+      points,
+      query_vectors,
+      expected,
+      arguments.limit,
+    )
+
+  results = {
+    "benchmark": "recall",
+    "commit": current_commit(),
+    "created_at": datetime.now(timezone.utc).isoformat(),
+    "parameters": vars(arguments),
+    "configurations": configurations,
+  }
+  output = json.dumps(results, indent=2) + "\n"
+  if arguments.output:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+  else:
+    sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,191 @@
+"""Measure how fast a search engine is ready from an index snapshot.
+
+A snapshot of a synthetic repository is written with random unit vectors in
+place of embeddings, then imported into an empty index, as a server starting
+from a published snapshot does:
+
+.. code-block:: bash
+
+  $ python -m benchmarks.snapshot --issues 10000
+
+Reading the memory-mapped arrays is timed apart from the whole import, which
+also stores the points in Qdrant. No embedding model is needed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from datetime import timezone
+
+import numpy as np
+from githubkit.versions.v2022_11_28.models import Issue
+from githubkit.versions.v2022_11_28.models import IssueComment
+from qdrant_client.http.models import Record
+
+from benchmarks.fakes import SyntheticRepository
+from benchmarks.pipeline import current_commit
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.github_search_engine import GithubSearchEngine
+from github_search_engine.github_search_engine import comment_payload
+from github_search_engine.github_search_engine import issue_payload
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.snapshot import Snapshot
+from github_search_engine.snapshot import SnapshotWriter
+from github_search_engine.sparse import SparseEncoder
+
+
+API_URL = "https://api.github.com"
+
+
+def write_snapshot(
+  repository: SyntheticRepository, path: str, batch_size: int, seed: int
+):
+  """Write a snapshot of a repository, as exported from a hybrid index."""
+  embedding_model = EmbeddingModel()
+  sparse_encoder = SparseEncoder()
+  text_normalizer = TextNormalizer()
+  dimension = embedding_model.vector_params.size
+  rng = np.random.default_rng(seed)
+  writer = SnapshotWriter(
+    path,
+    dense_vectors={embedding_model.vector_name: dimension},
+    sparse_vectors=[sparse_encoder.vector_name],
+  )
+  for start in range(1, repository.issues + 1, batch_size):
+    numbers = range(start, min(start + batch_size, repository.issues + 1))
+    issues = [
+      Issue.model_validate(repository.issue(API_URL, number))
+      for number in numbers
+    ]
+    vectors = rng.standard_normal((len(issues), dimension), np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    sparse_vectors = sparse_encoder.embed_documents(
+      [
+        text_normalizer.issue_document(issue.title, issue.body)
+        for issue in issues
+      ]
+    )
+    writer.add_points(
+      [
+        Record(
+          id=issue.id,
+          vector={
+            embedding_model.vector_name: vector,
+            sparse_encoder.vector_name: sparse_vector,
+          },
+          payload=issue_payload(issue),
+        )
+        for issue, vector, sparse_vector in zip(
+          issues, vectors.tolist(), sparse_vectors
+        )
+      ]
+    )
+  for start in range(0, repository.comments, batch_size):
+    comments = [
+      IssueComment.model_validate(repository.comment(API_URL, index))
+      for index in range(start, min(start + batch_size, repository.comments))
+    ]
+    writer.add_comments(
+      [
+        Record(id=comment.id, payload=comment_payload(comment))
+        for comment in comments
+      ]
+    )
+  writer.finish(
+    {
+      "repository": f"{repository.owner}/{repository.name}",
+      "embedding_model": embedding_model.model_name,
+      "payload_fields": [],
+      "high_water_marks": {},
+    }
+  )
+
+
+def directory_size_mb(path: str) -> float:
+  return (
+    sum(
+      os.path.getsize(os.path.join(path, file_name))
+      for file_name in os.listdir(path)
+    )
+    / 2**20
+  )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--issues", type=int, default=10000)
+  parser.add_argument("--mean-comments", type=float, default=3)
+  parser.add_argument("--batch-size", type=int, default=256)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument(
+    "--db-location",
+    help='Qdrant URL, or ":memory:". Default is the storage path.',
+  )
+  parser.add_argument(
+    "--db-path",
+    help="Qdrant storage path. Default is a temporary directory.",
+  )
+  parser.add_argument("--output", help="Write the results to this file.")
+  arguments = parser.parse_args()
+
+  repository = SyntheticRepository(
+    issues=arguments.issues,
+    mean_comments=arguments.mean_comments,
+    seed=arguments.seed,
+  )
+  with tempfile.TemporaryDirectory() as temporary_directory:
+    snapshot_path = os.path.join(temporary_directory, "snapshot")
+    write_snapshot(
+      repository, snapshot_path, arguments.batch_size, arguments.seed
+    )
+
+    snapshot = Snapshot(snapshot_path)
+    start = time.perf_counter()
+    for _ in snapshot.iter_points(arguments.batch_size):
+      pass
+    for _ in snapshot.iter_comments(arguments.batch_size):
+      pass
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if arguments.db_location:
+      search_engine = GithubSearchEngine(
+        "benchmark", qdrant_location=arguments.db_location
+      )
+    else:
+      search_engine = GithubSearchEngine(
+        "benchmark",
+        qdrant_path=arguments.db_path
+        or os.path.join(temporary_directory, "db"),
+      )
+    search_engine.import_snapshot(snapshot_path, arguments.batch_size)
+    import_seconds = time.perf_counter() - start
+
+    results = {
+      "benchmark": "snapshot",
+      "commit": current_commit(),
+      "created_at": datetime.now(timezone.utc).isoformat(),
+      "parameters": vars(arguments),
+      "issues": repository.issues,
+      "comments": repository.comments,
+      "snapshot_mb": directory_size_mb(snapshot_path),
+      "read_seconds": read_seconds,
+      "read_issues_per_second": repository.issues / read_seconds,
+      "import_seconds": import_seconds,
+      "issues_per_second": repository.issues / import_seconds,
+    }
+
+  output = json.dumps(results, indent=2) + "\n"
+  if arguments.output:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+  else:
+    sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+  main()
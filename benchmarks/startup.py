@@ -0,0 +1,73 @@
+"""Measure how long the CLI takes to answer without doing any real work.
+
+Each scenario is run in a fresh interpreter, without ``GITHUB_PAT`` set, so
+the numbers include the interpreter startup and every module import:
+
+.. code-block:: bash
+
+  $ python -m benchmarks.startup --runs 20 --threshold-ms 200
+
+The script exits with a non-zero status when the median of a scenario exceeds
+the threshold.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+SCENARIOS = {
+  "help": ["-h"],
+  "search help": ["search", "-h"],
+  "index without token": ["index", "owner", "repository"],
+  "search without token": ["search", "owner", "repository", "query"],
+}
+
+LAUNCHER = "import sys; from github_search_engine.cli import _run; _run()"
+
+
+def time_scenario(arguments: list[str], runs: int) -> list[float]:
+  environment = {
+    key: value for key, value in os.environ.items() if key != "GITHUB_PAT"
+  }
+  durations = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run(
+      [sys.executable, "-c", LAUNCHER, *arguments],
+      env=environment,
+      stdout=subprocess.DEVNULL,
+      stderr=subprocess.DEVNULL,
+      check=False,
+    )
+    durations.append((time.perf_counter() - start) * 1000)
+  return durations
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--runs", type=int, default=10)
+  parser.add_argument("--threshold-ms", type=float, default=200)
+  arguments = parser.parse_args()
+
+  results = {}
+  for name, scenario in SCENARIOS.items():
+    durations = time_scenario(scenario, arguments.runs)
+    results[name] = {
+      "median_ms": statistics.median(durations),
+      "max_ms": max(durations),
+    }
+  sys.stdout.write(json.dumps(results, indent=2) + "\n")
+
+  if any(
+    result["median_ms"] > arguments.threshold_ms for result in results.values()
+  ):
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,45 +1,272 @@
+import asyncio
+import json
 import os
+import time
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated
+from typing import Any
 
+from fastapi import Depends
 from fastapi import FastAPI
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from github_search_engine.github_search_engine import GithubSearchEngine
+from github_search_engine import metrics
+from github_search_engine._api.jobs import IndexJobScheduler
+from github_search_engine._api.webhooks import WebhookQueue
+from github_search_engine._api.webhooks import verify_signature
+from github_search_engine.async_github_search_engine import (
+  AsyncGithubSearchEngine,
+)
+from github_search_engine.github_search_engine import DEFAULT_SEARCH_MODE
+from github_search_engine.github_search_engine import search_result_dict
+from github_search_engine.github_search_engine import validate_payload_fields
+from github_search_engine.search_filter import EXTRA_PAYLOAD_INDEXES
+from github_search_engine.search_filter import ISSUE_PAYLOAD_INDEXES
+from github_search_engine.search_filter import SearchFilter
 
 
-search_engine: GithubSearchEngine | None = None
+search_engine: AsyncGithubSearchEngine | None = None
+job_scheduler: IndexJobScheduler | None = None
+webhook_queue: WebhookQueue | None = None
 
 
 class Repository(BaseModel):
   owner: str
   repository_name: str
+  incremental: bool = False
+  payload_fields: list[str] = []
+
+
+class BatchSearch(BaseModel):
+  owner: str
+  repositories: list[str]
+  queries: list[str]
+  search_filter: dict[str, Any] = {}
+  mode: str = DEFAULT_SEARCH_MODE
+  summarise: bool = False
+
+
+def full_repository_names(owner: str, repositories: list[str]) -> list[str]:
+  # Several repositories, "*" or "other-owner/name" need SHARED_COLLECTION.
+  return [name if "/" in name else f"{owner}/{name}" for name in repositories]
+
+
+def search_filter(
+  state: str | None = None,
+  label: Annotated[list[str] | None, Query()] = None,
+  author: str | None = None,
+  is_pull_request: bool | None = None,
+  created_after: datetime | None = None,
+  created_before: datetime | None = None,
+  updated_after: datetime | None = None,
+  updated_before: datetime | None = None,
+) -> SearchFilter:
+  return SearchFilter(
+    state=state,
+    labels=tuple(label or ()),
+    user=author,
+    is_pull_request=is_pull_request,
+    created_after=created_after,
+    created_before=created_before,
+    updated_after=updated_after,
+    updated_before=updated_before,
+  )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-  global search_engine
+  global search_engine, job_scheduler, webhook_queue
   github_access_token = os.environ["GITHUB_PAT"]
-  search_engine = GithubSearchEngine(
-    github_access_token, qdrant_location=":memory:"
+  search_engine = AsyncGithubSearchEngine(
+    github_access_token,
+    qdrant_location=":memory:",
+    shared_collection=os.environ.get("SHARED_COLLECTION"),
+  )
+  # Replicas start from snapshots rather than re-indexing from GitHub.
+  for snapshot in filter(
+    None, os.environ.get("SNAPSHOTS", "").split(os.pathsep)
+  ):
+    await search_engine.import_snapshot(snapshot)
+  job_scheduler = IndexJobScheduler(
+    search_engine,
+    max_concurrent_jobs=int(os.environ.get("MAX_CONCURRENT_INDEX_JOBS", 2)),
+  )
+  webhook_queue = WebhookQueue(
+    search_engine,
+    delay=float(os.environ.get("WEBHOOK_DEBOUNCE_SECONDS", 2)),
   )
   yield
-  del search_engine
+  await webhook_queue.close()
+  await job_scheduler.close()
+  await search_engine.close()
+  del search_engine, job_scheduler, webhook_queue
 
 
 api = FastAPI(lifespan=lifespan)
 
 
-@api.post("/index")
+@api.middleware("http")
+async def instrument_requests(request: Request, call_next):
+  start = time.perf_counter()
+  with metrics.span(
+    f"{request.method} {request.url.path}",
+    **{"http.method": request.method, "http.target": request.url.path},
+  ):
+    response = await call_next(request)
+  route = request.scope.get("route")
+  metrics.HTTP_REQUEST_SECONDS.observe(
+    time.perf_counter() - start,
+    method=request.method,
+    route=route.path if route is not None else "unmatched",
+    status=response.status_code,
+  )
+  return response
+
+
+@api.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+  return PlainTextResponse(
+    metrics.REGISTRY.render(),
+    media_type="text/plain; version=0.0.4",
+  )
+
+
+@api.get("/rate_limit")
+async def rate_limit():
+  return search_engine.github_rate_limit()
+
+
+@api.post("/index", status_code=202)
 async def index(repository: Repository):
-  await search_engine.index_repository(
+  try:
+    validate_payload_fields(repository.payload_fields)
+  except ValueError as exception:
+    raise HTTPException(status_code=422, detail=str(exception)) from None
+  job = job_scheduler.submit(
     repository.owner,
     repository.repository_name,
+    incremental=repository.incremental,
+    payload_fields=repository.payload_fields,
   )
-  return {"message": "Repository indexed"}
+  return job.to_dict()
+
+
+@api.get("/jobs")
+async def list_jobs():
+  return [job.to_dict() for job in job_scheduler.list_jobs()]
+
+
+@api.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+  job = job_scheduler.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job.to_dict()
+
+
+@api.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+  job = job_scheduler.cancel(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  return job.to_dict()
+
+
+@api.post("/webhooks/github", status_code=202)
+async def github_webhook(
+  request: Request,
+  x_github_event: Annotated[str, Header()],
+  x_hub_signature_256: Annotated[str | None, Header()] = None,
+):
+  secret = os.environ.get("GITHUB_WEBHOOK_SECRET")
+  if not secret:
+    raise HTTPException(status_code=404, detail="Webhooks are not enabled")
+  body = await request.body()
+  if not verify_signature(secret, body, x_hub_signature_256):
+    raise HTTPException(status_code=401, detail="Invalid signature")
+  try:
+    payload = json.loads(body)
+  except ValueError:
+    raise HTTPException(
+      status_code=422, detail="Webhooks must use the JSON content type"
+    ) from None
+  return {"queued": webhook_queue.submit(x_github_event, payload)}
 
 
 @api.get("/search")
-async def search(owner: str, repository: str, query: str):
-  results = search_engine.search(owner, repository, query)
-  summary = search_engine.summarise_results(results, owner, repository, query)
+async def search(
+  owner: str,
+  repository: Annotated[list[str], Query()],
+  query: str,
+  filter_: Annotated[SearchFilter, Depends(search_filter)],
+  mode: str = DEFAULT_SEARCH_MODE,
+):
+  repositories = full_repository_names(owner, repository)
+  try:
+    results = await search_engine.search_repositories(
+      repositories, query, search_filter=filter_, mode=mode
+    )
+  except ValueError as exception:
+    raise HTTPException(status_code=422, detail=str(exception)) from None
+  # The repository may belong to another owner, as "other-owner/name".
+  owner, repository_name = repositories[0].split("/", 1)
+  summary = await search_engine.summarise_results(
+    results, owner, repository_name, query
+  )
   return summary
+
+
+@api.post("/search/batch")
+async def search_batch(batch: BatchSearch):
+  repositories = full_repository_names(batch.owner, batch.repositories)
+  try:
+    batch_results = await search_engine.search_batch(
+      repositories,
+      batch.queries,
+      search_filter=SearchFilter.from_dict(batch.search_filter),
+      mode=batch.mode,
+    )
+  except (TypeError, ValueError) as exception:
+    raise HTTPException(status_code=422, detail=str(exception)) from None
+
+  responses = [
+    {
+      "query": query,
+      "results": [search_result_dict(result) for result in results],
+    }
+    for query, results in zip(batch.queries, batch_results)
+  ]
+  if batch.summarise:
+    owner, repository_name = repositories[0].split("/", 1)
+    summaries = await asyncio.gather(
+      *(
+        search_engine.summarise_results(results, owner, repository_name, query)
+        for query, results in zip(batch.queries, batch_results)
+      )
+    )
+    for response, results, summary in zip(responses, batch_results, summaries):
+      response["summary"] = summary if results else None
+  return responses
+
+
+@api.get("/facets")
+async def facets(
+  owner: str,
+  repository: str,
+  field: str,
+  filter_: Annotated[SearchFilter, Depends(search_filter)],
+  limit: int = 10,
+):
+  if field not in {*ISSUE_PAYLOAD_INDEXES, *EXTRA_PAYLOAD_INDEXES}:
+    raise HTTPException(
+      status_code=422, detail=f"{field} is not an indexed payload field"
+    )
+  return await search_engine.facet(
+    owner, repository, field, search_filter=filter_, limit=limit
+  )
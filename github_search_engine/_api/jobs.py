@@ -0,0 +1,207 @@
+import asyncio
+import dataclasses
+import enum
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from github_search_engine.async_github_search_engine import (
+  AsyncGithubSearchEngine,
+)
+from github_search_engine.github_search_engine import IndexProgress
+
+
+class JobStatus(str, enum.Enum):
+  QUEUED = "queued"
+  RUNNING = "running"
+  SUCCEEDED = "succeeded"
+  FAILED = "failed"
+  CANCELLED = "cancelled"
+
+
+@dataclasses.dataclass
+class IndexJob:
+  """A request to index a repository, run in the background.
+
+  Attributes:
+      id: The unique id of the job.
+      owner: The owner of the repository.
+      repository_name: The name of the repository.
+      incremental: Whether only updated issues are indexed.
+      payload_fields: The optional fields stored with the issues.
+      status: The status of the job.
+      progress: The progress of the indexing run.
+      error: The error which made the job fail, if any.
+      created_at: The time the job was submitted, as a UNIX timestamp.
+  """
+
+  id: str
+  owner: str
+  repository_name: str
+  incremental: bool
+  payload_fields: list[str] = dataclasses.field(default_factory=list)
+  status: JobStatus = JobStatus.QUEUED
+  progress: IndexProgress = dataclasses.field(default_factory=IndexProgress)
+  error: str | None = None
+  created_at: float = dataclasses.field(default_factory=time.time)
+  task: asyncio.Task | None = dataclasses.field(default=None, repr=False)
+
+  @property
+  def repository(self) -> str:
+    """The full name of the repository."""
+    return f"{self.owner}/{self.repository_name}"
+
+  @property
+  def is_active(self) -> bool:
+    """Whether the job is queued or running."""
+    return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+  def to_dict(self) -> dict[str, Any]:
+    """Return a JSON serialisable view of the job."""
+    return {
+      "id": self.id,
+      "owner": self.owner,
+      "repository_name": self.repository_name,
+      "incremental": self.incremental,
+      "payload_fields": self.payload_fields,
+      "status": self.status.value,
+      "progress": self.progress.to_dict(),
+      "error": self.error,
+      "created_at": self.created_at,
+    }
+
+
+class IndexJobScheduler:
+  def __init__(
+    self,
+    search_engine: AsyncGithubSearchEngine,
+    max_concurrent_jobs: int = 2,
+    max_finished_jobs: int = 1000,
+  ):
+    """Run indexing jobs in the background of the API.
+
+    At most ``max_concurrent_jobs`` jobs run at once, the others wait in
+    submission order. Submitting a repository which already has a queued or
+    running job returns the existing job instead of indexing it twice.
+
+    Args:
+        search_engine: The search engine indexing the repositories.
+        max_concurrent_jobs: The maximum number of jobs running at once.
+          Default is 2.
+        max_finished_jobs: The number of finished jobs kept for status
+          requests. Default is 1000.
+    """
+    self._search_engine = search_engine
+    self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+    self._max_finished_jobs = max_finished_jobs
+    self._jobs: OrderedDict[str, IndexJob] = OrderedDict()
+    self._active_jobs: dict[str, IndexJob] = {}
+
+  def submit(
+    self,
+    owner: str,
+    repository_name: str,
+    incremental: bool = False,
+    payload_fields: list[str] | None = None,
+  ) -> IndexJob:
+    """Schedule the indexing of a repository.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        incremental: Only index the issues updated since the last run. Default
+          is False.
+        payload_fields: The optional fields stored with the issues. Default is
+          None, which stores none.
+
+    Returns:
+        The scheduled job, or the active job of the repository if there is
+        one.
+    """
+    repository = f"{owner}/{repository_name}"
+    active_job = self._active_jobs.get(repository)
+    if active_job is not None:
+      return active_job
+
+    job = IndexJob(
+      id=uuid.uuid4().hex,
+      owner=owner,
+      repository_name=repository_name,
+      incremental=incremental,
+      payload_fields=list(payload_fields or []),
+    )
+    self._jobs[job.id] = job
+    self._active_jobs[repository] = job
+    job.task = asyncio.create_task(self._run(job))
+    job.task.add_done_callback(lambda _: self._cancel_unstarted_job(job))
+    self._forget_finished_jobs()
+    return job
+
+  def get(self, job_id: str) -> IndexJob | None:
+    """Return a job from its id, or None if it is unknown."""
+    return self._jobs.get(job_id)
+
+  def list_jobs(self) -> list[IndexJob]:
+    """Return every known job, from the oldest to the newest."""
+    return list(self._jobs.values())
+
+  def cancel(self, job_id: str) -> IndexJob | None:
+    """Cancel a queued or running job.
+
+    Issues stored before the cancellation are kept, so an incremental run
+    resumes where the cancelled job stopped.
+
+    Args:
+        job_id: The id of the job.
+
+    Returns:
+        The job, or None if it is unknown.
+    """
+    job = self._jobs.get(job_id)
+    if job is not None and job.is_active and job.task is not None:
+      job.task.cancel()
+    return job
+
+  async def close(self):
+    """Cancel every active job and wait for them to stop."""
+    tasks = [job.task for job in self._active_jobs.values() if job.task]
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  async def _run(self, job: IndexJob):
+    try:
+      async with self._semaphore:
+        job.status = JobStatus.RUNNING
+        job.progress = IndexProgress()
+        await self._search_engine.index_repository(
+          job.owner,
+          job.repository_name,
+          incremental=job.incremental,
+          progress=job.progress,
+          payload_fields=job.payload_fields,
+        )
+      job.status = JobStatus.SUCCEEDED
+    except asyncio.CancelledError:
+      job.status = JobStatus.CANCELLED
+    except Exception as exception:
+      logging.exception(f"Indexing {job.repository} failed")
+      job.status = JobStatus.FAILED
+      job.error = str(exception)
+    finally:
+      job.progress.finished_at = time.monotonic()
+      del self._active_jobs[job.repository]
+
+  def _cancel_unstarted_job(self, job: IndexJob):
+    # A task cancelled before it started never ran the clean-up of _run.
+    if job.is_active:
+      job.status = JobStatus.CANCELLED
+      job.progress.finished_at = time.monotonic()
+      del self._active_jobs[job.repository]
+
+  def _forget_finished_jobs(self):
+    finished_jobs = [job for job in self._jobs.values() if not job.is_active]
+    for job in finished_jobs[: len(finished_jobs) - self._max_finished_jobs]:
+      del self._jobs[job.id]
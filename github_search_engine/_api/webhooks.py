@@ -0,0 +1,250 @@
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import hmac
+import logging
+from typing import Any
+
+from githubkit.versions.v2022_11_28.models import Issue
+from githubkit.versions.v2022_11_28.models import IssueComment
+from pydantic import ValidationError
+
+from github_search_engine import metrics
+from github_search_engine.async_github_search_engine import (
+  AsyncGithubSearchEngine,
+)
+
+
+# Actions removing an issue from its repository.
+DELETING_ISSUE_ACTIONS = {"deleted", "transferred"}
+
+# Actions of pull_request events changing what is indexed. Others, such as
+# pushes of new commits, leave the pull request as it is stored.
+PULL_REQUEST_ACTIONS = {
+  "opened",
+  "edited",
+  "closed",
+  "reopened",
+  "labeled",
+  "unlabeled",
+  "assigned",
+  "unassigned",
+  "milestoned",
+  "demilestoned",
+}
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+  """Check the X-Hub-Signature-256 header of a webhook delivery.
+
+  Args:
+      secret: The secret of the webhook.
+      body: The raw body of the delivery.
+      signature: The value of the header, as "sha256=<hex digest>".
+
+  Returns:
+      Whether the body was signed with the secret.
+  """
+  if not signature or not signature.startswith("sha256="):
+    return False
+  expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+  return hmac.compare_digest(signature.removeprefix("sha256="), expected)
+
+
+@dataclasses.dataclass
+class PendingUpdate:
+  """The changes to an issue waiting to be applied.
+
+  Attributes:
+      owner: The owner of the repository.
+      repository_name: The name of the repository.
+      issue_number: The number of the issue.
+      issue: The latest state of the issue received, or None to fetch it
+        from GitHub.
+      deleted: Whether the issue was removed from the repository.
+      comments: The latest state of each changed comment, or None for the
+        deleted ones, by comment id.
+      due_at: When the update is applied, in event loop time.
+      deadline: The latest time the update can be postponed to, in event loop
+        time.
+      events: The number of events coalesced into the update.
+  """
+
+  owner: str
+  repository_name: str
+  issue_number: int
+  due_at: float
+  deadline: float
+  issue: Issue | None = None
+  deleted: bool = False
+  comments: dict[int, IssueComment | None] = dataclasses.field(
+    default_factory=dict
+  )
+  events: int = 0
+
+
+def _parse(model: type, data: Any) -> Any:
+  # Webhook payloads hold the REST representation of issues and comments,
+  # but fall back to fetching the issue if one ever fails to validate.
+  try:
+    return model.model_validate(data)
+  except ValidationError:
+    logging.warning(f"Could not read the {model.__name__} of a webhook")
+    return None
+
+
+class WebhookQueue:
+  def __init__(
+    self,
+    search_engine: AsyncGithubSearchEngine,
+    delay: float = 2,
+    max_delay: float = 30,
+  ):
+    """Apply GitHub webhook events to the index, coalescing bursts.
+
+    The events of an issue are merged into a single pending update, applied
+    once no new event arrived for ``delay`` seconds, and at most
+    ``max_delay`` seconds after the first one. A busy discussion thus costs
+    one embedding of its issue rather than one per comment. The updates of
+    an issue are applied one after the other, so one started by events
+    received during an update waits for it. Events of repositories which are
+    not indexed are dropped when applied.
+
+    Args:
+        search_engine: The search engine storing the repositories.
+        delay: The number of seconds without events before an update is
+          applied. Default is 2.
+        max_delay: The longest an update is postponed by new events, in
+          seconds. Default is 30.
+    """
+    self._search_engine = search_engine
+    self._delay = delay
+    self._max_delay = max_delay
+    self._pending: dict[tuple[str, int], PendingUpdate] = {}
+    self._tasks: set[asyncio.Task] = set()
+    # The task applying the latest update of each issue.
+    self._applying: dict[tuple[str, int], asyncio.Task] = {}
+    self._closing = asyncio.Event()
+
+  def submit(self, event: str, payload: dict[str, Any]) -> bool:
+    """Queue the changes of a webhook event.
+
+    Args:
+        event: The type of the event, from the X-GitHub-Event header.
+        payload: The JSON payload of the event.
+
+    Returns:
+        Whether the event changes the index. Other events are ignored.
+    """
+    action = payload.get("action")
+    if event in ("issues", "issue_comment"):
+      number = payload["issue"]["number"]
+    elif event == "pull_request" and action in PULL_REQUEST_ACTIONS:
+      number = payload["pull_request"]["number"]
+    else:
+      metrics.WEBHOOK_EVENTS.inc(event=event, result="ignored")
+      return False
+
+    update = self._pending_update(payload["repository"]["full_name"], number)
+    update.events += 1
+    if event == "issues" and action in DELETING_ISSUE_ACTIONS:
+      update.deleted = True
+      update.issue = None
+    elif event in ("issues", "issue_comment"):
+      update.deleted = False
+      update.issue = _parse(Issue, payload["issue"])
+    else:
+      # Pull request payloads lack the id of their issue, which is fetched.
+      update.deleted = False
+      update.issue = None
+    if event == "issue_comment":
+      comment = payload["comment"]
+      if action == "deleted":
+        update.comments[comment["id"]] = None
+      elif (parsed_comment := _parse(IssueComment, comment)) is not None:
+        update.comments[comment["id"]] = parsed_comment
+    metrics.WEBHOOK_EVENTS.inc(event=event, result="queued")
+    return True
+
+  def _pending_update(self, repository: str, number: int) -> PendingUpdate:
+    """Return the pending update of an issue, postponing it by ``delay``."""
+    now = asyncio.get_running_loop().time()
+    key = (repository, number)
+    update = self._pending.get(key)
+    if update is not None:
+      update.due_at = min(now + self._delay, update.deadline)
+      return update
+
+    owner, repository_name = repository.split("/", 1)
+    update = PendingUpdate(
+      owner=owner,
+      repository_name=repository_name,
+      issue_number=number,
+      due_at=now + self._delay,
+      deadline=now + self._max_delay,
+    )
+    self._pending[key] = update
+    task = asyncio.create_task(self._apply_when_due(key, update))
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return update
+
+  @property
+  def pending(self) -> int:
+    """The number of issues waiting to be updated."""
+    return len(self._pending)
+
+  async def _apply_when_due(self, key: tuple[str, int], update: PendingUpdate):
+    loop = asyncio.get_running_loop()
+    # New events move due_at while waiting.
+    while (
+      remaining := update.due_at - loop.time()
+    ) > 0 and not self._closing.is_set():
+      with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(self._closing.wait(), remaining)
+    del self._pending[key]
+    previous = self._applying.get(key)
+    current = asyncio.current_task()
+    self._applying[key] = current
+    try:
+      if previous is not None:
+        # Not gather, which would cancel the previous update along with this
+        # one.
+        await asyncio.wait({previous})
+      await self._apply(update)
+    finally:
+      if self._applying.get(key) is current:
+        del self._applying[key]
+
+  async def _apply(self, update: PendingUpdate):
+    try:
+      if update.deleted:
+        await self._search_engine.delete_issue(
+          update.owner, update.repository_name, update.issue_number
+        )
+      else:
+        await self._search_engine.update_issue(
+          update.owner,
+          update.repository_name,
+          update.issue_number,
+          issue=update.issue,
+          comments=[
+            comment for comment in update.comments.values() if comment
+          ],
+          deleted_comment_ids=[
+            comment_id
+            for comment_id, comment in update.comments.items()
+            if comment is None
+          ],
+        )
+    except Exception:
+      logging.exception(
+        f"Updating issue #{update.issue_number} of {update.owner}/"
+        f"{update.repository_name} from {update.events} webhook events failed"
+      )
+
+  async def close(self):
+    """Apply every pending update right away."""
+    self._closing.set()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,6 +1,18 @@
 from github_search_engine._cli.commands import ApiCommand
+from github_search_engine._cli.commands import ExportCommand
+from github_search_engine._cli.commands import ImportCommand
 from github_search_engine._cli.commands import IndexCommand
+from github_search_engine._cli.commands import MigrateCommand
 from github_search_engine._cli.commands import SearchCommand
+from github_search_engine._cli.commands import ServeCommand
 
 
-__all__ = ["ApiCommand", "IndexCommand", "SearchCommand"]
+__all__ = [
+  "ApiCommand",
+  "ExportCommand",
+  "ImportCommand",
+  "IndexCommand",
+  "MigrateCommand",
+  "SearchCommand",
+  "ServeCommand",
+]
@@ -1,6 +1,18 @@
 from .api_command import ApiCommand
+from .export_command import ExportCommand
+from .import_command import ImportCommand
 from .index_command import IndexCommand
+from .migrate_command import MigrateCommand
 from .search_command import SearchCommand
+from .serve_command import ServeCommand
 
 
-__all__ = ["ApiCommand", "IndexCommand", "SearchCommand"]
+__all__ = [
+  "ApiCommand",
+  "ExportCommand",
+  "ImportCommand",
+  "IndexCommand",
+  "MigrateCommand",
+  "SearchCommand",
+  "ServeCommand",
+]
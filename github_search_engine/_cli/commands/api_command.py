@@ -6,6 +6,8 @@ from cleo.helpers import option
 from cleo.io.inputs.option import Option
 from dotenv import load_dotenv
 
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+
 
 class ApiCommand(Command):
   name = "api"
@@ -36,16 +38,24 @@ class ApiCommand(Command):
       description="EnvFile to load.",
       flag=False,
     ),
+    SHARED_COLLECTION_OPTION,
+    option(
+      "webhook_secret",
+      description=(
+        "Secret of the GitHub webhook sent to /webhooks/github, which keeps "
+        "indexed repositories up to date."
+      ),
+      flag=False,
+    ),
+    option(
+      "snapshot",
+      description="Snapshot written by the export command to load at startup.",
+      flag=False,
+      multiple=True,
+    ),
   ]
 
   def handle(self):
-    try:
-      import uvicorn
-    except ImportError:
-      raise ImportError(
-        "Please install 'api' dependencies with 'pip install github-search-engine[api]'"
-      ) from None
-
     port = self.option("port")
     host = self.option("host")
 
@@ -55,6 +65,15 @@ class ApiCommand(Command):
     if self.option("env_file"):
       load_dotenv(self.option("env_file"))
 
+    if self.option("shared_collection"):
+      os.environ["SHARED_COLLECTION"] = self.option("shared_collection")
+
+    if self.option("webhook_secret"):
+      os.environ["GITHUB_WEBHOOK_SECRET"] = self.option("webhook_secret")
+
+    if self.option("snapshot"):
+      os.environ["SNAPSHOTS"] = os.pathsep.join(self.option("snapshot"))
+
     if os.environ.get("GITHUB_PAT") is None:
       self.line(
         "No Github Access Token provided. Please provide a token via the GITHUB_PAT environment variable or using an envFile.",
@@ -62,4 +81,11 @@ class ApiCommand(Command):
       )
       exit(1)
 
+    try:
+      import uvicorn
+    except ImportError:
+      raise ImportError(
+        "Please install 'api' dependencies with 'pip install github-search-engine[api]'"
+      ) from None
+
     uvicorn.run("github_search_engine._api.api:api", host=host, port=port)
@@ -0,0 +1,66 @@
+import os
+from typing import ClassVar
+
+from cleo.commands.command import Command
+from cleo.helpers import argument
+from cleo.helpers import option
+from cleo.io.inputs.argument import Argument
+from cleo.io.inputs.option import Option
+
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+from github_search_engine._cli.commands.utils import (
+  initialise_github_search_engine,
+)
+
+
+class ExportCommand(Command):
+  name = "export"
+  description = (
+    "Write the index of a repository into a snapshot directory, which the "
+    "import command loads without calling GitHub or embedding anything."
+  )
+  arguments: ClassVar[list[Argument]] = [
+    argument("owner", "Owner of the repository."),
+    argument("repository", "The name of the repository."),
+    argument("path", "The directory of the snapshot, new or empty."),
+  ]
+  options: ClassVar[list[Option]] = [
+    option(
+      "db_path",
+      description="Persist storage to path.",
+      flag=False,
+    ),
+    option(
+      "db_location",
+      description="Qdrant Database location.",
+      flag=False,
+      default=":memory:",
+    ),
+    SHARED_COLLECTION_OPTION,
+  ]
+
+  def handle(self):
+    owner = self.argument("owner")
+    repository = self.argument("repository")
+    path = self.argument("path")
+
+    # Exporting only reads the database, so no GitHub token is required.
+    github_search_engine = initialise_github_search_engine(
+      os.environ.get("GITHUB_PAT"),
+      self.option("db_path"),
+      self.option("db_location"),
+      shared_collection=self.option("shared_collection"),
+    )
+    try:
+      exported_points = github_search_engine.export_snapshot(
+        owner, repository, path
+      )
+    except ValueError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+    finally:
+      github_search_engine.close()
+    self.line(
+      f"Exported {exported_points} issues of {owner}/{repository} to {path}.",
+      style="comment",
+    )
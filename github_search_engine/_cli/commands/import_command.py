@@ -0,0 +1,61 @@
+import os
+from typing import ClassVar
+
+from cleo.commands.command import Command
+from cleo.helpers import argument
+from cleo.helpers import option
+from cleo.io.inputs.argument import Argument
+from cleo.io.inputs.option import Option
+
+from github_search_engine._cli.commands.utils import COLLECTION_OPTIONS
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+from github_search_engine._cli.commands.utils import collection_options
+from github_search_engine._cli.commands.utils import (
+  initialise_github_search_engine,
+)
+
+
+class ImportCommand(Command):
+  name = "import"
+  description = (
+    "Load a snapshot written by the export command. Later index runs only "
+    "fetch what changed since the export."
+  )
+  arguments: ClassVar[list[Argument]] = [
+    argument("path", "The directory of the snapshot."),
+  ]
+  options: ClassVar[list[Option]] = [
+    option(
+      "db_path",
+      description="Persist storage to path.",
+      flag=False,
+    ),
+    option(
+      "db_location",
+      description="Qdrant Database location.",
+      flag=False,
+      default=":memory:",
+    ),
+    SHARED_COLLECTION_OPTION,
+    *COLLECTION_OPTIONS,
+  ]
+
+  def handle(self):
+    path = self.argument("path")
+
+    # Importing only writes the database, so no GitHub token is required.
+    github_search_engine = initialise_github_search_engine(
+      os.environ.get("GITHUB_PAT"),
+      self.option("db_path"),
+      self.option("db_location"),
+      collection_options=collection_options(self),
+      shared_collection=self.option("shared_collection"),
+    )
+    try:
+      repository = github_search_engine.import_snapshot(path)
+    except ValueError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+    finally:
+      github_search_engine.close()
+    self.line(f"Imported {repository} from {path}.", style="comment")
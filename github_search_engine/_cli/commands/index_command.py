@@ -1,4 +1,3 @@
-import asyncio
 import os
 from typing import ClassVar
 
@@ -9,9 +8,20 @@ from cleo.io.inputs.argument import Argument
 from cleo.io.inputs.option import Option
 from dotenv import load_dotenv
 
+from github_search_engine._cli.commands.utils import COLLECTION_OPTIONS
+from github_search_engine._cli.commands.utils import EMBEDDING_OPTIONS
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+from github_search_engine._cli.commands.utils import collection_options
+from github_search_engine._cli.commands.utils import connect_to_daemon
+from github_search_engine._cli.commands.utils import embedding_options
 from github_search_engine._cli.commands.utils import (
   initialise_github_search_engine,
 )
+from github_search_engine._cli.commands.utils import (
+  warn_ignored_daemon_options,
+)
+from github_search_engine.daemon.client import DaemonClient
+from github_search_engine.daemon.client import DaemonError
 
 
 class IndexCommand(Command):
@@ -45,6 +55,33 @@ class IndexCommand(Command):
       flag=False,
       default=":memory:",
     ),
+    option(
+      "socket",
+      description="Path of the Unix socket of a running daemon.",
+      flag=False,
+    ),
+    option(
+      "no_daemon",
+      description="Do not forward the request to a running daemon.",
+      flag=True,
+    ),
+    option(
+      "incremental",
+      "i",
+      description="Only index issues updated since the last run.",
+      flag=True,
+    ),
+    option(
+      "payload_field",
+      description=(
+        "Optional issue field to store, such as labels, state or user."
+      ),
+      flag=False,
+      multiple=True,
+    ),
+    SHARED_COLLECTION_OPTION,
+    *COLLECTION_OPTIONS,
+    *EMBEDDING_OPTIONS,
   ]
 
   def handle(self):
@@ -57,6 +94,17 @@ class IndexCommand(Command):
     if self.option("env_file"):
       load_dotenv(self.option("env_file"))
 
+    if not self.option("no_daemon"):
+      daemon_client = connect_to_daemon(
+        self.option("socket"),
+        self.option("db_path"),
+        self.option("db_location"),
+        self.option("shared_collection"),
+      )
+      if daemon_client is not None:
+        self._index_with_daemon(daemon_client, owner, repository)
+        return
+
     github_access_token = os.environ.get("GITHUB_PAT")
     if github_access_token is None:
       self.line(
@@ -70,15 +118,59 @@ class IndexCommand(Command):
       style="info",
     )
 
+    import asyncio
+
     github_search_engine = initialise_github_search_engine(
       github_access_token,
       self.option("db_path"),
       self.option("db_location"),
+      collection_options(self),
+      self.option("shared_collection"),
+      embedding_options(self),
     )
 
-    asyncio.run(github_search_engine.index_repository(owner, repository))
+    try:
+      asyncio.run(
+        github_search_engine.index_repository(
+          owner,
+          repository,
+          incremental=self.option("incremental"),
+          payload_fields=self.option("payload_field"),
+        )
+      )
+    finally:
+      github_search_engine.close()
 
     self.line(
       f"Successfully indexed {owner}/{repository}.",
       style="comment",
     )
+
+  def _index_with_daemon(
+    self, daemon_client: DaemonClient, owner: str, repository: str
+  ):
+    warn_ignored_daemon_options(
+      self, [*COLLECTION_OPTIONS, *EMBEDDING_OPTIONS]
+    )
+    self.line(
+      f"Indexing {owner}/{repository} with the running daemon.",
+      style="info",
+    )
+    try:
+      progress = daemon_client.request(
+        "index",
+        owner=owner,
+        repository_name=repository,
+        incremental=self.option("incremental"),
+        payload_fields=self.option("payload_field"),
+      )
+    except DaemonError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+
+    self.line(
+      f"Successfully indexed {owner}/{repository} "
+      f"({progress['issues_upserted']} issues, "
+      f"{progress['comments_upserted']} comments).",
+      style="comment",
+    )
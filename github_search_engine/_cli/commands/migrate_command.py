@@ -0,0 +1,124 @@
+import os
+from typing import TYPE_CHECKING
+from typing import ClassVar
+from typing import Optional
+
+from cleo.commands.command import Command
+from cleo.helpers import argument
+from cleo.helpers import option
+from cleo.io.inputs.argument import Argument
+from cleo.io.inputs.option import Option
+
+from github_search_engine._cli.commands.utils import (
+  initialise_github_search_engine,
+)
+
+
+if TYPE_CHECKING:
+  from github_search_engine.github_search_engine import GithubSearchEngine
+
+
+class MigrateCommand(Command):
+  name = "migrate"
+  description = (
+    "Rewrite an index built by an earlier version into the compact payload "
+    "schema, without re-indexing it. With --shared_collection, also copy it "
+    "into the shared collection."
+  )
+  arguments: ClassVar[list[Argument]] = [
+    argument("owner", "Owner of the repository."),
+    argument("repository", "The name of the repository."),
+  ]
+  options: ClassVar[list[Option]] = [
+    option(
+      "db_path",
+      description="Persist storage to path.",
+      flag=False,
+    ),
+    option(
+      "db_location",
+      description="Qdrant Database location.",
+      flag=False,
+      default=":memory:",
+    ),
+    option(
+      "payload_field",
+      description=(
+        "Optional issue field to keep, such as labels, state or user."
+      ),
+      flag=False,
+      multiple=True,
+    ),
+    option(
+      "shared_collection",
+      description="Copy the repository into this shared collection.",
+      flag=False,
+    ),
+    option(
+      "delete",
+      description=(
+        "Delete the collection of the repository once copied into the "
+        "shared collection."
+      ),
+      flag=True,
+    ),
+  ]
+
+  def handle(self):
+    owner = self.argument("owner")
+    repository = self.argument("repository")
+    shared_collection = self.option("shared_collection")
+
+    # Migrating only touches the database, so no GitHub token is required.
+    github_search_engine = initialise_github_search_engine(
+      os.environ.get("GITHUB_PAT"),
+      self.option("db_path"),
+      self.option("db_location"),
+      shared_collection=shared_collection,
+    )
+    try:
+      self._migrate(github_search_engine, owner, repository, shared_collection)
+    finally:
+      github_search_engine.close()
+
+  def _migrate(
+    self,
+    github_search_engine: "GithubSearchEngine",
+    owner: str,
+    repository: str,
+    shared_collection: Optional[str],
+  ):
+    if shared_collection:
+      try:
+        moved_points = github_search_engine.move_to_shared_collection(
+          owner,
+          repository,
+          payload_fields=self.option("payload_field"),
+          delete=self.option("delete"),
+        )
+      except ValueError as exception:
+        self.line(str(exception), style="error")
+        exit(1)
+      self.line(
+        f"Moved {moved_points} issues of {owner}/{repository} into "
+        f"{shared_collection}.",
+        style="comment",
+      )
+      return
+
+    if not github_search_engine.repository_exists(owner, repository):
+      self.line(
+        f"{owner}/{repository} is not indexed in this database.",
+        style="error",
+      )
+      exit(1)
+
+    migrated_points = github_search_engine.migrate_payloads(
+      owner,
+      repository,
+      payload_fields=self.option("payload_field"),
+    )
+    self.line(
+      f"Migrated {migrated_points} issues of {owner}/{repository}.",
+      style="comment",
+    )
@@ -1,16 +1,39 @@
+import json
 import os
+from typing import TYPE_CHECKING
+from typing import Any
 from typing import ClassVar
+from typing import Optional
 
 from cleo.commands.command import Command
 from cleo.helpers import argument
 from cleo.helpers import option
 from cleo.io.inputs.argument import Argument
 from cleo.io.inputs.option import Option
+from cleo.io.outputs.output import Type
 from dotenv import load_dotenv
 
+from github_search_engine._cli.commands.utils import SEARCH_FILTER_OPTIONS
+from github_search_engine._cli.commands.utils import SEARCH_OPTIONS
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+from github_search_engine._cli.commands.utils import collection_options
+from github_search_engine._cli.commands.utils import connect_to_daemon
 from github_search_engine._cli.commands.utils import (
   initialise_github_search_engine,
 )
+from github_search_engine._cli.commands.utils import read_batch_queries
+from github_search_engine._cli.commands.utils import repository_names
+from github_search_engine._cli.commands.utils import search_filter
+from github_search_engine._cli.commands.utils import (
+  warn_ignored_daemon_options,
+)
+from github_search_engine.daemon.client import DaemonClient
+from github_search_engine.daemon.client import DaemonError
+
+
+if TYPE_CHECKING:
+  from github_search_engine.github_search_engine import GithubSearchEngine
+  from github_search_engine.search_filter import SearchFilter
 
 
 class SearchCommand(Command):
@@ -18,8 +41,16 @@ class SearchCommand(Command):
   description = "Search an indexed repository."
   arguments: ClassVar[list[Argument]] = [
     argument("owner", "Owner of the repository."),
-    argument("repository", "The name of the repository."),
-    argument("query", "The query to search for."),
+    argument(
+      "repository",
+      "The name of the repository. Several comma separated names, or * for "
+      "every repository of the owner, need --shared_collection.",
+    ),
+    argument(
+      "query",
+      "The query to search for. Omitted with --batch.",
+      optional=True,
+    ),
   ]
   options: ClassVar[list[Option]] = [
     option(
@@ -45,6 +76,40 @@ class SearchCommand(Command):
       flag=False,
       default=":memory:",
     ),
+    option(
+      "socket",
+      description="Path of the Unix socket of a running daemon.",
+      flag=False,
+    ),
+    option(
+      "no_daemon",
+      description="Do not forward the request to a running daemon.",
+      flag=True,
+    ),
+    option(
+      "mode",
+      description=(
+        "dense searches by meaning, sparse by keywords, hybrid fuses both."
+      ),
+      flag=False,
+      default="dense",
+    ),
+    option(
+      "batch",
+      description=(
+        "Run every query of a JSONL file, or - for stdin, and print the "
+        "results of each as a JSON line."
+      ),
+      flag=False,
+    ),
+    option(
+      "summarise",
+      description="Also summarise the results of each query of a batch.",
+      flag=True,
+    ),
+    SHARED_COLLECTION_OPTION,
+    *SEARCH_OPTIONS,
+    *SEARCH_FILTER_OPTIONS,
   ]
 
   def handle(self):
@@ -58,6 +123,56 @@ class SearchCommand(Command):
     if self.option("env_file"):
       load_dotenv(self.option("env_file"))
 
+    mode = self.option("mode")
+    repositories = repository_names(owner, repository)
+    # A single repository keeps the checks of a plain search.
+    if len(repositories) == 1 and not repositories[0].endswith("/*"):
+      owner, repository = repositories[0].split("/", 1)
+      repositories = None
+    try:
+      filter_ = search_filter(self)
+    except ValueError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+
+    batch = None
+    if self.option("batch") is not None:
+      try:
+        batch = read_batch_queries(self.option("batch"))
+      except (OSError, ValueError) as exception:
+        self.line(str(exception), style="error")
+        exit(1)
+    elif query is None:
+      self.line(
+        "No query provided. Give a query, or a file of queries with --batch.",
+        style="error",
+      )
+      exit(1)
+
+    if not self.option("no_daemon"):
+      daemon_client = connect_to_daemon(
+        self.option("socket"),
+        self.option("db_path"),
+        self.option("db_location"),
+        self.option("shared_collection"),
+      )
+      if daemon_client is not None:
+        warn_ignored_daemon_options(self, SEARCH_OPTIONS)
+      if daemon_client is not None and batch is not None:
+        self._search_batch_with_daemon(
+          daemon_client,
+          repositories or [f"{owner}/{repository}"],
+          batch,
+          filter_,
+          mode,
+        )
+        return
+      if daemon_client is not None:
+        self._search_with_daemon(
+          daemon_client, owner, repository, query, filter_, mode, repositories
+        )
+        return
+
     github_access_token = os.environ.get("GITHUB_PAT")
     if github_access_token is None:
       self.line(
@@ -66,18 +181,84 @@ class SearchCommand(Command):
       )
       exit(1)
 
-    self.line(
-      f"Searching through {owner}/{repository}.",
-      style="info",
-    )
+    if batch is None:
+      self.line(
+        f"Searching through {owner}/{repository}.",
+        style="info",
+      )
 
     github_search_engine = initialise_github_search_engine(
       github_access_token,
       self.option("db_path"),
       self.option("db_location"),
+      collection_options(self),
+      self.option("shared_collection"),
     )
 
-    results = github_search_engine.search(owner, repository, query)
+    try:
+      self._search(
+        github_search_engine,
+        owner,
+        repository,
+        query,
+        batch,
+        filter_,
+        mode,
+        repositories,
+      )
+    finally:
+      github_search_engine.close()
+
+  def _search(
+    self,
+    github_search_engine: "GithubSearchEngine",
+    owner: str,
+    repository: str,
+    query: Optional[str],
+    batch: Optional[list[dict[str, Any]]],
+    filter_: dict[str, Any],
+    mode: str,
+    repositories: Optional[list[str]],
+  ):
+    from github_search_engine.search_filter import SearchFilter
+
+    if batch is not None:
+      if repositories is None and not github_search_engine.repository_exists(
+        owner, repository
+      ):
+        self.line(
+          "DB Collection not found. Try indexing the repository first.",
+          style="error",
+        )
+        exit(1)
+      self._search_batch(
+        github_search_engine,
+        repositories or [f"{owner}/{repository}"],
+        batch,
+        SearchFilter.from_dict(filter_),
+        mode,
+      )
+      return
+
+    try:
+      if repositories is None:
+        results = github_search_engine.search(
+          owner,
+          repository,
+          query,
+          search_filter=SearchFilter.from_dict(filter_),
+          mode=mode,
+        )
+      else:
+        results = github_search_engine.search_repositories(
+          repositories,
+          query,
+          search_filter=SearchFilter.from_dict(filter_),
+          mode=mode,
+        )
+    except ValueError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
 
     if not results:
       self.line("No good results found.", style="comment")
@@ -87,3 +268,95 @@ class SearchCommand(Command):
       results, owner, repository, query
     )
     self.line(summary, style="comment")
+
+  def _search_with_daemon(
+    self,
+    daemon_client: DaemonClient,
+    owner: str,
+    repository: str,
+    query: str,
+    filter_: dict[str, Any],
+    mode: str,
+    repositories: Optional[list[str]],
+  ):
+    self.line(
+      f"Searching through {owner}/{repository} with the running daemon.",
+      style="info",
+    )
+    try:
+      summary = daemon_client.request(
+        "search",
+        owner=owner,
+        repository_name=repository,
+        query=query,
+        search_filter=filter_,
+        mode=mode,
+        repositories=repositories,
+      )
+    except DaemonError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+
+    if summary is None:
+      self.line("No good results found.", style="comment")
+      exit(0)
+    self.line(summary, style="comment")
+
+  def _search_batch(
+    self,
+    github_search_engine: "GithubSearchEngine",
+    repositories: list[str],
+    batch: list[dict[str, Any]],
+    filter_: "SearchFilter",
+    mode: str,
+  ):
+    from github_search_engine.github_search_engine import search_result_dict
+
+    queries = [entry["query"] for entry in batch]
+    try:
+      batch_results = github_search_engine.search_batch(
+        repositories, queries, search_filter=filter_, mode=mode
+      )
+    except ValueError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+
+    owner, repository = repositories[0].split("/", 1)
+    for entry, results in zip(batch, batch_results):
+      response = {
+        **entry,
+        "results": [search_result_dict(result) for result in results],
+      }
+      if self.option("summarise"):
+        response["summary"] = (
+          github_search_engine.summarise_results(
+            results, owner, repository, entry["query"]
+          )
+          if results
+          else None
+        )
+      self.io.write_line(json.dumps(response), type=Type.RAW)
+
+  def _search_batch_with_daemon(
+    self,
+    daemon_client: DaemonClient,
+    repositories: list[str],
+    batch: list[dict[str, Any]],
+    filter_: dict[str, Any],
+    mode: str,
+  ):
+    try:
+      responses = daemon_client.request(
+        "search_batch",
+        repositories=repositories,
+        queries=[entry["query"] for entry in batch],
+        search_filter=filter_,
+        mode=mode,
+        summarise=self.option("summarise"),
+      )
+    except DaemonError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+
+    for entry, response in zip(batch, responses):
+      self.io.write_line(json.dumps({**entry, **response}), type=Type.RAW)
@@ -0,0 +1,106 @@
+import os
+from typing import ClassVar
+
+from cleo.commands.command import Command
+from cleo.helpers import option
+from cleo.io.inputs.option import Option
+from dotenv import load_dotenv
+
+from github_search_engine._cli.commands.utils import COLLECTION_OPTIONS
+from github_search_engine._cli.commands.utils import EMBEDDING_OPTIONS
+from github_search_engine._cli.commands.utils import SEARCH_OPTIONS
+from github_search_engine._cli.commands.utils import SHARED_COLLECTION_OPTION
+from github_search_engine._cli.commands.utils import collection_options
+from github_search_engine._cli.commands.utils import embedding_options
+from github_search_engine._cli.commands.utils import (
+  initialise_github_search_engine,
+)
+from github_search_engine.daemon.client import storage_id
+
+
+class ServeCommand(Command):
+  name = "serve"
+  description = (
+    "Keep a warm search engine running in the background. The search and "
+    "index commands forward their requests to it."
+  )
+  options: ClassVar[list[Option]] = [
+    option(
+      "github_access_token",
+      "g",
+      description="Github Access Token.",
+      flag=False,
+    ),
+    option(
+      "env_file",
+      "e",
+      description="EnvFile to load.",
+      flag=False,
+    ),
+    option(
+      "db_path",
+      description="Persist storage to path.",
+      flag=False,
+    ),
+    option(
+      "db_location",
+      description="Qdrant Database location.",
+      flag=False,
+      default=":memory:",
+    ),
+    option(
+      "socket",
+      description="Path of the Unix socket to listen on.",
+      flag=False,
+    ),
+    SHARED_COLLECTION_OPTION,
+    *COLLECTION_OPTIONS,
+    *EMBEDDING_OPTIONS,
+    *SEARCH_OPTIONS,
+  ]
+
+  def handle(self):
+    if self.option("github_access_token"):
+      os.environ["GITHUB_PAT"] = self.option("github_access_token")
+
+    if self.option("env_file"):
+      load_dotenv(self.option("env_file"))
+
+    github_access_token = os.environ.get("GITHUB_PAT")
+    if github_access_token is None:
+      self.line(
+        "No Github Access Token provided. Please provide a token via the GITHUB_PAT environment variable or using an envFile.",
+        style="error",
+      )
+      exit(1)
+
+    import asyncio
+
+    from github_search_engine.daemon.client import DaemonError
+    from github_search_engine.daemon.server import SearchEngineDaemon
+
+    github_search_engine = initialise_github_search_engine(
+      github_access_token,
+      self.option("db_path"),
+      self.option("db_location"),
+      collection_options(self),
+      self.option("shared_collection"),
+      embedding_options(self),
+    )
+    daemon = SearchEngineDaemon(
+      github_search_engine,
+      storage=storage_id(self.option("db_path"), self.option("db_location")),
+      shared_collection=self.option("shared_collection"),
+      socket_path=self.option("socket"),
+    )
+
+    self.line(f"Serving on {daemon.socket_path}.", style="info")
+    try:
+      asyncio.run(daemon.serve_forever())
+    except DaemonError as exception:
+      self.line(str(exception), style="error")
+      exit(1)
+    except KeyboardInterrupt:
+      self.line("Stopped.", style="comment")
+    finally:
+      github_search_engine.close()
@@ -1,19 +1,401 @@
+from typing import TYPE_CHECKING
+from typing import Any
 from typing import Optional
 
-from github_search_engine.github_search_engine import GithubSearchEngine
+from cleo.helpers import option
+
+from github_search_engine.daemon.client import DaemonClient
+from github_search_engine.daemon.client import storage_id
+
+
+if TYPE_CHECKING:
+  from cleo.commands.command import Command
+  from cleo.io.inputs.option import Option
+
+  from github_search_engine.collection_options import CollectionOptions
+  from github_search_engine.embedding import EmbeddingOptions
+  from github_search_engine.github_search_engine import GithubSearchEngine
+
+
+# Options of the commands creating collections.
+COLLECTION_OPTIONS: list["Option"] = [
+  option(
+    "quantization",
+    description="Quantize the vectors of new collections: scalar or binary.",
+    flag=False,
+  ),
+  option(
+    "on_disk",
+    description="Keep the original vectors of new collections on disk.",
+    flag=True,
+  ),
+  option(
+    "on_disk_payload",
+    description="Keep the payloads of new collections on disk.",
+    flag=True,
+  ),
+  option(
+    "hnsw_m",
+    description="Edges per node of the HNSW graph of new collections.",
+    flag=False,
+  ),
+  option(
+    "hnsw_ef_construct",
+    description="Candidates considered while building the HNSW graph.",
+    flag=False,
+  ),
+]
+
+# Options of the commands embedding issues.
+EMBEDDING_OPTIONS: list["Option"] = [
+  option(
+    "embedding_batch_size",
+    description="Issues embedded in one run of the model. Default is 64.",
+    flag=False,
+  ),
+  option(
+    "embedding_parallel",
+    description=(
+      "Worker processes embedding issues, 0 for one per CPU. Default is 1."
+    ),
+    flag=False,
+  ),
+  option(
+    "embedding_threads",
+    description="ONNX Runtime threads of each embedding process.",
+    flag=False,
+  ),
+]
+
+# Option of the commands storing every repository in one collection.
+SHARED_COLLECTION_OPTION: "Option" = option(
+  "shared_collection",
+  description=(
+    "Store every repository in this collection, so that several "
+    "repositories can be searched at once."
+  ),
+  flag=False,
+)
+
+# Options of the commands searching collections.
+SEARCH_OPTIONS: list["Option"] = [
+  option(
+    "hnsw_ef",
+    description="Candidates considered while searching the HNSW graph.",
+    flag=False,
+  ),
+  option(
+    "oversampling",
+    description="Candidates fetched with quantized vectors per result.",
+    flag=False,
+  ),
+  option(
+    "no_rescore",
+    description="Do not rescore quantized results with the original vectors.",
+    flag=True,
+  ),
+]
+
+# Options of the commands filtering search results.
+SEARCH_FILTER_OPTIONS: list["Option"] = [
+  option(
+    "state",
+    description="Only issues in this state. Needs --payload_field state.",
+    flag=False,
+  ),
+  option(
+    "label",
+    description=(
+      "Only issues with one of these labels. Needs --payload_field labels."
+    ),
+    flag=False,
+    multiple=True,
+  ),
+  option(
+    "author",
+    description="Only issues opened by this login. Needs --payload_field user.",
+    flag=False,
+  ),
+  option(
+    "type",
+    description=(
+      "Only issues or pull_requests. Needs --payload_field is_pull_request."
+    ),
+    flag=False,
+  ),
+  option(
+    "created_after",
+    description=(
+      "Only issues created since this ISO date. Needs --payload_field "
+      "created_at."
+    ),
+    flag=False,
+  ),
+  option(
+    "created_before",
+    description=(
+      "Only issues created before this ISO date. Needs --payload_field "
+      "created_at."
+    ),
+    flag=False,
+  ),
+  option(
+    "updated_after",
+    description="Only issues updated since this ISO date.",
+    flag=False,
+  ),
+  option(
+    "updated_before",
+    description="Only issues updated before this ISO date.",
+    flag=False,
+  ),
+]
+
+ISSUE_TYPES = {"issues": False, "pull_requests": True}
+
+
+def _option(command: "Command", name: str):
+  if not command.definition.has_option(name):
+    return None
+  return command.option(name)
+
+
+def _optional_option(command: "Command", name: str, type_=int):
+  value = _option(command, name)
+  return None if value is None else type_(value)
+
+
+def collection_options(command: "Command") -> "CollectionOptions":
+  """Return the collection options given to a command.
+
+  Args:
+      command: A command declaring some of ``COLLECTION_OPTIONS`` and
+        ``SEARCH_OPTIONS``.
+
+  Returns:
+      The collection options, with Qdrant's defaults for the missing options.
+  """
+  from github_search_engine.collection_options import CollectionOptions
+
+  return CollectionOptions(
+    quantization=_option(command, "quantization"),
+    on_disk_vectors=bool(_option(command, "on_disk")),
+    on_disk_payload=bool(_option(command, "on_disk_payload")),
+    hnsw_m=_optional_option(command, "hnsw_m"),
+    hnsw_ef_construct=_optional_option(command, "hnsw_ef_construct"),
+    search_ef=_optional_option(command, "hnsw_ef"),
+    oversampling=_optional_option(command, "oversampling", float),
+    rescore=not _option(command, "no_rescore"),
+  )
+
+
+def embedding_options(command: "Command") -> "EmbeddingOptions":
+  """Return the embedding options given to a command.
+
+  Args:
+      command: A command declaring ``EMBEDDING_OPTIONS``.
+
+  Returns:
+      The embedding options, with the defaults for the missing options.
+
+  Raises:
+      ValueError: If an option is out of range.
+  """
+  from github_search_engine.embedding import EmbeddingOptions
+
+  defaults = EmbeddingOptions()
+  batch_size = _optional_option(command, "embedding_batch_size")
+  parallel = _optional_option(command, "embedding_parallel")
+  return EmbeddingOptions(
+    batch_size=defaults.batch_size if batch_size is None else batch_size,
+    parallel=defaults.parallel if parallel is None else parallel,
+    threads=_optional_option(command, "embedding_threads"),
+  )
+
+
+def warn_ignored_daemon_options(command: "Command", options: list["Option"]):
+  """Warn about the options given to a command which a daemon ignores.
+
+  A running daemon indexes and searches with the settings it was started
+  with, so these options only apply along with ``--no_daemon``.
+
+  Args:
+      command: A command about to forward its request to a daemon.
+      options: The options of the command which are not forwarded.
+  """
+  ignored = [
+    f"--{option.name}"
+    for option in options
+    if _option(command, option.name) not in (None, False)
+  ]
+  if ignored:
+    command.line_error(
+      f"The running daemon uses its own settings, ignoring "
+      f"{', '.join(ignored)}. Pass --no_daemon to apply them.",
+      style="comment",
+    )
+
+
+def repository_names(owner: str, repositories: str) -> list[str]:
+  """Return the full names of the repositories given to a command.
+
+  Args:
+      owner: The owner of the repositories.
+      repositories: Comma separated repository names. A name containing a
+        slash is already a full name, and "*" stands for every repository of
+        the owner.
+
+  Returns:
+      The full names of the repositories, as "owner/name".
+  """
+  return [
+    name if "/" in name else f"{owner}/{name}"
+    for name in (name.strip() for name in repositories.split(","))
+    if name
+  ]
+
+
+def read_batch_queries(path: str) -> list[dict[str, Any]]:
+  """Read the queries of a batch search from a JSONL file.
+
+  Each line is either a JSON string, the query itself, or a JSON object with
+  a "query" and any other fields, such as an id, which are copied into the
+  results of the query. Blank lines are skipped.
+
+  Args:
+      path: The path of the file, or "-" for the standard input.
+
+  Returns:
+      One object with a "query" per query.
+
+  Raises:
+      ValueError: If a line is not a query.
+  """
+  import json
+  import sys
+
+  if path == "-":
+    lines = sys.stdin.read().splitlines()
+  else:
+    with open(path) as file:
+      lines = file.read().splitlines()
+
+  queries = []
+  for number, line in enumerate(lines, start=1):
+    if not line.strip():
+      continue
+    try:
+      entry = json.loads(line)
+    except ValueError:
+      raise ValueError(f"Line {number} of {path} is not valid JSON.") from None
+    if isinstance(entry, str):
+      entry = {"query": entry}
+    if not isinstance(entry, dict) or not isinstance(entry.get("query"), str):
+      raise ValueError(f"Line {number} of {path} has no query.")
+    queries.append(entry)
+  return queries
+
+
+def search_filter(command: "Command") -> dict[str, Any]:
+  """Return the search filter given to a command.
+
+  The filter is returned in the JSON form of ``SearchFilter.to_dict``, which
+  can be sent to a daemon without importing Qdrant.
+
+  Args:
+      command: A command declaring ``SEARCH_FILTER_OPTIONS``.
+
+  Returns:
+      The criteria of the search filter which are set.
+
+  Raises:
+      ValueError: If the type or a date is invalid.
+  """
+  from datetime import datetime
+
+  issue_type = command.option("type")
+  if issue_type is not None and issue_type not in ISSUE_TYPES:
+    raise ValueError(
+      f"Unknown type: {issue_type}. Available types are: "
+      f"{', '.join(ISSUE_TYPES)}."
+    )
+
+  def date(name: str) -> Optional[str]:
+    value = command.option(name)
+    return None if value is None else datetime.fromisoformat(value).isoformat()
+
+  criteria = {
+    "state": command.option("state"),
+    "labels": command.option("label"),
+    "user": command.option("author"),
+    "is_pull_request": ISSUE_TYPES.get(issue_type),
+    "created_after": date("created_after"),
+    "created_before": date("created_before"),
+    "updated_after": date("updated_after"),
+    "updated_before": date("updated_before"),
+  }
+  return {
+    name: value for name, value in criteria.items() if value not in (None, [])
+  }
 
 
 def initialise_github_search_engine(
-  github_access_token: str, db_path: Optional[str], db_location: str
-):
+  github_access_token: str,
+  db_path: Optional[str],
+  db_location: str,
+  collection_options: Optional["CollectionOptions"] = None,
+  shared_collection: Optional[str] = None,
+  embedding_options: Optional["EmbeddingOptions"] = None,
+) -> "GithubSearchEngine":
+  # The engine pulls in Qdrant and ONNX Runtime, which take seconds to import,
+  # so it is only imported once a command actually needs it.
+  from github_search_engine.github_search_engine import GithubSearchEngine
+
   if not db_path:
     github_search_engine = GithubSearchEngine(
       github_access_token,
       qdrant_location=db_location,
+      collection_options=collection_options,
+      shared_collection=shared_collection,
+      embedding_options=embedding_options,
     )
   else:
     github_search_engine = GithubSearchEngine(
       github_access_token,
       qdrant_path=db_path,
+      collection_options=collection_options,
+      shared_collection=shared_collection,
+      embedding_options=embedding_options,
     )
   return github_search_engine
+
+
+def connect_to_daemon(
+  socket_path: Optional[str],
+  db_path: Optional[str],
+  db_location: str,
+  shared_collection: Optional[str] = None,
+) -> Optional[DaemonClient]:
+  """Return a client for a daemon serving the storage of the command.
+
+  Args:
+      socket_path: The path to the socket of the daemon, or None for the
+        default path.
+      db_path: The ``db_path`` option of the command.
+      db_location: The ``db_location`` option of the command.
+      shared_collection: The ``shared_collection`` option of the command.
+        Default is None.
+
+  Returns:
+      A client for the daemon, or None if no daemon serves this storage with
+      the same shared collection.
+  """
+  daemon_client = DaemonClient(socket_path)
+  status = daemon_client.ping()
+  if (
+    status is None
+    or status["storage"] != storage_id(db_path, db_location)
+    or status.get("shared_collection") != shared_collection
+  ):
+    return None
+  return daemon_client
@@ -0,0 +1,1594 @@
+import asyncio
+import dataclasses
+import functools
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+
+from githubkit.versions.v2022_11_28.models import Issue
+from githubkit.versions.v2022_11_28.models import IssueComment
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.fastembed_common import QueryResponse
+from qdrant_client.http.models import ExtendedPointId
+from qdrant_client.http.models import FieldCondition
+from qdrant_client.http.models import Filter
+from qdrant_client.http.models import FilterSelector
+from qdrant_client.http.models import MatchValue
+from qdrant_client.http.models import PayloadSchemaType
+from qdrant_client.http.models import PointIdsList
+from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import Record
+
+from github_search_engine import metrics
+from github_search_engine.caches.embedding_cache import EmbeddingCache
+from github_search_engine.caches.http_cache import HttpCache
+from github_search_engine.caches.summary_cache import SummaryCache
+from github_search_engine.clients.github_client_manager import (
+  GithubClientManager,
+)
+from github_search_engine.clients.ollama_client_manager import (
+  OllamaClientManager,
+)
+from github_search_engine.collection_options import CollectionOptions
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.embedding import EmbeddingOptions
+from github_search_engine.github_search_engine import COMMENTS_BATCH_SIZE
+from github_search_engine.github_search_engine import DEFAULT_INDEX_BATCH_SIZE
+from github_search_engine.github_search_engine import (
+  DEFAULT_MAX_PENDING_BATCHES,
+)
+from github_search_engine.github_search_engine import DEFAULT_SEARCH_MODE
+from github_search_engine.github_search_engine import (
+  DEFAULT_SUMMARY_CONCURRENCY,
+)
+from github_search_engine.github_search_engine import EXTRA_PAYLOAD_FIELDS
+from github_search_engine.github_search_engine import INDEX_STATE_COLLECTION
+from github_search_engine.github_search_engine import PAYLOAD_SCHEMA_VERSION
+from github_search_engine.github_search_engine import IndexProgress
+from github_search_engine.github_search_engine import check_snapshot_model
+from github_search_engine.github_search_engine import comment_payload
+from github_search_engine.github_search_engine import comments_collection_name
+from github_search_engine.github_search_engine import fill_snapshot_vectors
+from github_search_engine.github_search_engine import format_summary
+from github_search_engine.github_search_engine import index_state_id
+from github_search_engine.github_search_engine import issue_payload
+from github_search_engine.github_search_engine import migrate_payload_operation
+from github_search_engine.github_search_engine import render_summary_prompt
+from github_search_engine.github_search_engine import search_query_arguments
+from github_search_engine.github_search_engine import search_query_request
+from github_search_engine.github_search_engine import search_results
+from github_search_engine.github_search_engine import stored_issue_document
+from github_search_engine.github_search_engine import stream_batches
+from github_search_engine.github_search_engine import summary_prompt_version
+from github_search_engine.github_search_engine import validate_payload_fields
+from github_search_engine.github_search_engine import validate_search_mode
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.search_filter import TENANT_PAYLOAD_INDEXES
+from github_search_engine.search_filter import SearchFilter
+from github_search_engine.search_filter import payload_indexes
+from github_search_engine.search_filter import tenant_payload
+from github_search_engine.search_filter import validate_repositories
+from github_search_engine.snapshot import Snapshot
+from github_search_engine.snapshot import SnapshotWriter
+from github_search_engine.sparse import SparseEncoder
+
+
+class AsyncGithubSearchEngine:
+  def __init__(
+    self,
+    github_access_token: str,
+    qdrant_location: str | None = None,
+    qdrant_path: str | None = None,
+    summary_cache_size: int = 1024,
+    summary_cache_ttl: float | None = None,
+    github_cache_size: int = 100 * 2**20,
+    embedding_cache_size: int = 100_000,
+    embedding_workers: int = 2,
+    github_base_url: str | None = None,
+    ollama_host: str = "http://localhost:11434",
+    collection_options: CollectionOptions | None = None,
+    shared_collection: str | None = None,
+    embedding_options: EmbeddingOptions | None = None,
+    text_normalizer: TextNormalizer | None = None,
+  ):
+    """An AsyncGithubSearchEngine to search GitHub repositories.
+
+    The engine behind
+    :class:`~github_search_engine.github_search_engine.GithubSearchEngine`,
+    meant to be shared by concurrent requests of an API server. GitHub, Qdrant
+    and Ollama are only accessed through their asynchronous clients, and
+    embedding runs in a pool of worker threads, so no call ever blocks the
+    event loop.
+
+    Args:
+      github_access_token: The GitHub access token for accessing GitHub API.
+        Several comma separated tokens share the requests, each within its
+        own rate limit.
+      qdrant_location: The location of the Qdrant server. Default is None.
+      qdrant_path: The path to the Qdrant database. Default is None. When set,
+        generated summaries are also cached on disk in this directory.
+      summary_cache_size: The number of summaries cached in memory. Default is
+        1024.
+      summary_cache_ttl: The number of seconds a cached summary stays valid.
+        Default is None, which keeps summaries until they are evicted.
+      github_cache_size: The number of bytes of GitHub responses cached and
+        revalidated with conditional requests, which do not count against
+        the rate limit. Default is 100 MiB.
+      embedding_cache_size: The number of issue embeddings cached by content,
+        so re-indexing unchanged issues skips the model. Default is 100 000.
+      embedding_workers: The number of threads embedding documents and
+        queries. Default is 2.
+      github_base_url: The URL of the GitHub REST API. Default is None, which
+        uses https://api.github.com.
+      ollama_host: The URL of the Ollama server. Default is
+        "http://localhost:11434".
+      collection_options: How the collections of repositories are stored and
+        searched, such as quantization and HNSW parameters. Default is None,
+        which uses Qdrant's defaults.
+      shared_collection: Store every repository in this collection, rather
+        than each repository in a collection of its own, so several
+        repositories can be searched in a single query. Default is None.
+      embedding_options: How issues are embedded while indexing, such as the
+        batch size and the number of worker processes. Default is None,
+        which embeds batches of 64 issues in process.
+      text_normalizer: How issue texts are cleaned up and truncated before
+        being embedded or inlined in summarisation prompts. Default is None,
+        which uses the defaults of ``TextNormalizer``.
+    """
+    logging.basicConfig(level=logging.WARNING)
+
+    self._database_client = AsyncQdrantClient(
+      location=qdrant_location,
+      path=qdrant_path,
+    )
+    self._github_client = GithubClientManager(
+      access_token=github_access_token,
+      base_url=github_base_url,
+      http_cache=HttpCache(
+        path=(
+          os.path.join(qdrant_path, "github_cache.sqlite3")
+          if qdrant_path
+          else ":memory:"
+        ),
+        max_size=github_cache_size,
+      ),
+    )
+    self._ollama_client = OllamaClientManager(host=ollama_host)
+    self._collection_options = collection_options or CollectionOptions()
+    self._shared_collection = shared_collection
+    self.summary_cache = SummaryCache(
+      max_size=summary_cache_size,
+      ttl=summary_cache_ttl,
+      path=(
+        os.path.join(qdrant_path, "summary_cache.sqlite3")
+        if qdrant_path
+        else None
+      ),
+    )
+
+    self._embedding_model = EmbeddingModel(
+      options=embedding_options,
+      cache=EmbeddingCache(
+        path=(
+          os.path.join(qdrant_path, "embedding_cache.sqlite3")
+          if qdrant_path
+          else ":memory:"
+        ),
+        max_size=embedding_cache_size,
+      ),
+    )
+    self._sparse_encoder = SparseEncoder()
+    self._text_normalizer = text_normalizer or TextNormalizer()
+    # Whether each collection stores sparse vectors, by collection name.
+    self._sparse_collections: dict[str, bool] = {}
+    self._embedding_executor = ThreadPoolExecutor(
+      max_workers=embedding_workers,
+      thread_name_prefix="embedding",
+    )
+
+  async def close(self):
+    """Release the database connection and the embedding workers."""
+    await self._database_client.close()
+    self._embedding_executor.shutdown()
+    self._embedding_model.close()
+    self._embedding_model.cache.close()
+    self.summary_cache.close()
+    self._github_client.http_cache.close()
+
+  async def load_models(self):
+    """Load the embedding model ahead of its first use.
+
+    Creating the ONNX session takes seconds, so it is otherwise deferred until
+    issues are indexed or searched rather than paid when the engine is
+    created.
+    """
+    await self._run_embedding(self._embedding_model.load)
+
+  def github_rate_limit(self) -> dict[str, Any]:
+    """Return the GitHub rate limit of the access tokens.
+
+    Returns:
+        The requests left and allowed per window across the tokens, as last
+        reported by GitHub, and the rate limit of each token.
+    """
+    return self._github_client.rate_limit()
+
+  async def _run_embedding(self, function, *args, **kwargs):
+    """Run a blocking embedding function in the embedding worker pool."""
+    return await asyncio.get_running_loop().run_in_executor(
+      self._embedding_executor,
+      functools.partial(function, *args, **kwargs),
+    )
+
+  @metrics.timed("summarise")
+  async def summarise_results(
+    self,
+    results: list[QueryResponse],
+    owner: str,
+    repository_name: str,
+    query: str,
+    max_concurrency: int = DEFAULT_SUMMARY_CONCURRENCY,
+  ) -> str:
+    """Summarizes the content and discussion of GitHub issues concurrently.
+
+    The comments of every issue are read from the index, or fetched from GitHub
+    at once for repositories indexed without comments. The issues are then
+    summarised by the LLM with at most ``max_concurrency`` generations in
+    flight. Summaries are returned in the order of the results.
+
+    Summaries are cached per issue version, query, model and prompt, so
+    repeated searches are answered without fetching comments or calling the
+    LLM.
+
+    Args:
+        results: A list of QueryResponse objects containing GitHub issues to summarize.
+        owner: The owner of the GitHub repository.
+        repository_name: The name of the GitHub repository.
+        query: The original query to relate the issues to.
+        max_concurrency: The maximum number of issues summarised at once.
+          Default is 4.
+
+    Returns:
+        A single string containing the summarized content and discussions of all provided GitHub issues.
+    """
+    logging.info("Summarising issues")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def summarise(issue: QueryResponse) -> str:
+      cache_key = SummaryCache.make_key(
+        issue_id=issue.id,
+        updated_at=issue.metadata.get("updated_at"),
+        query=query,
+        model=self._ollama_client.model,
+        prompt_template=summary_prompt_version(self._text_normalizer),
+      )
+      summary = await self.summary_cache.async_get(cache_key)
+      if summary is None:
+        # Issues of shared collections name their repository.
+        repository = issue.metadata.get(
+          "repository", f"{owner}/{repository_name}"
+        )
+        comments = await self._get_stored_comments(
+          repository, issue.metadata["number"]
+        )
+        if comments is None:
+          # The repository was indexed before comments were stored.
+          issue_owner, issue_repository_name = repository.split("/", 1)
+          comments = [
+            comment_payload(comment)
+            for comment in await self._github_client.async_get_issue_comments(
+              owner=issue_owner,
+              repository_name=issue_repository_name,
+              issue_number=issue.metadata["number"],
+            )
+          ]
+        prompt = render_summary_prompt(
+          issue.metadata, comments, query, self._text_normalizer
+        )
+        async with semaphore:
+          summary = await self._ollama_client.async_chat(prompt)
+        await self.summary_cache.async_set(cache_key, summary)
+
+      return format_summary(issue.metadata, summary)
+
+    summaries = await asyncio.gather(*(summarise(issue) for issue in results))
+    logging.info(
+      f"Summary cache hits: {self.summary_cache.hits}, "
+      f"misses: {self.summary_cache.misses}"
+    )
+    final_summary = "\n\n".join(summaries)
+    logging.info("Done")
+    return final_summary
+
+  async def _get_high_water_mark(
+    self, collection_name: str, field: str = "updated_at"
+  ) -> datetime | None:
+    """Return the most recent update time indexed into a collection.
+
+    Args:
+        collection_name: The name of the collection, or the full name of the
+          repository when it is stored in a shared collection.
+        field: The name of the high-water mark. Default is "updated_at", which
+          tracks issues.
+
+    Returns:
+        The high-water mark of the collection, or None if the collection was
+        never indexed.
+    """
+    if not await self._database_client.collection_exists(
+      INDEX_STATE_COLLECTION
+    ):
+      return None
+    records = await self._database_client.retrieve(
+      collection_name=INDEX_STATE_COLLECTION,
+      ids=[index_state_id(collection_name)],
+    )
+    if not records or field not in records[0].payload:
+      return None
+    return datetime.fromisoformat(records[0].payload[field])
+
+  async def _set_high_water_mark(
+    self,
+    collection_name: str,
+    updated_at: datetime,
+    field: str = "updated_at",
+  ) -> None:
+    """Store the most recent update time indexed into a collection.
+
+    Args:
+        collection_name: The name of the collection, or the full name of the
+          repository when it is stored in a shared collection.
+        updated_at: The new high-water mark of the collection.
+        field: The name of the high-water mark. Default is "updated_at", which
+          tracks issues.
+    """
+    point_id = index_state_id(collection_name)
+    payload = {"collection_name": collection_name}
+    if not await self._database_client.collection_exists(
+      INDEX_STATE_COLLECTION
+    ):
+      await self._database_client.create_collection(
+        collection_name=INDEX_STATE_COLLECTION,
+        vectors_config={},
+      )
+    else:
+      records = await self._database_client.retrieve(
+        collection_name=INDEX_STATE_COLLECTION,
+        ids=[point_id],
+      )
+      if records:
+        payload = records[0].payload
+    payload[field] = updated_at.isoformat()
+    await self._database_client.upsert(
+      collection_name=INDEX_STATE_COLLECTION,
+      points=[PointStruct(id=point_id, vector={}, payload=payload)],
+    )
+
+  def _collection_name(self, repository: str) -> str:
+    """Return the name of the collection storing the issues of a repository.
+
+    Args:
+        repository: The full name of the repository, as "owner/name".
+    """
+    return self._shared_collection or repository
+
+  def _tenant_payload(self, repository: str) -> dict[str, str]:
+    """Return the payload identifying the repository of a point, if needed."""
+    if self._shared_collection is None:
+      return {}
+    return tenant_payload(repository)
+
+  def _tenant_conditions(self, repository: str) -> list[FieldCondition]:
+    """Return the conditions matching the points of a repository, if needed."""
+    if self._shared_collection is None:
+      return []
+    return [
+      FieldCondition(key="repository", match=MatchValue(value=repository))
+    ]
+
+  async def _create_issues_collection(
+    self, collection_name: str, payload_fields: Sequence[str]
+  ):
+    """Create a collection of issues with its payload indexes.
+
+    Args:
+        collection_name: The name of the collection.
+        payload_fields: The optional payload fields stored in the collection.
+    """
+    await self._database_client.create_collection(
+      collection_name=collection_name,
+      sparse_vectors_config={
+        self._sparse_encoder.vector_name: self._sparse_encoder.vector_params
+      },
+      **self._collection_options.create_collection_arguments(
+        self._embedding_model.vector_name,
+        self._embedding_model.vector_params,
+      ),
+    )
+    self._sparse_collections[collection_name] = True
+    await self._create_payload_indexes(collection_name, payload_fields)
+
+  async def _create_comments_collection(self, comments_collection: str):
+    """Create a payload-only collection of issue comments.
+
+    Args:
+        comments_collection: The name of the collection.
+    """
+    await self._database_client.create_collection(
+      collection_name=comments_collection,
+      vectors_config={},
+    )
+    await self._database_client.create_payload_index(
+      collection_name=comments_collection,
+      field_name="issue_number",
+      field_schema=PayloadSchemaType.INTEGER,
+    )
+    if self._shared_collection is not None:
+      await self._database_client.create_payload_index(
+        collection_name=comments_collection,
+        field_name="repository",
+        field_schema=TENANT_PAYLOAD_INDEXES["repository"],
+      )
+
+  async def _has_sparse_vectors(self, collection_name: str) -> bool:
+    """Whether a collection stores the sparse vectors of its issues.
+
+    Collections created before hybrid search only store dense vectors, and
+    Qdrant cannot add a vector field to an existing collection.
+    """
+    if collection_name not in self._sparse_collections:
+      collection = await self._database_client.get_collection(collection_name)
+      sparse_vectors = collection.config.params.sparse_vectors or {}
+      self._sparse_collections[collection_name] = (
+        self._sparse_encoder.vector_name in sparse_vectors
+      )
+    return self._sparse_collections[collection_name]
+
+  async def _create_payload_indexes(
+    self, collection_name: str, payload_fields: Sequence[str]
+  ):
+    """Index the filterable payload fields of a collection.
+
+    Creating an index which already exists is a no-op, so this can run on
+    every indexing run to index fields stored for the first time.
+
+    Args:
+        collection_name: The name of the collection.
+        payload_fields: The optional payload fields stored in the collection.
+    """
+    shared = collection_name == self._shared_collection
+    for field_name, field_schema in payload_indexes(
+      payload_fields, shared=shared
+    ).items():
+      await self._database_client.create_payload_index(
+        collection_name=collection_name,
+        field_name=field_name,
+        field_schema=field_schema,
+      )
+
+  @metrics.timed("store_issues")
+  async def _upsert_issues(
+    self,
+    repository: str,
+    progress: IndexProgress,
+    payload_fields: Sequence[str],
+    issues: list[Issue],
+    update_high_water_mark: bool = True,
+  ):
+    """Embed a batch of issues and upsert them into a collection.
+
+    The high-water mark of the repository is moved forward once the batch is
+    stored, so an interrupted crawl resumes after the last stored batch.
+
+    Args:
+        repository: The full name of the repository, as "owner/name".
+        progress: The progress of the indexing run, updated in place.
+        payload_fields: The optional payload fields stored with the issues.
+        issues: The batch of issues, in ascending order of last update.
+        update_high_water_mark: Whether to move the high-water mark forward.
+          Default is True.
+    """
+    documents = [
+      self._text_normalizer.issue_document(issue.title, issue.body)
+      for issue in issues
+    ]
+    vectors = [
+      {self._embedding_model.vector_name: vector}
+      for vector in await self._run_embedding(
+        self._embedding_model.embed_documents,
+        documents,
+      )
+    ]
+    progress.issues_embedded += len(issues)
+
+    collection_name = self._collection_name(repository)
+    if not await self._database_client.collection_exists(collection_name):
+      await self._create_issues_collection(collection_name, payload_fields)
+    if await self._has_sparse_vectors(collection_name):
+      sparse_vectors = await self._run_embedding(
+        self._sparse_encoder.embed_documents, documents
+      )
+      for vector, sparse_vector in zip(vectors, sparse_vectors):
+        vector[self._sparse_encoder.vector_name] = sparse_vector
+    with metrics.stage("qdrant_upsert"):
+      await self._database_client.upsert(
+        collection_name=collection_name,
+        points=[
+          PointStruct(
+            id=issue.id,
+            vector=vector,
+            payload={
+              **issue_payload(issue, payload_fields),
+              **self._tenant_payload(repository),
+            },
+          )
+          for issue, vector in zip(issues, vectors)
+        ],
+      )
+    progress.issues_upserted += len(issues)
+    if update_high_water_mark:
+      await self._set_high_water_mark(
+        repository, max(issue.updated_at for issue in issues)
+      )
+
+  @metrics.timed("store_comments")
+  async def _upsert_comments(
+    self,
+    repository: str,
+    progress: IndexProgress,
+    comments: list[IssueComment],
+    update_high_water_mark: bool = True,
+  ):
+    """Store a batch of issue comments alongside a collection.
+
+    Comments are kept in a payload-only side collection, keyed by their GitHub
+    id, so that summarising search results requires no GitHub call.
+
+    Args:
+        repository: The full name of the repository, as "owner/name".
+        progress: The progress of the indexing run, updated in place.
+        comments: The batch of comments, in ascending order of last update.
+        update_high_water_mark: Whether to move the high-water mark of the
+          comments forward. Default is True.
+    """
+    comments_collection = comments_collection_name(
+      self._collection_name(repository)
+    )
+    if not await self._database_client.collection_exists(comments_collection):
+      await self._create_comments_collection(comments_collection)
+    await self._database_client.upsert(
+      collection_name=comments_collection,
+      points=[
+        PointStruct(
+          id=comment.id,
+          vector={},
+          payload={
+            **comment_payload(comment),
+            **self._tenant_payload(repository),
+          },
+        )
+        for comment in comments
+      ],
+    )
+    progress.comments_upserted += len(comments)
+    if update_high_water_mark:
+      await self._set_high_water_mark(
+        repository,
+        max(comment.updated_at for comment in comments),
+        field="comments_updated_at",
+      )
+
+  @metrics.timed("read_comments")
+  async def _get_stored_comments(
+    self, repository: str, issue_number: int
+  ) -> list[dict[str, Any]] | None:
+    """Return the comments of an issue stored at index time.
+
+    Args:
+        repository: The full name of the repository, as "owner/name".
+        issue_number: The number of the issue.
+
+    Returns:
+        The comments of the issue in chronological order, or None if the
+        comments of the collection were never indexed.
+    """
+    comments_collection = comments_collection_name(
+      self._collection_name(repository)
+    )
+    if not await self._database_client.collection_exists(comments_collection):
+      return None
+
+    conditions = [
+      FieldCondition(key="issue_number", match=MatchValue(value=issue_number)),
+      *self._tenant_conditions(repository),
+    ]
+
+    comments = []
+    offset = None
+    while True:
+      records, offset = await self._database_client.scroll(
+        collection_name=comments_collection,
+        scroll_filter=Filter(must=conditions),
+        limit=256,
+        offset=offset,
+      )
+      comments.extend(record.payload for record in records)
+      if offset is None:
+        break
+    return sorted(comments, key=lambda comment: comment["created_at"])
+
+  @metrics.timed("index")
+  async def index_repository(
+    self,
+    owner: str,
+    repository_name: str,
+    incremental: bool = False,
+    batch_size: int | None = None,
+    max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES,
+    progress: IndexProgress | None = None,
+    payload_fields: Sequence[str] = (),
+  ):
+    """Index a GitHub repository.
+
+    Retrieves all issues from the specified repository and index them into a
+    vector database for further processing or querying. Issues are upserted
+    under their GitHub id, so indexing the same issue twice updates it in
+    place rather than duplicating it. Full runs first re-key the points which
+    the first versions stored under UUIDs. The comments of every issue are then
+    fetched through the repository-wide listing and stored alongside, so that
+    search results can be summarised without calling GitHub.
+
+    Issues are streamed through the pipeline in fixed-size batches: while a
+    batch is embedded in the worker pool and upserted, the next pages keep
+    being fetched from GitHub. At most ``max_pending_batches`` fetched batches
+    wait for embedding at any time, which keeps memory usage flat regardless of
+    the size of the repository.
+
+    Args:
+        owner: The owner of the GitHub repository.
+        repository_name: The name of the GitHub repository.
+        incremental: Only fetch the issues and comments updated since the
+          repository was last indexed. Default is False.
+        batch_size: The number of issues embedded and upserted at once.
+          Default is None, which uses 64, or enough issues to keep every
+          embedding process busy.
+        max_pending_batches: The number of fetched batches allowed to wait for
+          embedding before fetching pauses. Default is 2.
+        progress: An object updated in place with the progress of the run, so
+          it can be monitored while indexing. Default is None.
+        payload_fields: The optional fields stored with the issues indexed by
+          this run, from ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+
+    Raises:
+        ValueError: If an optional payload field is unknown.
+    """
+    validate_payload_fields(payload_fields)
+    if progress is None:
+      progress = IndexProgress()
+    if batch_size is None:
+      batch_size = max(
+        DEFAULT_INDEX_BATCH_SIZE, self._embedding_model.documents_per_round
+      )
+    repository = f"{owner}/{repository_name}"
+    collection_name = self._collection_name(repository)
+    collection_exists = await self._database_client.collection_exists(
+      collection_name
+    )
+    if collection_exists:
+      await self._create_payload_indexes(collection_name, payload_fields)
+    issues_since = None
+    comments_since = None
+    if incremental:
+      issues_since = await self._get_high_water_mark(repository)
+      comments_since = await self._get_high_water_mark(
+        repository, field="comments_updated_at"
+      )
+    if (
+      collection_exists
+      and issues_since is None
+      and self._shared_collection is None
+    ):
+      await self._rekey_legacy_points(collection_name)
+
+    if issues_since is None:
+      logging.info(f"Fetching Issues from {owner}/{repository_name}")
+    else:
+      logging.info(
+        f"Fetching Issues from {owner}/{repository_name} updated since "
+        f"{issues_since.isoformat()}"
+      )
+    progress.phase = "fetching_issues"
+    indexed_issues = await stream_batches(
+      self._github_client.iter_repository_issues(
+        owner, repository_name, since=issues_since
+      ),
+      functools.partial(
+        self._upsert_issues, repository, progress, payload_fields
+      ),
+      batch_size=batch_size,
+      max_pending_batches=max_pending_batches,
+      description="issues",
+      on_fetched=progress.count_issue_fetched,
+    )
+
+    progress.phase = "fetching_comments"
+    logging.info(f"Fetching Comments from {owner}/{repository_name}")
+    indexed_comments = await stream_batches(
+      self._github_client.iter_repository_comments(
+        owner, repository_name, since=comments_since
+      ),
+      functools.partial(self._upsert_comments, repository, progress),
+      batch_size=COMMENTS_BATCH_SIZE,
+      max_pending_batches=max_pending_batches,
+      description="comments",
+      on_fetched=progress.count_comment_fetched,
+    )
+
+    progress.phase = "done"
+    progress.finished_at = time.monotonic()
+    if indexed_issues == 0 and indexed_comments == 0:
+      logging.info("Already up to date")
+    http_cache = self._github_client.http_cache
+    logging.info(
+      f"GitHub cache hits: {http_cache.hits}, misses: {http_cache.misses}"
+    )
+    embedding_cache = self._embedding_model.cache
+    logging.info(
+      f"Embedding cache hits: {embedding_cache.hits}, misses: "
+      f"{embedding_cache.misses}"
+    )
+    logging.info("Done")
+
+  async def repository_exists(self, owner: str, repository_name: str) -> bool:
+    """Whether the repository has been indexed.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository, or "*" for any
+          repository of the owner in the shared collection.
+
+    Returns:
+        True if the collection of the repository exists and, when it is
+        shared, stores some issues of the repository.
+    """
+    repository = f"{owner}/{repository_name}"
+    collection_name = self._collection_name(repository)
+    if not await self._database_client.collection_exists(collection_name):
+      return False
+    if self._shared_collection is None:
+      return True
+    response = await self._database_client.count(
+      collection_name=collection_name,
+      count_filter=SearchFilter(repositories=(repository,)).to_qdrant_filter(),
+      exact=False,
+    )
+    return response.count > 0
+
+  async def _stored_payload_fields(
+    self, repository: str, issue_number: int
+  ) -> list[str]:
+    """Return the optional payload fields stored with an issue.
+
+    They are read from the stored point of the issue or, for a new issue,
+    from any point of the repository, so an update keeps the fields chosen
+    when the repository was indexed.
+
+    Args:
+        repository: The full name of the repository, as "owner/name".
+        issue_number: The number of the issue.
+    """
+    tenant_conditions = self._tenant_conditions(repository)
+    issue_condition = FieldCondition(
+      key="number", match=MatchValue(value=issue_number)
+    )
+    for conditions in (
+      [issue_condition, *tenant_conditions],
+      tenant_conditions,
+    ):
+      records, _ = await self._database_client.scroll(
+        collection_name=self._collection_name(repository),
+        scroll_filter=Filter(must=conditions or None),
+        limit=1,
+      )
+      if records:
+        return [
+          field
+          for field in EXTRA_PAYLOAD_FIELDS
+          if field in records[0].payload
+        ]
+    return []
+
+  @metrics.timed("update_issue")
+  async def update_issue(
+    self,
+    owner: str,
+    repository_name: str,
+    issue_number: int,
+    issue: Issue | None = None,
+    comments: Sequence[IssueComment] = (),
+    deleted_comment_ids: Sequence[int] = (),
+  ) -> bool:
+    """Re-index a single issue of an indexed repository.
+
+    The issue is embedded and upserted along with the given changes to its
+    comments. Unlike :meth:`index_repository`, the high-water marks are left
+    untouched, so an incremental run still fetches everything updated since
+    the last crawl.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        issue_number: The number of the issue.
+        issue: The current state of the issue. Default is None, which fetches
+          it from GitHub, and deletes it if it no longer exists.
+        comments: Comments of the issue to upsert. Default is none.
+        deleted_comment_ids: The ids of comments of the issue to delete.
+          Default is none.
+
+    Returns:
+        Whether the repository is indexed. Nothing is stored otherwise.
+    """
+    if not await self.repository_exists(owner, repository_name):
+      return False
+    repository = f"{owner}/{repository_name}"
+    if issue is None:
+      issue = await self._github_client.async_get_issue(
+        owner, repository_name, issue_number
+      )
+      if issue is None:
+        return await self.delete_issue(owner, repository_name, issue_number)
+
+    progress = IndexProgress()
+    await self._upsert_issues(
+      repository,
+      progress,
+      await self._stored_payload_fields(repository, issue_number),
+      [issue],
+      update_high_water_mark=False,
+    )
+    if comments:
+      await self._upsert_comments(
+        repository, progress, list(comments), update_high_water_mark=False
+      )
+    comments_collection = comments_collection_name(
+      self._collection_name(repository)
+    )
+    if deleted_comment_ids and await self._database_client.collection_exists(
+      comments_collection
+    ):
+      await self._database_client.delete(
+        collection_name=comments_collection,
+        points_selector=PointIdsList(points=list(deleted_comment_ids)),
+      )
+    return True
+
+  @metrics.timed("delete_issue")
+  async def delete_issue(
+    self, owner: str, repository_name: str, issue_number: int
+  ) -> bool:
+    """Remove an issue and its comments from an indexed repository.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        issue_number: The number of the issue.
+
+    Returns:
+        Whether the repository is indexed.
+    """
+    if not await self.repository_exists(owner, repository_name):
+      return False
+    repository = f"{owner}/{repository_name}"
+    collection_name = self._collection_name(repository)
+    tenant_conditions = self._tenant_conditions(repository)
+    await self._database_client.delete(
+      collection_name=collection_name,
+      points_selector=FilterSelector(
+        filter=Filter(
+          must=[
+            FieldCondition(key="number", match=MatchValue(value=issue_number)),
+            *tenant_conditions,
+          ]
+        )
+      ),
+    )
+    comments_collection = comments_collection_name(collection_name)
+    if await self._database_client.collection_exists(comments_collection):
+      await self._database_client.delete(
+        collection_name=comments_collection,
+        points_selector=FilterSelector(
+          filter=Filter(
+            must=[
+              FieldCondition(
+                key="issue_number", match=MatchValue(value=issue_number)
+              ),
+              *tenant_conditions,
+            ]
+          )
+        ),
+      )
+    return True
+
+  async def import_snapshot(self, path: str, batch_size: int = 256) -> str:
+    """Load a snapshot written by :meth:`export_snapshot`.
+
+    The arrays of the snapshot are memory mapped and streamed into the
+    database in batches. Points are upserted, so importing over an index of
+    the same repository updates it in place. The high-water marks are
+    restored, so an incremental run afterwards only fetches what changed
+    since the export.
+
+    Args:
+        path: The directory of the snapshot.
+        batch_size: The number of points stored at once. Default is 256.
+
+    Returns:
+        The full name of the imported repository.
+
+    Raises:
+        ValueError: If the directory holds no snapshot of a supported
+          version, or if the snapshot was embedded with another model.
+    """
+    snapshot = Snapshot(path)
+    check_snapshot_model(snapshot, self._embedding_model)
+    repository = snapshot.repository
+    collection_name = self._collection_name(repository)
+    payload_fields = snapshot.manifest["payload_fields"]
+    if not await self._database_client.collection_exists(collection_name):
+      await self._create_issues_collection(collection_name, payload_fields)
+    else:
+      await self._create_payload_indexes(collection_name, payload_fields)
+    sparse_vectors = await self._has_sparse_vectors(collection_name)
+    sparse_name = self._sparse_encoder.vector_name
+
+    with metrics.stage("import_snapshot"):
+      for points in snapshot.iter_points(
+        batch_size, self._tenant_payload(repository)
+      ):
+        missing = fill_snapshot_vectors(points, sparse_name, sparse_vectors)
+        if missing:
+          sparse_encodings = await self._run_embedding(
+            self._sparse_encoder.embed_documents,
+            [
+              stored_issue_document(point.payload, self._text_normalizer)
+              for point in missing
+            ],
+          )
+          for point, sparse_vector in zip(missing, sparse_encodings):
+            point.vector[sparse_name] = sparse_vector
+        await self._database_client.upsert(
+          collection_name=collection_name, points=points
+        )
+
+      comments_collection = comments_collection_name(collection_name)
+      for comments in snapshot.iter_comments(
+        batch_size, self._tenant_payload(repository)
+      ):
+        if not await self._database_client.collection_exists(
+          comments_collection
+        ):
+          await self._create_comments_collection(comments_collection)
+        await self._database_client.upsert(
+          collection_name=comments_collection, points=comments
+        )
+
+    for field, value in snapshot.manifest["high_water_marks"].items():
+      await self._set_high_water_mark(
+        repository, datetime.fromisoformat(value), field=field
+      )
+    logging.info(
+      f"Imported {snapshot.manifest['points']} issues of {repository} from "
+      f"{path}"
+    )
+    return repository
+
+  async def search(
+    self,
+    owner: str,
+    repository_name: str,
+    text: str,
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+  ) -> list[QueryResponse]:
+    """Searches for issues in the specified repository that match the given text.
+
+    Issues with empty bodies, and issues not matching the filter, are excluded
+    by the query itself.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        text: A natural language query to search for within the repository's issues.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense" to search by meaning, "sparse" to search by keywords
+          (BM25), or "hybrid" to fuse both rankings. Collections created
+          before hybrid search only support "dense", which is used instead.
+          Default is "dense".
+
+    Returns:
+        A list of query responses that match the search criteria. The list is
+        empty if the repository was not indexed.
+
+    Raises:
+        ValueError: If the search mode is unknown.
+    """
+    return await self.search_repositories(
+      [f"{owner}/{repository_name}"], text, search_filter, mode
+    )
+
+  @metrics.timed("search")
+  async def search_repositories(
+    self,
+    repositories: Sequence[str],
+    text: str,
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+  ) -> list[QueryResponse]:
+    """Search the issues of several repositories in a single query.
+
+    Args:
+        repositories: The repositories to search, as "owner/name", or
+          "owner/*" for every repository of an owner. Several repositories
+          can only be searched in the shared collection.
+        text: A natural language query.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense", "sparse" or "hybrid", as for :meth:`search`. Default
+          is "dense".
+
+    Returns:
+        A list of query responses that match the search criteria. The
+        repository of each result is in its "repository" metadata.
+
+    Raises:
+        ValueError: If the search mode or a repository is invalid, or if
+          several repositories are searched without a shared collection.
+    """
+    collection_name, search_filter, mode = await self._search_target(
+      repositories, search_filter, mode
+    )
+    if collection_name is None:
+      return []
+
+    dense_vector = None
+    if mode != "sparse":
+      dense_vector = await self._run_embedding(
+        self._embedding_model.embed_query, text
+      )
+    sparse_vector = None
+    if mode != "dense":
+      sparse_vector = self._sparse_encoder.embed_query(text)
+    with metrics.stage("qdrant_query"):
+      response = await self._database_client.query_points(
+        collection_name=collection_name,
+        **search_query_arguments(
+          mode,
+          self._embedding_model,
+          dense_vector,
+          self._sparse_encoder,
+          sparse_vector,
+          search_filter.to_qdrant_filter(),
+          self._collection_options.search_params(),
+        ),
+      )
+    return search_results(response.points)
+
+  @metrics.timed("search_batch")
+  async def search_batch(
+    self,
+    repositories: Sequence[str],
+    texts: Sequence[str],
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+  ) -> list[list[QueryResponse]]:
+    """Run many searches of the same repositories in one round trip.
+
+    The queries are embedded together in one call of the model, and searched
+    with a single Qdrant batch query. Results are not summarised.
+
+    Args:
+        repositories: The repositories to search, as for
+          :meth:`search_repositories`.
+        texts: The natural language queries.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense", "sparse" or "hybrid", as for :meth:`search`. Default
+          is "dense".
+
+    Returns:
+        The results of each query, in the order of the queries.
+
+    Raises:
+        ValueError: If the search mode or a repository is invalid, or if
+          several repositories are searched without a shared collection.
+    """
+    collection_name, search_filter, mode = await self._search_target(
+      repositories, search_filter, mode
+    )
+    if collection_name is None or not texts:
+      return [[] for _ in texts]
+
+    dense_vectors = [None] * len(texts)
+    if mode != "sparse":
+      dense_vectors = await self._run_embedding(
+        self._embedding_model.embed_queries, texts
+      )
+    sparse_vectors = [None] * len(texts)
+    if mode != "dense":
+      sparse_vectors = [
+        self._sparse_encoder.embed_query(text) for text in texts
+      ]
+    query_filter = search_filter.to_qdrant_filter()
+    search_params = self._collection_options.search_params()
+    with metrics.stage("qdrant_query_batch"):
+      responses = await self._database_client.query_batch_points(
+        collection_name=collection_name,
+        requests=[
+          search_query_request(
+            search_query_arguments(
+              mode,
+              self._embedding_model,
+              dense_vector,
+              self._sparse_encoder,
+              sparse_vector,
+              query_filter,
+              search_params,
+            )
+          )
+          for dense_vector, sparse_vector in zip(dense_vectors, sparse_vectors)
+        ],
+      )
+    return [search_results(response.points) for response in responses]
+
+  async def _search_target(
+    self,
+    repositories: Sequence[str],
+    search_filter: SearchFilter | None,
+    mode: str,
+  ) -> tuple[str | None, SearchFilter, str]:
+    """Return the collection, filter and mode searching some repositories.
+
+    The collection is None if it does not exist. Collections without sparse
+    vectors are searched in dense mode.
+
+    Raises:
+        ValueError: If the search mode or a repository is invalid, or if
+          several repositories are searched without a shared collection.
+    """
+    validate_search_mode(mode)
+    validate_repositories(repositories)
+    search_filter = search_filter or SearchFilter()
+    if self._shared_collection is None:
+      if len(repositories) != 1 or repositories[0].endswith("/*"):
+        raise ValueError(
+          "Searching several repositories needs a shared collection."
+        )
+      collection_name = repositories[0]
+    else:
+      collection_name = self._shared_collection
+      search_filter = dataclasses.replace(
+        search_filter, repositories=tuple(repositories)
+      )
+    if not await self._database_client.collection_exists(collection_name):
+      logging.error(
+        "DB Collection not found. Try indexing the repository first."
+      )
+      return None, search_filter, mode
+
+    if mode != "dense" and not await self._has_sparse_vectors(collection_name):
+      logging.warning(
+        f"{collection_name} has no sparse vectors, searching it in dense "
+        "mode. Delete and re-index it to enable hybrid search."
+      )
+      mode = "dense"
+    return collection_name, search_filter, mode
+
+  async def facet(
+    self,
+    owner: str,
+    repository_name: str,
+    field_name: str,
+    search_filter: SearchFilter | None = None,
+    limit: int = 10,
+  ) -> dict[Any, int]:
+    """Count the issues of a repository by the values of a payload field.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository, or "*" for every
+          repository of the owner in the shared collection.
+        field_name: An indexed payload field, such as "labels" or "state".
+        search_filter: Only count the issues matching this filter. Default is
+          None, which counts every issue with a body.
+        limit: The maximum number of values returned. Default is 10.
+
+    Returns:
+        The number of issues of the most frequent values, by value.
+    """
+    repository = f"{owner}/{repository_name}"
+    search_filter = search_filter or SearchFilter()
+    if self._shared_collection is not None:
+      search_filter = dataclasses.replace(
+        search_filter, repositories=(repository,)
+      )
+    with metrics.stage("qdrant_facet"):
+      response = await self._database_client.facet(
+        collection_name=self._collection_name(repository),
+        key=field_name,
+        facet_filter=search_filter.to_qdrant_filter(),
+        limit=limit,
+      )
+    return {hit.value: hit.count for hit in response.hits}
+
+  @metrics.timed("migrate_payloads")
+  async def _rekey_legacy_points(
+    self, collection_name: str, batch_size: int = 256
+  ) -> int:
+    """Store the issues of a collection under their GitHub id.
+
+    The first versions filled collections through ``QdrantClient.add``, which
+    keys points by random UUIDs, whereas issues are now upserted under their
+    GitHub id. Such points would be kept next to their new copy rather than
+    replaced, so they are copied under the id of their issue, with their
+    vectors, and deleted. Points whose payload lost the id of the issue are
+    deleted, and stored again by the next full index.
+
+    Args:
+        collection_name: The name of the collection.
+        batch_size: The number of points scanned at once. Default is 256.
+
+    Returns:
+        The number of re-keyed points.
+    """
+    rekeyed_points = 0
+    deleted_points = 0
+    async for legacy_ids in self._iter_legacy_point_ids(
+      collection_name, None, batch_size
+    ):
+      legacy_records = await self._database_client.retrieve(
+        collection_name=collection_name,
+        ids=legacy_ids,
+        with_payload=True,
+        with_vectors=True,
+      )
+      points = [
+        PointStruct(
+          id=record.payload["id"],
+          vector=record.vector,
+          payload=record.payload,
+        )
+        for record in legacy_records
+        if isinstance(record.payload.get("id"), int)
+      ]
+      if points:
+        await self._database_client.upsert(
+          collection_name=collection_name, points=points
+        )
+      await self._database_client.delete(
+        collection_name=collection_name,
+        points_selector=PointIdsList(points=legacy_ids),
+      )
+      rekeyed_points += len(points)
+      deleted_points += len(legacy_ids) - len(points)
+    if rekeyed_points or deleted_points:
+      logging.warning(
+        f"Re-keyed {rekeyed_points} points of {collection_name} by issue id "
+        f"and deleted {deleted_points} points without one"
+      )
+    return rekeyed_points
+
+  async def _iter_legacy_point_ids(
+    self,
+    collection_name: str,
+    scroll_filter: Filter | None,
+    batch_size: int,
+  ) -> AsyncIterator[list[ExtendedPointId]]:
+    """Scroll through the ids of the points not keyed by an issue id."""
+    offset = None
+    while True:
+      records, offset = await self._database_client.scroll(
+        collection_name=collection_name,
+        scroll_filter=scroll_filter,
+        limit=batch_size,
+        offset=offset,
+        with_payload=False,
+        with_vectors=False,
+      )
+      legacy_ids = [
+        record.id for record in records if not isinstance(record.id, int)
+      ]
+      if legacy_ids:
+        yield legacy_ids
+      if offset is None:
+        break
+
+  async def migrate_payloads(
+    self,
+    owner: str,
+    repository_name: str,
+    payload_fields: Sequence[str] = (),
+    batch_size: int = 256,
+  ) -> int:
+    """Rewrite the payloads of a collection into the compact schema.
+
+    Collections indexed by earlier versions store a full dump of every issue.
+    Their payloads are replaced in place by compact ones, without re-embedding
+    or calling GitHub. Version 2 payloads keep their fields and gain has_body.
+    Points keyed by UUID in the first versions are re-keyed by issue id.
+    Points already using the current schema are left untouched, so an
+    interrupted migration can simply be run again. The payload indexes of
+    the collection are created as well.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        payload_fields: The optional fields to keep, from
+          ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+        batch_size: The number of points rewritten at once. Default is 256.
+
+    Returns:
+        The number of migrated points.
+
+    Raises:
+        ValueError: If an optional payload field is unknown.
+    """
+    validate_payload_fields(payload_fields)
+    collection_name = f"{owner}/{repository_name}"
+    await self._create_payload_indexes(collection_name, payload_fields)
+    await self._rekey_legacy_points(collection_name, batch_size)
+    migrated_points = 0
+    async for records in self._iter_records(collection_name, None, batch_size):
+      operations = [
+        migrate_payload_operation(record.id, record.payload, payload_fields)
+        for record in records
+        if record.payload.get("schema_version") != PAYLOAD_SCHEMA_VERSION
+      ]
+      if operations:
+        await self._database_client.batch_update_points(
+          collection_name=collection_name,
+          update_operations=operations,
+        )
+        migrated_points += len(operations)
+    logging.info(f"Migrated {migrated_points} points of {collection_name}")
+    return migrated_points
+
+  @metrics.timed("move_to_shared_collection")
+  async def move_to_shared_collection(
+    self,
+    owner: str,
+    repository_name: str,
+    payload_fields: Sequence[str] = (),
+    delete: bool = False,
+    batch_size: int = 256,
+  ) -> int:
+    """Copy the collection of a repository into the shared collection.
+
+    The payloads are first migrated to the current schema, then the points
+    and their comments are copied with their vectors, so nothing is embedded
+    again and GitHub is not called. Sparse vectors missing from collections
+    created before hybrid search are computed from the stored text. Copying
+    is idempotent, so an interrupted move can simply be run again.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        payload_fields: The optional fields to keep when migrating version 1
+          payloads, from ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+        delete: Delete the collections of the repository once copied.
+          Default is False.
+        batch_size: The number of points copied at once. Default is 256.
+
+    Returns:
+        The number of copied issues.
+
+    Raises:
+        ValueError: If the engine has no shared collection, or if the
+          repository has no collection of its own.
+    """
+    repository = f"{owner}/{repository_name}"
+    if self._shared_collection is None:
+      raise ValueError("The engine has no shared collection to move into.")
+    if not await self._database_client.collection_exists(repository):
+      raise ValueError(f"{repository} has no collection of its own.")
+    await self.migrate_payloads(
+      owner, repository_name, payload_fields, batch_size
+    )
+
+    if not await self._database_client.collection_exists(
+      self._shared_collection
+    ):
+      await self._create_issues_collection(
+        self._shared_collection, payload_fields
+      )
+    sparse_name = self._sparse_encoder.vector_name
+    copied_points = 0
+    stored_fields = set()
+    async for records in self._iter_records(
+      repository, None, batch_size, with_vectors=True
+    ):
+      vectors = [dict(record.vector) for record in records]
+      missing = [
+        (record, vector)
+        for record, vector in zip(records, vectors)
+        if sparse_name not in vector
+      ]
+      if missing:
+        sparse_vectors = await self._run_embedding(
+          self._sparse_encoder.embed_documents,
+          [
+            stored_issue_document(record.payload, self._text_normalizer)
+            for record, _ in missing
+          ],
+        )
+        for (_, vector), sparse_vector in zip(missing, sparse_vectors):
+          vector[sparse_name] = sparse_vector
+      for record in records:
+        stored_fields.update(record.payload)
+      await self._database_client.upsert(
+        collection_name=self._shared_collection,
+        points=[
+          PointStruct(
+            id=record.id,
+            vector=vector,
+            payload={**record.payload, **tenant_payload(repository)},
+          )
+          for record, vector in zip(records, vectors)
+        ],
+      )
+      copied_points += len(records)
+    await self._create_payload_indexes(
+      self._shared_collection,
+      [field for field in EXTRA_PAYLOAD_FIELDS if field in stored_fields],
+    )
+
+    comments_collection = comments_collection_name(repository)
+    if await self._database_client.collection_exists(comments_collection):
+      shared_comments_collection = comments_collection_name(
+        self._shared_collection
+      )
+      if not await self._database_client.collection_exists(
+        shared_comments_collection
+      ):
+        await self._create_comments_collection(shared_comments_collection)
+      async for records in self._iter_records(
+        comments_collection, None, batch_size
+      ):
+        await self._database_client.upsert(
+          collection_name=shared_comments_collection,
+          points=[
+            PointStruct(
+              id=record.id,
+              vector={},
+              payload={**record.payload, **tenant_payload(repository)},
+            )
+            for record in records
+          ],
+        )
+
+    if delete:
+      await self._database_client.delete_collection(repository)
+      if await self._database_client.collection_exists(comments_collection):
+        await self._database_client.delete_collection(comments_collection)
+      self._sparse_collections.pop(repository, None)
+    logging.info(
+      f"Moved {copied_points} points of {repository} into "
+      f"{self._shared_collection}"
+    )
+    return copied_points
+
+  async def _iter_records(
+    self,
+    collection_name: str,
+    scroll_filter: Filter | None,
+    batch_size: int,
+    with_vectors: bool = False,
+  ) -> AsyncIterator[list[Record]]:
+    """Scroll through the points of a collection in batches."""
+    offset = None
+    while True:
+      records, offset = await self._database_client.scroll(
+        collection_name=collection_name,
+        scroll_filter=scroll_filter,
+        limit=batch_size,
+        offset=offset,
+        with_payload=True,
+        with_vectors=with_vectors,
+      )
+      if records:
+        yield records
+      if offset is None:
+        break
+
+  async def export_snapshot(
+    self,
+    owner: str,
+    repository_name: str,
+    path: str,
+    batch_size: int = 256,
+  ) -> int:
+    """Write the index of a repository into a snapshot directory.
+
+    Vectors are written as stored, in the columnar layout described in
+    :mod:`github_search_engine.snapshot`, so loading the snapshot elsewhere
+    calls neither GitHub nor the embedding model.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        path: The directory of the snapshot, which must not exist or be
+          empty.
+        batch_size: The number of points read at once. Default is 256.
+
+    Returns:
+        The number of exported issues.
+
+    Raises:
+        ValueError: If the repository is not indexed, still holds points keyed
+          by UUID, or the directory is not empty.
+    """
+    repository = f"{owner}/{repository_name}"
+    if not await self.repository_exists(owner, repository_name):
+      raise ValueError(f"{repository} is not indexed.")
+    collection_name = self._collection_name(repository)
+    collection = await self._database_client.get_collection(collection_name)
+    params = collection.config.params
+    tenant_filter = Filter(must=self._tenant_conditions(repository) or None)
+    async for _ in self._iter_legacy_point_ids(
+      collection_name, tenant_filter, batch_size
+    ):
+      raise ValueError(
+        f"{repository} was indexed by an earlier version which keyed issues "
+        "by UUID. Run the migrate command on it before exporting it."
+      )
+
+    writer = SnapshotWriter(
+      path,
+      dense_vectors={
+        name: vector.size for name, vector in params.vectors.items()
+      },
+      sparse_vectors=list(params.sparse_vectors or {}),
+    )
+    try:
+      stored_fields = set()
+      async for records in self._iter_records(
+        collection_name, tenant_filter, batch_size, with_vectors=True
+      ):
+        writer.add_points(records)
+        for record in records:
+          stored_fields.update(record.payload)
+      comments_collection = comments_collection_name(collection_name)
+      if await self._database_client.collection_exists(comments_collection):
+        async for records in self._iter_records(
+          comments_collection, tenant_filter, batch_size
+        ):
+          writer.add_comments(records)
+
+      high_water_marks = {}
+      for field in ("updated_at", "comments_updated_at"):
+        high_water_mark = await self._get_high_water_mark(
+          repository, field=field
+        )
+        if high_water_mark is not None:
+          high_water_marks[field] = high_water_mark.isoformat()
+      writer.finish(
+        {
+          "repository": repository,
+          "embedding_model": self._embedding_model.model_name,
+          "payload_fields": [
+            field for field in EXTRA_PAYLOAD_FIELDS if field in stored_fields
+          ],
+          "high_water_marks": high_water_marks,
+          "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+      )
+    finally:
+      writer.close()
+    logging.info(f"Exported {writer.points} issues of {repository} to {path}")
+    return writer.points
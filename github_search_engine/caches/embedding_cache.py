@@ -0,0 +1,158 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from github_search_engine import metrics
+
+
+# Vectors are stored as the float32 the embedding model computes them in.
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class EmbeddingCache:
+  def __init__(self, path: str = ":memory:", max_size: int = 100_000):
+    """A persistent cache of document embeddings, keyed by their content.
+
+    Re-indexing a repository embeds the same text for every issue which did
+    not change. The vectors are cached under a hash of the text and the name
+    of the model, so unchanged issues reuse their vector, whatever their id
+    or update time. Once the cache holds more than ``max_size`` vectors, the
+    least recently used ones are evicted.
+
+    Args:
+        path: The path to the SQLite database of the cache. Default is
+          ":memory:", which keeps the cache in memory.
+        max_size: The maximum number of cached vectors. Default is 100 000,
+          about 300 MiB of 768-dimensional vectors.
+    """
+    self._max_size = max_size
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    self._connection.execute(
+      "CREATE TABLE IF NOT EXISTS embeddings ("
+      "key TEXT PRIMARY KEY, "
+      "vector BLOB NOT NULL, "
+      "accessed_at REAL NOT NULL)"
+    )
+    self._connection.execute(
+      "CREATE INDEX IF NOT EXISTS embeddings_accessed_at "
+      "ON embeddings (accessed_at)"
+    )
+    self._connection.commit()
+    (self._size,) = self._connection.execute(
+      "SELECT COUNT(*) FROM embeddings"
+    ).fetchone()
+
+  @staticmethod
+  def make_key(text: str, model: str) -> str:
+    """Build the cache key of the embedding of a text.
+
+    Runs of whitespace are collapsed, as the tokenizers of the embedding
+    models split on whitespace and embed such texts identically.
+
+    Args:
+        text: The embedded text.
+        model: The name of the embedding model.
+
+    Returns:
+        The cache key of the embedding.
+    """
+    key = json.dumps([model, " ".join(text.split())])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+  def get_many(self, keys: Sequence[str]) -> dict[str, list[float]]:
+    """Look the embeddings of several texts up.
+
+    Args:
+        keys: The cache keys of the embeddings.
+
+    Returns:
+        The cached embeddings, by key. Missing keys are left out.
+    """
+    now = time.time()
+    unique_keys = list(dict.fromkeys(keys))
+    vectors = {}
+    with self._lock:
+      # SQLite limits the number of parameters of a statement.
+      for start in range(0, len(unique_keys), 500):
+        chunk = unique_keys[start : start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        rows = self._connection.execute(
+          f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+          chunk,
+        ).fetchall()
+        for key, vector in rows:
+          vectors[key] = np.frombuffer(vector, VECTOR_DTYPE).tolist()
+        self._connection.executemany(
+          "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+          [(now, key) for key, _ in rows],
+        )
+      self._connection.commit()
+      hits = sum(key in vectors for key in keys)
+      self.hits += hits
+      self.misses += len(keys) - hits
+    metrics.EMBEDDING_CACHE_REQUESTS.inc(hits, result="hit")
+    metrics.EMBEDDING_CACHE_REQUESTS.inc(len(keys) - hits, result="miss")
+    return vectors
+
+  def set_many(self, entries: dict[str, Sequence[float]]) -> None:
+    """Store embeddings, evicting the least recently used ones if needed.
+
+    Args:
+        entries: The embeddings to store, by cache key.
+    """
+    now = time.time()
+    keys = list(entries)
+    with self._lock:
+      # SQLite limits the number of parameters of a statement.
+      for start in range(0, len(keys), 500):
+        chunk = keys[start : start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        (stored,) = self._connection.execute(
+          f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})",
+          chunk,
+        ).fetchone()
+        self._size += len(chunk) - stored
+      self._connection.executemany(
+        "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+        [
+          (key, np.asarray(vector, VECTOR_DTYPE).tobytes(), now)
+          for key, vector in entries.items()
+        ],
+      )
+      self._evict()
+      self._connection.commit()
+
+  def _evict(self):
+    # Only the excess entries are read, through the index of accessed_at.
+    if self._size > self._max_size:
+      self._connection.execute(
+        "DELETE FROM embeddings WHERE key IN ("
+        "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+        (self._size - self._max_size,),
+      )
+      self._size = self._max_size
+
+  @property
+  def size(self) -> int:
+    """The number of cached embeddings."""
+    return self._size
+
+  @property
+  def hit_rate(self) -> float:
+    """The share of lookups served from the cache."""
+    lookups = self.hits + self.misses
+    return self.hits / lookups if lookups else 0.0
+
+  def close(self) -> None:
+    """Close the database of the cache."""
+    with self._lock:
+      self._connection.close()
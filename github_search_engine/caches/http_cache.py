@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from github_search_engine import metrics
+
+
+# Headers describing the encoding of the original body, which no longer
+# applies once the decoded body is cached.
+_ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class HttpCache:
+  def __init__(self, path: str = ":memory:", max_size: int = 100 * 2**20):
+    """A persistent cache of GitHub responses, revalidated with ETags.
+
+    Every successful GET response carrying an ETag or a Last-Modified header
+    is stored with its body. The next request to the same URL sends them
+    back as If-None-Match and If-Modified-Since, and a 304 Not Modified
+    answer, which does not count against the GitHub rate limit, is served
+    from the cache. Once the cached bodies exceed ``max_size`` bytes, the
+    least recently used responses are evicted.
+
+    Responses are keyed by URL and Accept header, not by token, so a cache
+    must only be shared by tokens allowed to see the same repositories.
+
+    Args:
+        path: The path to the SQLite database of the cache. Default is
+          ":memory:", which keeps the cache in memory.
+        max_size: The maximum number of bytes of cached responses. Default
+          is 100 MiB.
+    """
+    self._max_size = max_size
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    self._connection.execute(
+      "CREATE TABLE IF NOT EXISTS responses ("
+      "key TEXT PRIMARY KEY, "
+      "etag TEXT, "
+      "last_modified TEXT, "
+      "headers TEXT NOT NULL, "
+      "body BLOB NOT NULL, "
+      "size INTEGER NOT NULL, "
+      "accessed_at REAL NOT NULL)"
+    )
+    self._connection.execute(
+      "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+      "ON responses (accessed_at)"
+    )
+    self._connection.commit()
+    (self._size,) = self._connection.execute(
+      "SELECT COALESCE(SUM(size), 0) FROM responses"
+    ).fetchone()
+
+  @staticmethod
+  def make_key(request: httpx.Request) -> str | None:
+    """Return the cache key of a request, or None if it is not cacheable."""
+    if request.method != "GET" or (
+      "if-none-match" in request.headers
+      or "if-modified-since" in request.headers
+    ):
+      return None
+    key = json.dumps([str(request.url), request.headers.get("accept", "")])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+  def prepare(self, request: httpx.Request) -> str | None:
+    """Add the validators of the cached response to a request.
+
+    Args:
+        request: The request about to be sent.
+
+    Returns:
+        The cache key of the request, or None if it is not cacheable.
+    """
+    key = self.make_key(request)
+    if key is None:
+      return None
+    with self._lock:
+      row = self._connection.execute(
+        "SELECT etag, last_modified FROM responses WHERE key = ?", (key,)
+      ).fetchone()
+    if row is not None:
+      etag, last_modified = row
+      if etag:
+        request.headers["If-None-Match"] = etag
+      if last_modified:
+        request.headers["If-Modified-Since"] = last_modified
+    return key
+
+  def process(
+    self, key: str, request: httpx.Request, response: httpx.Response
+  ) -> httpx.Response | None:
+    """Store a fresh response, or answer a 304 from the cache.
+
+    Args:
+        key: The cache key returned by :meth:`prepare`.
+        request: The request which was sent.
+        response: Its response, with its body already read.
+
+    Returns:
+        The response to hand to the caller, or None if the response was
+        evicted before its 304 arrived, in which case the request must be
+        sent again without validators.
+    """
+    now = time.time()
+    with self._lock:
+      if response.status_code == 304:
+        row = self._connection.execute(
+          "SELECT headers, body FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+          self._connection.execute(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+          )
+          self._connection.commit()
+          self.hits += 1
+          metrics.GITHUB_CACHE_REQUESTS.inc(result="hit")
+          headers, body = row
+          # The rate limit and validators of the 304 are the current ones.
+          headers = {**json.loads(headers), **_cacheable_headers(response)}
+          return httpx.Response(
+            200, headers=headers, content=body, request=request
+          )
+        return None
+
+      self.misses += 1
+      metrics.GITHUB_CACHE_REQUESTS.inc(result="miss")
+      etag = response.headers.get("etag")
+      last_modified = response.headers.get("last-modified")
+      if response.status_code != 200 or not (etag or last_modified):
+        return response
+      headers = _cacheable_headers(response)
+      encoded_headers = json.dumps(headers)
+      size = len(response.content) + len(encoded_headers)
+      if size > self._max_size:
+        return response
+      self._delete(key)
+      self._connection.execute(
+        "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+          key,
+          etag,
+          last_modified,
+          encoded_headers,
+          response.content,
+          size,
+          now,
+        ),
+      )
+      self._size += size
+      self._evict()
+      self._connection.commit()
+    return httpx.Response(
+      response.status_code,
+      headers=headers,
+      content=response.content,
+      request=request,
+    )
+
+  def _delete(self, key: str):
+    row = self._connection.execute(
+      "SELECT size FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+    if row is not None:
+      self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+      self._size -= row[0]
+
+  def _evict(self):
+    while self._size > self._max_size:
+      key, size = self._connection.execute(
+        "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1"
+      ).fetchone()
+      self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+      self._size -= size
+
+  @property
+  def size(self) -> int:
+    """The number of bytes of cached responses."""
+    return self._size
+
+  @property
+  def hit_rate(self) -> float:
+    """The share of cacheable requests answered from the cache."""
+    lookups = self.hits + self.misses
+    return self.hits / lookups if lookups else 0.0
+
+  def close(self) -> None:
+    """Close the database of the cache."""
+    with self._lock:
+      self._connection.close()
+
+
+def _cacheable_headers(response: httpx.Response) -> dict[str, str]:
+  return {
+    name: value
+    for name, value in response.headers.items()
+    if name not in _ENCODING_HEADERS
+  }
+
+
+def _remove_validators(request: httpx.Request):
+  request.headers.pop("If-None-Match", None)
+  request.headers.pop("If-Modified-Since", None)
+
+
+class CacheTransport(httpx.BaseTransport):
+  def __init__(self, cache: HttpCache, transport: httpx.BaseTransport):
+    """An httpx transport sending GET requests through an HttpCache.
+
+    Args:
+        cache: The cache of the responses.
+        transport: The transport sending the requests.
+    """
+    self._cache = cache
+    self._transport = transport
+
+  def handle_request(self, request: httpx.Request) -> httpx.Response:
+    key = self._cache.prepare(request)
+    response = self._transport.handle_request(request)
+    if key is None:
+      return response
+    try:
+      response.read()
+    finally:
+      response.close()
+    cached_response = self._cache.process(key, request, response)
+    if cached_response is None:
+      _remove_validators(request)
+      return self._transport.handle_request(request)
+    return cached_response
+
+  def close(self):
+    self._transport.close()
+
+
+class AsyncCacheTransport(httpx.AsyncBaseTransport):
+  def __init__(self, cache: HttpCache, transport: httpx.AsyncBaseTransport):
+    """The asynchronous counterpart of :class:`CacheTransport`.
+
+    The cache is read and written in a worker thread, so its SQLite queries
+    do not block the event loop.
+
+    Args:
+        cache: The cache of the responses.
+        transport: The transport sending the requests.
+    """
+    self._cache = cache
+    self._transport = transport
+
+  async def handle_async_request(
+    self, request: httpx.Request
+  ) -> httpx.Response:
+    key = await asyncio.to_thread(self._cache.prepare, request)
+    response = await self._transport.handle_async_request(request)
+    if key is None:
+      return response
+    try:
+      await response.aread()
+    finally:
+      await response.aclose()
+    cached_response = await asyncio.to_thread(
+      self._cache.process, key, request, response
+    )
+    if cached_response is None:
+      _remove_validators(request)
+      return await self._transport.handle_async_request(request)
+    return cached_response
+
+  async def aclose(self):
+    await self._transport.aclose()
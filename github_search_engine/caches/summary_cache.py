@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+
+class SummaryCache:
+  def __init__(
+    self,
+    max_size: int = 1024,
+    ttl: float | None = None,
+    path: str | None = None,
+    max_disk_size: int = 100_000,
+  ):
+    """A two-tier cache for LLM generated issue summaries.
+
+    Summaries are kept in an in-memory LRU and, when a path is given, in a
+    SQLite database so they survive restarts. Entries older than ``ttl`` are
+    treated as missing, and each tier evicts its least recently used entries
+    once it exceeds its size.
+
+    Args:
+        max_size: The maximum number of summaries held in memory. Default is
+          1024.
+        ttl: The number of seconds a summary stays valid. Default is None,
+          which keeps summaries until they are evicted.
+        path: The path to the SQLite database backing the on-disk tier.
+          Default is None, which disables the on-disk tier.
+        max_disk_size: The maximum number of summaries held on disk. Default is
+          100 000.
+    """
+    self._max_size = max_size
+    self._ttl = ttl
+    self._max_disk_size = max_disk_size
+    self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+    self._connection: sqlite3.Connection | None = None
+    if path is not None:
+      self._connection = sqlite3.connect(path, check_same_thread=False)
+      self._connection.execute(
+        "CREATE TABLE IF NOT EXISTS summaries ("
+        "key TEXT PRIMARY KEY, "
+        "summary TEXT NOT NULL, "
+        "created_at REAL NOT NULL, "
+        "accessed_at REAL NOT NULL)"
+      )
+      self._connection.execute(
+        "CREATE INDEX IF NOT EXISTS summaries_accessed_at "
+        "ON summaries (accessed_at)"
+      )
+      self._connection.commit()
+
+  @staticmethod
+  def make_key(
+    issue_id: Any,
+    updated_at: Any,
+    query: str,
+    model: str,
+    prompt_template: str,
+  ) -> str:
+    """Build the cache key of a summary.
+
+    The key changes whenever the issue is edited, the query differs by more
+    than case and whitespace, or the model or prompt template change.
+
+    Args:
+        issue_id: The id of the summarised issue.
+        updated_at: The last update time of the summarised issue.
+        query: The query the summary relates the issue to.
+        model: The name of the model generating the summary.
+        prompt_template: The template of the summarisation prompt.
+
+    Returns:
+        The cache key of the summary.
+    """
+    if isinstance(updated_at, datetime):
+      updated_at = updated_at.isoformat()
+    key = json.dumps(
+      [
+        str(issue_id),
+        str(updated_at),
+        " ".join(query.casefold().split()),
+        model,
+        hashlib.sha256(prompt_template.encode()).hexdigest(),
+      ]
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+  def _is_expired(self, created_at: float, now: float) -> bool:
+    return self._ttl is not None and now - created_at > self._ttl
+
+  def get(self, key: str) -> str | None:
+    """Look a summary up, first in memory then on disk.
+
+    Args:
+        key: The cache key of the summary.
+
+    Returns:
+        The cached summary, or None if it is missing or expired.
+    """
+    now = time.time()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        summary, created_at = entry
+        if not self._is_expired(created_at, now):
+          self._entries.move_to_end(key)
+          self.hits += 1
+          return summary
+        del self._entries[key]
+
+      if self._connection is not None:
+        row = self._connection.execute(
+          "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+          summary, created_at = row
+          if not self._is_expired(created_at, now):
+            self._connection.execute(
+              "UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self._remember(key, summary, created_at)
+            self.hits += 1
+            return summary
+          self._connection.execute(
+            "DELETE FROM summaries WHERE key = ?", (key,)
+          )
+          self._connection.commit()
+
+      self.misses += 1
+      return None
+
+  def set(self, key: str, summary: str) -> None:
+    """Store a summary in every tier of the cache.
+
+    Args:
+        key: The cache key of the summary.
+        summary: The summary to store.
+    """
+    now = time.time()
+    with self._lock:
+      self._remember(key, summary, now)
+      if self._connection is not None:
+        self._connection.execute(
+          "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+          (key, summary, now, now),
+        )
+        self._connection.execute(
+          "DELETE FROM summaries WHERE key IN ("
+          "SELECT key FROM summaries ORDER BY accessed_at DESC "
+          "LIMIT -1 OFFSET ?)",
+          (self._max_disk_size,),
+        )
+        self._connection.commit()
+
+  async def async_get(self, key: str) -> str | None:
+    """Look a summary up without blocking the event loop on the disk tier.
+
+    Args:
+        key: The cache key of the summary.
+
+    Returns:
+        The cached summary, or None if it is missing or expired.
+    """
+    if self._connection is None:
+      return self.get(key)
+    return await asyncio.to_thread(self.get, key)
+
+  async def async_set(self, key: str, summary: str) -> None:
+    """Store a summary without blocking the event loop on the disk tier.
+
+    Args:
+        key: The cache key of the summary.
+        summary: The summary to store.
+    """
+    if self._connection is None:
+      self.set(key, summary)
+    else:
+      await asyncio.to_thread(self.set, key, summary)
+
+  def _remember(self, key: str, summary: str, created_at: float) -> None:
+    self._entries[key] = (summary, created_at)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self._max_size:
+      self._entries.popitem(last=False)
+
+  @property
+  def hit_rate(self) -> float:
+    """The share of lookups served from the cache."""
+    lookups = self.hits + self.misses
+    return self.hits / lookups if lookups else 0.0
+
+  def close(self) -> None:
+    """Close the on-disk tier of the cache."""
+    if self._connection is not None:
+      self._connection.close()
+      self._connection = None
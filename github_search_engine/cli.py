@@ -16,7 +16,11 @@ from github_search_engine import _cli as cli
 def _run():
   application = Application()
   application.add(cli.ApiCommand())
+  application.add(cli.ExportCommand())
+  application.add(cli.ImportCommand())
   application.add(cli.IndexCommand())
+  application.add(cli.MigrateCommand())
   application.add(cli.SearchCommand())
+  application.add(cli.ServeCommand())
 
   application.run()
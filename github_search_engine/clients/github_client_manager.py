@@ -1,51 +1,245 @@
+from collections.abc import AsyncIterator
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+import httpx
 from githubkit import GitHub
+from githubkit.exception import RequestFailed
 from githubkit.versions.v2022_11_28.models import Issue
 from githubkit.versions.v2022_11_28.models import IssueComment
 from githubkit.versions.v2022_11_28.models import TimelineCrossReferencedEvent
 
+from github_search_engine.caches.http_cache import AsyncCacheTransport
+from github_search_engine.caches.http_cache import CacheTransport
+from github_search_engine.caches.http_cache import HttpCache
+from github_search_engine.clients.request_scheduler import RequestScheduler
+
+
+class CachedGitHub(GitHub):
+  def __init__(self, *args, http_cache: HttpCache, **kwargs):
+    """A GitHub client revalidating its responses against an HttpCache.
+
+    It replaces githubkit's own HTTP cache, which lives in memory and is
+    dropped with the HTTP client after each request.
+
+    Args:
+        *args: The positional arguments of ``GitHub``.
+        http_cache: The cache of the responses.
+        **kwargs: The keyword arguments of ``GitHub``.
+    """
+    super().__init__(*args, http_cache=False, **kwargs)
+    self._http_cache = http_cache
+
+  def _create_sync_client(self) -> httpx.Client:
+    return httpx.Client(
+      **self._get_client_defaults(),
+      transport=CacheTransport(self._http_cache, httpx.HTTPTransport()),
+    )
+
+  def _create_async_client(self) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+      **self._get_client_defaults(),
+      transport=AsyncCacheTransport(
+        self._http_cache, httpx.AsyncHTTPTransport()
+      ),
+    )
+
 
 class GithubClientManager:
-  def __init__(self, access_token: str):
+  def __init__(
+    self,
+    access_token: str | Sequence[str] | None,
+    base_url: str | None = None,
+    max_retries: int = 5,
+    http_cache: HttpCache | None = None,
+  ):
     """A GithubClientManager to handle interactions with the GitHub API.
 
-    Initializes a GitHub API client manager.
+    Initializes a GitHub API client manager. Requests go through a
+    :class:`~github_search_engine.clients.request_scheduler.RequestScheduler`,
+    which keeps within the rate limits of the tokens and retries transient
+    errors.
 
     Args:
         access_token: The personal access token used to authenticate with the GitHub API.
+          Several tokens, as a sequence or separated by commas, are used as a
+          pool to share the rate limit.
+        base_url: The URL of the GitHub REST API. Default is None, which uses
+          https://api.github.com.
+        max_retries: The number of times a failed request is retried. Default
+          is 5.
+        http_cache: The cache of the GitHub responses, revalidated with
+          conditional requests. Default is None, which uses an in-memory
+          cache.
     """
-    self.github_client = GitHub(
-      auth=access_token,
-    )
+    if isinstance(access_token, str):
+      access_token = [
+        token.strip() for token in access_token.split(",") if token.strip()
+      ]
+    self.http_cache = http_cache or HttpCache()
+    clients = [
+      # Retries are left to the scheduler, which can switch tokens.
+      CachedGitHub(
+        auth=token,
+        base_url=base_url,
+        auto_retry=False,
+        http_cache=self.http_cache,
+      )
+      for token in access_token or [None]
+    ]
+    self.github_client = clients[0]
+    self._scheduler = RequestScheduler(clients, max_retries=max_retries)
+
+  def rate_limit(self) -> dict[str, Any]:
+    """Return the GitHub quota left, as reported by the latest responses.
+
+    Returns:
+        The requests left and allowed per window across every token, or None
+        before any response, and the rate limit of each token.
+    """
+    return self._scheduler.quota()
+
+  async def iter_repository_issues(
+    self,
+    owner: str,
+    repository_name: str,
+    since: datetime | None = None,
+  ) -> AsyncIterator[Issue]:
+    """Stream issues from a specified GitHub repository.
+
+    Issues are yielded page by page as they are retrieved from the GitHub API,
+    in ascending order of their last update, so the most recently yielded issue
+    always holds the most recent ``updated_at``.
+
+    Args:
+        owner: The owner of the repository from which to retrieve issues.
+        repository_name: The name of the repository from which to retrieve
+        issues.
+        since: Only retrieve issues updated at or after this time. Default is
+        None, which retrieves every issue.
+
+    Yields:
+        The issues of the specified repository.
+    """
+    filters = {} if since is None else {"since": since}
+    async for issue in self.github_client.paginate(
+      self._scheduler.schedule(
+        "list_repository_issues",
+        lambda client: client.rest.issues.async_list_for_repo,
+      ),
+      owner=owner,
+      repo=repository_name,
+      state="all",
+      sort="updated",
+      direction="asc",
+      **filters,
+    ):
+      issue: Issue
+
+      yield issue
 
   async def get_repository_issues(
-    self, owner: str, repository_name: str
+    self,
+    owner: str,
+    repository_name: str,
+    since: datetime | None = None,
   ) -> list[Issue]:
     """Retrieve issues from a specified GitHub repository.
 
     This function connects to a given GitHub repository and retrieves a list of
-    issues using the GitHub API client. It returns a paginated list of issues
-    associated with the repository.
+    issues using the GitHub API client. Issues are returned in ascending order
+    of their last update, so the last issue holds the most recent
+    ``updated_at``.
 
     Args:
         owner: The owner of the repository from which to retrieve issues.
         repository_name: The name of the repository from which to retrieve
         issues.
+        since: Only retrieve issues updated at or after this time. Default is
+        None, which retrieves every issue.
 
     Returns:
         A paginated list of issues retrieved from the specified
         repository.
     """
-    issues = []
-    async for issue in self.github_client.paginate(
-      self.github_client.rest.issues.async_list_for_repo,
+    return [
+      issue
+      async for issue in self.iter_repository_issues(
+        owner, repository_name, since=since
+      )
+    ]
+
+  async def iter_repository_comments(
+    self,
+    owner: str,
+    repository_name: str,
+    since: datetime | None = None,
+  ) -> AsyncIterator[IssueComment]:
+    """Stream the comments of every issue in a GitHub repository.
+
+    Comments are retrieved through the repository-wide listing, in ascending
+    order of their last update, so a whole repository costs one paginated
+    stream rather than one request per issue.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        since: Only retrieve comments updated at or after this time. Default is
+        None, which retrieves every comment.
+
+    Yields:
+        The issue comments of the specified repository.
+    """
+    filters = {} if since is None else {"since": since}
+    async for comment in self.github_client.paginate(
+      self._scheduler.schedule(
+        "list_repository_comments",
+        lambda client: client.rest.issues.async_list_comments_for_repo,
+      ),
       owner=owner,
       repo=repository_name,
-      state="all",
+      sort="updated",
+      direction="asc",
+      **filters,
     ):
-      issue: Issue
+      comment: IssueComment
+
+      yield comment
 
-      issues.append(issue)
-    return issues
+  async def async_get_issue(
+    self, owner: str, repository_name: str, issue_number: int
+  ) -> Issue | None:
+    """Retrieve an issue or a pull request of a repository.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        issue_number: The number of the issue.
+
+    Returns:
+        The issue, or None if it was deleted or transferred to another
+        repository.
+    """
+    try:
+      response = await self._scheduler.schedule(
+        "get_issue", lambda client: client.rest.issues.async_get
+      )(
+        owner=owner,
+        repo=repository_name,
+        issue_number=issue_number,
+      )
+    except RequestFailed as exception:
+      if exception.response.status_code in (404, 410):
+        return None
+      raise
+    issue = response.parsed_data
+    # Transferred issues are redirected to their new repository.
+    if not issue.repository_url.lower().endswith(
+      f"/repos/{owner}/{repository_name}".lower()
+    ):
+      return None
+    return issue
 
   def get_issue_comments(
     self, owner: str, repository_name: str, issue_number: int
@@ -60,12 +254,43 @@ class GithubClientManager:
     Returns:
         A list of comments for the specified issue.
     """
-    return self.github_client.rest.issues.list_comments(
+    return self._scheduler.schedule(
+      "list_issue_comments", lambda client: client.rest.issues.list_comments
+    )(
       owner=owner,
       repo=repository_name,
       issue_number=issue_number,
     ).parsed_data
 
+  async def async_get_issue_comments(
+    self, owner: str, repository_name: str, issue_number: int
+  ) -> list[IssueComment]:
+    """Retrieve every comment for a specific issue in a repository.
+
+    Unlike :meth:`get_issue_comments`, all the pages of comments are retrieved,
+    so long discussions are not cut off.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        issue_number: The number of the issue.
+
+    Returns:
+        A list of comments for the specified issue.
+    """
+    return [
+      comment
+      async for comment in self.github_client.paginate(
+        self._scheduler.schedule(
+          "list_issue_comments",
+          lambda client: client.rest.issues.async_list_comments,
+        ),
+        owner=owner,
+        repo=repository_name,
+        issue_number=issue_number,
+      )
+    ]
+
   def get_issue_references(
     self,
     owner: str,
@@ -86,7 +311,10 @@ class GithubClientManager:
     Returns:
         A list of cross-referenced events.
     """
-    timeline = self.github_client.rest.issues.list_events_for_timeline(
+    timeline = self._scheduler.schedule(
+      "list_issue_timeline",
+      lambda client: client.rest.issues.list_events_for_timeline,
+    )(
       owner=owner,
       repo=repository_name,
       issue_number=issue_number,
@@ -1,15 +1,181 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+import math
+from typing import Any
 from typing import Sequence
 
 import ollama
 from ollama import GenerateResponse
 from ollama import Options
 
+from github_search_engine import metrics
+from github_search_engine.normalization import count_tokens
+
+
+# The context windows offered to the LLM, before its maximum. Ollama reloads
+# the model whenever a call asks for another context window than the loaded
+# one, so prompts are rounded up to a few sizes rather than fitted exactly.
+CONTEXT_SIZES = (4096, 8192, 16384, 32768, 65536)
+# Tokens are approximated as words and punctuation marks, which undercounts
+# the subword tokens of the model.
+PROMPT_TOKEN_MARGIN = 1.25
+
+
+def context_size(
+  prompt: str, max_output_tokens: int, max_context_size: int
+) -> tuple[int, int]:
+  """Pick the smallest context window holding a prompt and its response.
+
+  Args:
+      prompt: The text sent to the model.
+      max_output_tokens: The number of tokens generated at most.
+      max_context_size: The largest context window of the model.
+
+  Returns:
+      The context window, and the estimated number of tokens of the prompt.
+  """
+  prompt_tokens = count_tokens(prompt)
+  needed = math.ceil(prompt_tokens * PROMPT_TOKEN_MARGIN) + max_output_tokens
+  for size in CONTEXT_SIZES:
+    if needed <= size:
+      return min(size, max_context_size), prompt_tokens
+  return max_context_size, prompt_tokens
+
+
+@dataclasses.dataclass(frozen=True)
+class LLMCallStats:
+  """The tokens and latency of a call to the LLM.
+
+  Attributes:
+      call: "generate" or "embed".
+      context_size: The context window of the call, which sizes the KV cache
+        of the model.
+      estimated_prompt_tokens: The approximate tokens of the prompt, from
+        which the context window was picked.
+      prompt_tokens: The tokens of the prompt read by the model, excluding
+        any prefix it had cached.
+      output_tokens: The tokens generated.
+      load_seconds: The time spent loading the model.
+      prompt_seconds: The time spent reading the prompt.
+      generation_seconds: The time spent generating.
+      total_seconds: The time spent by the server on the call.
+  """
+
+  call: str
+  context_size: int
+  estimated_prompt_tokens: int
+  prompt_tokens: int = 0
+  output_tokens: int = 0
+  load_seconds: float = 0
+  prompt_seconds: float = 0
+  generation_seconds: float = 0
+  total_seconds: float = 0
+
+
+def _seconds(nanoseconds: int | None) -> float:
+  return (nanoseconds or 0) / 1e9
+
+
+def record_usage(
+  response: Any, call: str, context_size: int, estimated_prompt_tokens: int
+) -> LLMCallStats:
+  """Count the tokens of a call and record its context window and latency."""
+  stats = LLMCallStats(
+    call=call,
+    context_size=context_size,
+    estimated_prompt_tokens=estimated_prompt_tokens,
+    prompt_tokens=getattr(response, "prompt_eval_count", None) or 0,
+    output_tokens=getattr(response, "eval_count", None) or 0,
+    load_seconds=_seconds(getattr(response, "load_duration", None)),
+    prompt_seconds=_seconds(getattr(response, "prompt_eval_duration", None)),
+    generation_seconds=_seconds(getattr(response, "eval_duration", None)),
+    total_seconds=_seconds(getattr(response, "total_duration", None)),
+  )
+  metrics.LLM_TOKENS.inc(stats.prompt_tokens, direction="in")
+  metrics.LLM_TOKENS.inc(stats.output_tokens, direction="out")
+  metrics.LLM_CONTEXT_SIZE.observe(stats.context_size, call=call)
+  if stats.total_seconds:
+    metrics.LLM_CALL_SECONDS.observe(stats.load_seconds, phase="load")
+    metrics.LLM_CALL_SECONDS.observe(stats.prompt_seconds, phase="prompt")
+    metrics.LLM_CALL_SECONDS.observe(
+      stats.generation_seconds, phase="generation"
+    )
+  if stats.output_tokens and stats.generation_seconds:
+    metrics.LLM_TOKENS_PER_SECOND.observe(
+      stats.output_tokens / stats.generation_seconds
+    )
+  logging.debug(
+    f"LLM {call}: {stats.estimated_prompt_tokens} estimated and "
+    f"{stats.prompt_tokens} read prompt tokens, {stats.output_tokens} output "
+    f"tokens, {stats.context_size} context, {stats.total_seconds:.2f}s"
+  )
+  return stats
+
 
 class OllamaClientManager:
-  def __init__(self):
-    self.client = ollama.Client(host="http://localhost:11434")
+  def __init__(
+    self,
+    host: str = "http://localhost:11434",
+    max_context_size: int = 128_000,
+    max_output_tokens: int = 512,
+  ):
+    """An OllamaClientManager to handle interactions with the Ollama API.
+
+    Each call asks for the smallest context window of ``CONTEXT_SIZES``
+    holding its estimated prompt and response, rather than the largest one
+    the model supports, which saves the memory of its KV cache and speeds
+    its first token up.
+
+    Args:
+        host: The URL of the Ollama server. Default is
+          "http://localhost:11434".
+        max_context_size: The largest context window of a call. Default is
+          128 000, the context of llama3.1.
+        max_output_tokens: The number of tokens generated at most per call.
+          Default is 512.
+    """
+    self._host = host
+    self.client = ollama.Client(host=host)
+    self._async_client: ollama.AsyncClient | None = None
+    self._async_client_loop: asyncio.AbstractEventLoop | None = None
     self._model = "llama3.1:8b"
-    self._context_size = 128_000
+    self._max_context_size = max_context_size
+    self._max_output_tokens = max_output_tokens
+    self.recent_calls: collections.deque[LLMCallStats] = collections.deque(
+      maxlen=1000
+    )
+
+  @property
+  def model(self) -> str:
+    """The name of the model used to generate responses."""
+    return self._model
+
+  @property
+  def async_client(self) -> ollama.AsyncClient:
+    """An asynchronous Ollama client bound to the running event loop.
+
+    The underlying connection pool cannot outlive its event loop, so a new
+    client is created whenever the manager is used from a different loop.
+    """
+    loop = asyncio.get_running_loop()
+    if self._async_client is None or self._async_client_loop is not loop:
+      self._async_client = ollama.AsyncClient(host=self._host)
+      self._async_client_loop = loop
+    return self._async_client
+
+  def _generate_options(self, prompt: str) -> tuple[Options, int, int]:
+    num_ctx, prompt_tokens = context_size(
+      prompt, self._max_output_tokens, self._max_context_size
+    )
+    options = Options(
+      num_ctx=num_ctx, num_predict=self._max_output_tokens, temperature=0
+    )
+    return options, num_ctx, prompt_tokens
+
+  def _record(self, response: Any, call: str, num_ctx: int, tokens: int):
+    self.recent_calls.append(record_usage(response, call, num_ctx, tokens))
 
   def embed(self, content: str) -> Sequence[Sequence[float]]:
     """Returns the LLM's embedding for the given input text.
@@ -20,11 +186,13 @@ class OllamaClientManager:
     Returns:
       The embedding vector for the corresponding segment of the input content.
     """
+    num_ctx, prompt_tokens = context_size(content, 0, self._max_context_size)
     response = self.client.embed(
       model=self._model,
       input=content,
-      options=Options(num_ctx=self._context_size),
+      options=Options(num_ctx=num_ctx),
     )
+    self._record(response, "embed", num_ctx, prompt_tokens)
     return response.embeddings
 
   def chat(self, prompt: str) -> str:
@@ -36,12 +204,31 @@ class OllamaClientManager:
     Returns:
         The generated response.
     """
-    response: GenerateResponse = self.client.generate(
-      model=self._model,
-      prompt=prompt,
-      options=Options(
-        num_ctx=self._context_size,
-        temperature=0,
-      ),
-    )
+    options, num_ctx, prompt_tokens = self._generate_options(prompt)
+    with metrics.stage("llm_generate"):
+      response: GenerateResponse = self.client.generate(
+        model=self._model,
+        prompt=prompt,
+        options=options,
+      )
+    self._record(response, "generate", num_ctx, prompt_tokens)
+    return response.response
+
+  async def async_chat(self, prompt: str) -> str:
+    """Generates a response to the input prompt without blocking the loop.
+
+    Args:
+        prompt: The input text to generate a response for.
+
+    Returns:
+        The generated response.
+    """
+    options, num_ctx, prompt_tokens = self._generate_options(prompt)
+    with metrics.stage("llm_generate"):
+      response: GenerateResponse = await self.async_client.generate(
+        model=self._model,
+        prompt=prompt,
+        options=options,
+      )
+    self._record(response, "generate", num_ctx, prompt_tokens)
     return response.response
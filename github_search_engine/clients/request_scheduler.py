@@ -0,0 +1,356 @@
+import asyncio
+import dataclasses
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Mapping
+from collections.abc import Sequence
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import TypeVar
+
+from githubkit import GitHub
+from githubkit import Response
+from githubkit.exception import GitHubException
+from githubkit.exception import RateLimitExceeded
+from githubkit.exception import RequestError
+from githubkit.exception import RequestFailed
+
+from github_search_engine import metrics
+
+
+RequestT = TypeVar("RequestT", bound=Callable)
+
+
+def record_response(endpoint: str, response: Response):
+  """Count a GitHub response and record the rate limit it reports."""
+  metrics.GITHUB_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+  remaining = response.headers.get("x-ratelimit-remaining")
+  if remaining is not None:
+    metrics.GITHUB_RATE_LIMIT_REMAINING.set(
+      int(remaining),
+      resource=response.headers.get("x-ratelimit-resource", "core"),
+    )
+
+
+def instrument(endpoint: str, request: RequestT) -> RequestT:
+  """Wrap a githubkit request method to record its latency and response.
+
+  Args:
+      endpoint: The name of the endpoint, used as the ``endpoint`` label.
+      request: A synchronous or asynchronous githubkit request method.
+
+  Returns:
+      The wrapped request method.
+  """
+  if inspect.iscoroutinefunction(request):
+
+    @functools.wraps(request)
+    async def instrumented_async_request(*args, **kwargs):
+      with metrics.GITHUB_REQUEST_SECONDS.time(endpoint=endpoint):
+        try:
+          response = await request(*args, **kwargs)
+        except RequestFailed as exception:
+          record_response(endpoint, exception.response)
+          raise
+      record_response(endpoint, response)
+      return response
+
+    return instrumented_async_request
+
+  @functools.wraps(request)
+  def instrumented_request(*args, **kwargs):
+    with metrics.GITHUB_REQUEST_SECONDS.time(endpoint=endpoint):
+      try:
+        response = request(*args, **kwargs)
+      except RequestFailed as exception:
+        record_response(endpoint, exception.response)
+        raise
+    record_response(endpoint, response)
+    return response
+
+  return instrumented_request
+
+
+@dataclasses.dataclass
+class RateLimit:
+  """The rate limit of a token, as last reported by GitHub.
+
+  Attributes:
+      limit: The number of requests allowed per window, or None until a
+        response reported it.
+      remaining: The number of requests left in the current window.
+      reset_at: When the current window ends, in seconds since the epoch.
+      blocked_until: No request is sent with the token before this time, in
+        seconds since the epoch, after a secondary rate limit.
+      last_request_at: When the last request was sent with the token, in
+        seconds since the epoch.
+  """
+
+  limit: int | None = None
+  remaining: int | None = None
+  reset_at: float | None = None
+  blocked_until: float = 0
+  last_request_at: float = 0
+
+  def update(self, headers: Mapping[str, str]):
+    """Read the X-RateLimit headers of a response."""
+    if "x-ratelimit-remaining" not in headers:
+      return
+    self.remaining = int(headers["x-ratelimit-remaining"])
+    if "x-ratelimit-limit" in headers:
+      self.limit = int(headers["x-ratelimit-limit"])
+    if "x-ratelimit-reset" in headers:
+      self.reset_at = float(headers["x-ratelimit-reset"])
+
+  def available_at(self, now: float, reserve: float) -> float:
+    """Return when the next request may be sent with the token.
+
+    Once fewer than ``reserve`` of the requests of the window are left, the
+    remaining requests are spread evenly until the window ends, so the quota
+    is never exhausted while other clients share it.
+
+    Args:
+        now: The current time, in seconds since the epoch.
+        reserve: The fraction of the limit kept in reserve.
+    """
+    available_at = self.blocked_until
+    if self.remaining is None or self.reset_at is None or now >= self.reset_at:
+      return available_at
+    if self.remaining <= 0:
+      return max(available_at, self.reset_at)
+    if self.limit and self.remaining < reserve * self.limit:
+      interval = (self.reset_at - now) / self.remaining
+      return max(available_at, self.last_request_at + interval)
+    return available_at
+
+  def to_dict(self) -> dict[str, Any]:
+    """Return a JSON serialisable view of the rate limit."""
+
+    def isoformat(timestamp: float | None) -> str | None:
+      if not timestamp:
+        return None
+      return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+    return {
+      "limit": self.limit,
+      "remaining": self.remaining,
+      "reset_at": isoformat(self.reset_at),
+      "blocked_until": isoformat(self.blocked_until),
+    }
+
+
+def _remaining(rate_limit: RateLimit) -> float:
+  # Tokens which never answered yet have their whole quota left.
+  if rate_limit.remaining is None:
+    return float("inf")
+  return rate_limit.remaining
+
+
+class RequestScheduler:
+  def __init__(
+    self,
+    clients: Sequence[GitHub],
+    reserve: float = 0.1,
+    max_retries: int = 5,
+    backoff: float = 1,
+    max_backoff: float = 60,
+  ):
+    """Send GitHub requests within the rate limits of a pool of tokens.
+
+    Each request is sent with the token which can be used the soonest,
+    preferring the one with the most requests left. Requests are paced
+    before a token runs out, and a token which hit a rate limit is rested
+    until GitHub allows it again. Server errors, timeouts and network
+    errors are retried with exponential backoff and full jitter.
+
+    Args:
+        clients: One GitHub client per token.
+        reserve: Pace requests once fewer than this fraction of the limit of
+          a token is left. Default is 0.1.
+        max_retries: The number of times a failed request is retried.
+          Default is 5.
+        backoff: The base delay of retries, in seconds. Default is 1.
+        max_backoff: The longest delay between retries, in seconds. Default
+          is 60.
+    """
+    if not clients:
+      raise ValueError("At least one GitHub client is required.")
+    self.clients = list(clients)
+    self.rate_limits = [RateLimit() for _ in self.clients]
+    self.reserve = reserve
+    self.max_retries = max_retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self._lock = threading.Lock()
+
+  def _acquire(self) -> tuple[int, float]:
+    """Pick the token of the next request and reserve it.
+
+    Returns:
+        The index of the token, and the number of seconds to wait before
+        sending the request.
+    """
+    with self._lock:
+      now = time.time()
+      index = min(
+        range(len(self.clients)),
+        key=lambda index: (
+          max(now, self.rate_limits[index].available_at(now, self.reserve)),
+          -_remaining(self.rate_limits[index]),
+        ),
+      )
+      rate_limit = self.rate_limits[index]
+      delay = max(0, rate_limit.available_at(now, self.reserve) - now)
+      rate_limit.last_request_at = now + delay
+      if rate_limit.remaining is not None:
+        rate_limit.remaining -= 1
+      return index, delay
+
+  def _retry_delay(
+    self, endpoint: str, index: int, exception: GitHubException, attempt: int
+  ) -> float | None:
+    """Return how long to wait before retrying a failed request.
+
+    Args:
+        endpoint: The name of the endpoint.
+        index: The index of the token the request was sent with.
+        exception: The error of the request.
+        attempt: The number of the failed attempt, from 0.
+
+    Returns:
+        The number of seconds to wait, or None if the request must not be
+        retried.
+    """
+    if attempt >= self.max_retries:
+      return None
+    if isinstance(exception, RateLimitExceeded):
+      reason = "rate_limit"
+      rate_limit = self.rate_limits[index]
+      rate_limit.update(exception.response.headers)
+      # githubkit reads Retry-After, or the reset of an exhausted quota.
+      rate_limit.blocked_until = (
+        time.time() + exception.retry_after.total_seconds()
+      )
+      # Another token of the pool may be used right away.
+      delay = 0
+    elif isinstance(exception, RequestFailed):
+      if exception.response.status_code < 500:
+        return None
+      reason = "server_error"
+      delay = self._backoff(attempt)
+    elif isinstance(exception, RequestError):
+      reason = "network_error"
+      delay = self._backoff(attempt)
+    else:
+      return None
+    metrics.GITHUB_RETRIES.inc(endpoint=endpoint, reason=reason)
+    logging.warning(
+      f"GitHub request to {endpoint} failed with {exception!r}, retrying "
+      f"({attempt + 1}/{self.max_retries})"
+    )
+    return delay
+
+  def _backoff(self, attempt: int) -> float:
+    return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+  def _log_throttling(self, endpoint: str, delay: float):
+    if delay >= 1:
+      logging.info(
+        f"Waiting {delay:.1f}s for the GitHub rate limit before requesting "
+        f"{endpoint}"
+      )
+
+  def schedule(
+    self, endpoint: str, select: Callable[[GitHub], RequestT]
+  ) -> RequestT:
+    """Wrap a githubkit request method to send it through the scheduler.
+
+    Args:
+        endpoint: The name of the endpoint, used as the ``endpoint`` label.
+        select: Return the request method of a GitHub client, for example
+          ``lambda client: client.rest.issues.async_list_for_repo``.
+
+    Returns:
+        A request method with the signature of the selected one.
+    """
+    template = select(self.clients[0])
+    if inspect.iscoroutinefunction(template):
+
+      @functools.wraps(template)
+      async def scheduled_async_request(*args, **kwargs):
+        attempt = 0
+        while True:
+          index, delay = self._acquire()
+          if delay:
+            self._log_throttling(endpoint, delay)
+            with metrics.stage("github_throttle"):
+              await asyncio.sleep(delay)
+          request = instrument(endpoint, select(self.clients[index]))
+          try:
+            response = await request(*args, **kwargs)
+          except GitHubException as exception:
+            retry_delay = self._retry_delay(
+              endpoint, index, exception, attempt
+            )
+            if retry_delay is None:
+              raise
+            attempt += 1
+            await asyncio.sleep(retry_delay)
+            continue
+          self.rate_limits[index].update(response.headers)
+          return response
+
+      return scheduled_async_request
+
+    @functools.wraps(template)
+    def scheduled_request(*args, **kwargs):
+      attempt = 0
+      while True:
+        index, delay = self._acquire()
+        if delay:
+          self._log_throttling(endpoint, delay)
+          with metrics.stage("github_throttle"):
+            time.sleep(delay)
+        request = instrument(endpoint, select(self.clients[index]))
+        try:
+          response = request(*args, **kwargs)
+        except GitHubException as exception:
+          retry_delay = self._retry_delay(endpoint, index, exception, attempt)
+          if retry_delay is None:
+            raise
+          attempt += 1
+          time.sleep(retry_delay)
+          continue
+        self.rate_limits[index].update(response.headers)
+        return response
+
+    return scheduled_request
+
+  def quota(self) -> dict[str, Any]:
+    """Return the rate limits of the pool, as last reported by GitHub.
+
+    Returns:
+        The requests left and allowed per window across the tokens which
+        reported their rate limit, or None before any response, and the rate
+        limit of each token in the order of the pool.
+    """
+    known = [
+      rate_limit
+      for rate_limit in self.rate_limits
+      if rate_limit.remaining is not None
+    ]
+    remaining = limit = None
+    if known:
+      remaining = sum(max(0, rate_limit.remaining) for rate_limit in known)
+      limit = sum(rate_limit.limit or 0 for rate_limit in known)
+    return {
+      "remaining": remaining,
+      "limit": limit,
+      "tokens": [rate_limit.to_dict() for rate_limit in self.rate_limits],
+    }
@@ -0,0 +1,117 @@
+import dataclasses
+from typing import Any
+
+from qdrant_client.http.models import BinaryQuantization
+from qdrant_client.http.models import BinaryQuantizationConfig
+from qdrant_client.http.models import HnswConfigDiff
+from qdrant_client.http.models import QuantizationSearchParams
+from qdrant_client.http.models import ScalarQuantization
+from qdrant_client.http.models import ScalarQuantizationConfig
+from qdrant_client.http.models import ScalarType
+from qdrant_client.http.models import SearchParams
+from qdrant_client.http.models import VectorParams
+
+
+QUANTIZATION_TYPES = ("scalar", "binary")
+
+
+@dataclasses.dataclass(frozen=True)
+class CollectionOptions:
+  """How the collection of a repository is stored and searched.
+
+  The storage options only apply when a collection is created, the search
+  options apply to every query. The defaults match Qdrant's, which keep full
+  precision vectors and payloads in memory. The local Qdrant modes always
+  search exhaustively and ignore these options, so they only take effect
+  with a Qdrant server.
+
+  Attributes:
+      quantization: Compress vectors with "scalar" (int8, 4x smaller) or
+        "binary" (1 bit per dimension, 32x smaller) quantization. Default is
+        None, which keeps float32 vectors only.
+      on_disk_vectors: Keep the original vectors on disk. Combined with
+        quantization, only the compressed vectors stay in memory. Default is
+        False.
+      on_disk_payload: Keep payloads on disk. Default is False.
+      hnsw_m: The number of edges per node of the HNSW graph. Default is
+        None, which uses Qdrant's default of 16.
+      hnsw_ef_construct: The size of the candidate list while building the
+        HNSW graph. Default is None, which uses Qdrant's default of 100.
+      search_ef: The size of the candidate list while searching the HNSW
+        graph. Default is None, which uses Qdrant's default.
+      oversampling: Fetch this many times more candidates using the
+        quantized vectors before rescoring them. Default is None, which uses
+        Qdrant's default.
+      rescore: Rescore the candidates found with quantized vectors using the
+        original vectors. Default is True.
+  """
+
+  quantization: str | None = None
+  on_disk_vectors: bool = False
+  on_disk_payload: bool = False
+  hnsw_m: int | None = None
+  hnsw_ef_construct: int | None = None
+  search_ef: int | None = None
+  oversampling: float | None = None
+  rescore: bool = True
+
+  def __post_init__(self):
+    if (
+      self.quantization is not None
+      and self.quantization not in QUANTIZATION_TYPES
+    ):
+      raise ValueError(
+        f"Unknown quantization: {self.quantization}. Available quantizations "
+        f"are: {', '.join(QUANTIZATION_TYPES)}."
+      )
+
+  def create_collection_arguments(
+    self, vector_name: str, vector_params: VectorParams
+  ) -> dict[str, Any]:
+    """Return the arguments creating a collection with these options.
+
+    Args:
+        vector_name: The name of the vector field.
+        vector_params: The size and distance of the vectors.
+
+    Returns:
+        The keyword arguments of ``create_collection``, besides the name of
+        the collection.
+    """
+    hnsw_config = None
+    if self.hnsw_m is not None or self.hnsw_ef_construct is not None:
+      hnsw_config = HnswConfigDiff(
+        m=self.hnsw_m, ef_construct=self.hnsw_ef_construct
+      )
+
+    quantization_config = None
+    if self.quantization == "scalar":
+      quantization_config = ScalarQuantization(
+        scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+      )
+    elif self.quantization == "binary":
+      quantization_config = BinaryQuantization(
+        binary=BinaryQuantizationConfig(always_ram=True)
+      )
+
+    return {
+      "vectors_config": {
+        vector_name: vector_params.model_copy(
+          update={"on_disk": self.on_disk_vectors or None}
+        )
+      },
+      "hnsw_config": hnsw_config,
+      "quantization_config": quantization_config,
+      "on_disk_payload": self.on_disk_payload or None,
+    }
+
+  def search_params(self) -> SearchParams | None:
+    """Return the search parameters of queries, or None for the defaults."""
+    quantization = None
+    if self.oversampling is not None or not self.rescore:
+      quantization = QuantizationSearchParams(
+        rescore=self.rescore, oversampling=self.oversampling
+      )
+    if self.search_ef is None and quantization is None:
+      return None
+    return SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
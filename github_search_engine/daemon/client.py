@@ -0,0 +1,99 @@
+import json
+import os
+import socket
+import tempfile
+from typing import Any
+
+
+SOCKET_PATH_ENVIRONMENT_VARIABLE = "GITHUB_SEARCH_ENGINE_SOCKET"
+
+
+class DaemonError(Exception):
+  """Raised when the daemon could not handle a request."""
+
+
+def default_socket_path() -> str:
+  """Return the socket path used when none is given.
+
+  The path can be set with the ``GITHUB_SEARCH_ENGINE_SOCKET`` environment
+  variable. It defaults to a per-user socket in the temporary directory.
+  """
+  socket_path = os.environ.get(SOCKET_PATH_ENVIRONMENT_VARIABLE)
+  if socket_path:
+    return socket_path
+  user_id = os.getuid() if hasattr(os, "getuid") else 0
+  return os.path.join(
+    tempfile.gettempdir(), f"github-search-engine-{user_id}.sock"
+  )
+
+
+def storage_id(db_path: str | None, db_location: str) -> str:
+  """Identify the Qdrant storage opened for the given CLI options.
+
+  The CLI only forwards a request when the daemon serves the same storage as
+  the one the command would have opened itself.
+  """
+  if db_path:
+    return os.path.abspath(db_path)
+  return db_location
+
+
+class DaemonClient:
+  def __init__(self, socket_path: str | None = None):
+    """A client forwarding CLI requests to a running daemon.
+
+    Requests and responses are single lines of JSON sent over a Unix socket.
+    This module only depends on the standard library, so checking for a
+    daemon does not pay for the imports of the search engine.
+
+    Args:
+        socket_path: The path to the socket of the daemon. Default is None,
+          which uses :func:`default_socket_path`.
+    """
+    self.socket_path = socket_path or default_socket_path()
+
+  def ping(self) -> dict[str, Any] | None:
+    """Return the status of the daemon, or None if none is listening.
+
+    The status holds the pid of the daemon and the storage it serves, as
+    returned by :func:`storage_id`.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(self.socket_path):
+      return None
+    try:
+      return self.request("ping", timeout=1)
+    except (OSError, ValueError, DaemonError):
+      return None
+
+  def request(
+    self, command: str, timeout: float | None = None, **arguments: Any
+  ) -> Any:
+    """Send a request to the daemon and wait for its response.
+
+    Args:
+        command: The name of the command to run.
+        timeout: The number of seconds to wait for the response. Default is
+          None, which waits until the command completes.
+        **arguments: The arguments of the command.
+
+    Returns:
+        The result of the command.
+
+    Raises:
+        OSError: If the daemon could not be reached.
+        DaemonError: If the daemon failed to run the command.
+    """
+    request = {"command": command, "arguments": arguments}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+      connection.settimeout(timeout)
+      connection.connect(self.socket_path)
+      connection.sendall(json.dumps(request).encode() + b"\n")
+      with connection.makefile("rb") as stream:
+        line = stream.readline()
+
+    if not line:
+      raise DaemonError("The daemon closed the connection.")
+    response = json.loads(line)
+    if "error" in response:
+      raise DaemonError(response["error"])
+    return response["result"]
@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections.abc import Sequence
+from typing import Any
+
+from github_search_engine.daemon.client import DaemonClient
+from github_search_engine.daemon.client import DaemonError
+from github_search_engine.github_search_engine import DEFAULT_SEARCH_MODE
+from github_search_engine.github_search_engine import GithubSearchEngine
+from github_search_engine.github_search_engine import IndexProgress
+from github_search_engine.github_search_engine import search_result_dict
+from github_search_engine.search_filter import SearchFilter
+
+
+class SearchEngineDaemon:
+  def __init__(
+    self,
+    search_engine: GithubSearchEngine,
+    storage: str,
+    socket_path: str | None = None,
+    shared_collection: str | None = None,
+  ):
+    """Serve one warm search engine to the CLI over a Unix socket.
+
+    The embedding model is loaded once when the daemon starts, and the local
+    Qdrant storage stays open for its whole lifetime, so forwarded commands
+    skip the cold start and several shells can share one on-disk index.
+    Commands run concurrently, so searches are answered while a repository
+    is being indexed. Indexing a repository which is already being indexed
+    waits for the running crawl and returns its progress rather than
+    crawling the repository twice.
+
+    Args:
+        search_engine: The search engine answering the requests.
+        storage: The storage opened by the search engine, as returned by
+          :func:`~github_search_engine.daemon.client.storage_id`.
+        socket_path: The path of the socket to listen on. Default is None,
+          which uses the default socket path.
+        shared_collection: The collection shared by every repository of the
+          search engine, if any. Default is None.
+    """
+    self._search_engine = search_engine
+    self._storage = storage
+    self._shared_collection = shared_collection
+    self._client = DaemonClient(socket_path)
+    self.socket_path = self._client.socket_path
+    # The running crawl of each repository being indexed.
+    self._indexing: dict[str, asyncio.Future[dict[str, Any]]] = {}
+    self._commands = {
+      "ping": self._ping,
+      "search": self._search,
+      "search_batch": self._search_batch,
+      "index": self._index,
+    }
+
+  async def serve_forever(self):
+    """Listen on the socket until the daemon is stopped.
+
+    Raises:
+        DaemonError: If another daemon is already listening on the socket.
+    """
+    self._remove_stale_socket()
+    await asyncio.to_thread(self._search_engine.load_models)
+
+    # The socket is created accessible to its owner only, so other users can
+    # never connect, not even before its permissions could be changed.
+    umask = os.umask(0o177)
+    try:
+      server = await asyncio.start_unix_server(
+        self._handle_connection, path=self.socket_path
+      )
+    finally:
+      os.umask(umask)
+    try:
+      async with server:
+        await server.serve_forever()
+    finally:
+      with contextlib.suppress(FileNotFoundError):
+        os.unlink(self.socket_path)
+
+  def _remove_stale_socket(self):
+    if not os.path.exists(self.socket_path):
+      return
+    if self._client.ping() is not None:
+      raise DaemonError(
+        f"A daemon is already listening on {self.socket_path}."
+      )
+    # Left behind by a daemon which did not shut down cleanly.
+    os.unlink(self.socket_path)
+
+  async def _handle_connection(
+    self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+  ):
+    try:
+      line = await reader.readline()
+      if not line:
+        return
+      try:
+        request = json.loads(line)
+        command = self._commands.get(request.get("command"))
+        if command is None:
+          raise DaemonError(f"Unknown command: {request.get('command')}")
+        response = {"result": await command(**request.get("arguments", {}))}
+      except DaemonError as exception:
+        response = {"error": str(exception)}
+      except Exception as exception:
+        logging.exception("The daemon failed to handle a request")
+        response = {"error": f"{type(exception).__name__}: {exception}"}
+
+      writer.write(json.dumps(response).encode() + b"\n")
+      await writer.drain()
+    finally:
+      writer.close()
+      with contextlib.suppress(ConnectionError):
+        await writer.wait_closed()
+
+  async def _ping(self) -> dict[str, Any]:
+    return {
+      "pid": os.getpid(),
+      "storage": self._storage,
+      "shared_collection": self._shared_collection,
+    }
+
+  async def _search(
+    self,
+    owner: str,
+    repository_name: str,
+    query: str,
+    search_filter: dict[str, Any] | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+    repositories: Sequence[str] | None = None,
+  ) -> str | None:
+    if repositories is None:
+      if not await asyncio.to_thread(
+        self._search_engine.repository_exists, owner, repository_name
+      ):
+        raise DaemonError(
+          "DB Collection not found. Try indexing the repository first."
+        )
+      repositories = [f"{owner}/{repository_name}"]
+    results = await asyncio.to_thread(
+      self._search_engine.search_repositories,
+      repositories,
+      query,
+      SearchFilter.from_dict(search_filter or {}),
+      mode,
+    )
+    if not results:
+      return None
+    return await self._search_engine.async_summarise_results(
+      results, owner, repository_name, query
+    )
+
+  async def _search_batch(
+    self,
+    repositories: Sequence[str],
+    queries: Sequence[str],
+    search_filter: dict[str, Any] | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+    summarise: bool = False,
+  ) -> list[dict[str, Any]]:
+    batch_results = await asyncio.to_thread(
+      self._search_engine.search_batch,
+      repositories,
+      queries,
+      SearchFilter.from_dict(search_filter or {}),
+      mode,
+    )
+    responses = []
+    for query, results in zip(queries, batch_results):
+      response = {
+        "query": query,
+        "results": [search_result_dict(result) for result in results],
+      }
+      if summarise:
+        owner, repository_name = repositories[0].split("/", 1)
+        response["summary"] = (
+          await self._search_engine.async_summarise_results(
+            results, owner, repository_name, query
+          )
+          if results
+          else None
+        )
+      responses.append(response)
+    return responses
+
+  async def _index(
+    self,
+    owner: str,
+    repository_name: str,
+    incremental: bool = False,
+    payload_fields: Sequence[str] = (),
+  ) -> dict[str, Any]:
+    repository = f"{owner}/{repository_name}"
+    crawl = self._indexing.get(repository)
+    if crawl is None:
+      crawl = asyncio.ensure_future(
+        self._index_repository(
+          owner, repository_name, incremental, payload_fields
+        )
+      )
+      self._indexing[repository] = crawl
+      crawl.add_done_callback(lambda _: self._indexing.pop(repository))
+    # A client hanging up does not stop the crawl shared with the others.
+    return await asyncio.shield(crawl)
+
+  async def _index_repository(
+    self,
+    owner: str,
+    repository_name: str,
+    incremental: bool,
+    payload_fields: Sequence[str],
+  ) -> dict[str, Any]:
+    progress = IndexProgress()
+    await self._search_engine.index_repository(
+      owner,
+      repository_name,
+      incremental=incremental,
+      progress=progress,
+      payload_fields=payload_fields,
+    )
+    return progress.to_dict()
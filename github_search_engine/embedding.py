@@ -0,0 +1,281 @@
+import dataclasses
+import math
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from qdrant_client.http.models import Distance
+from qdrant_client.http.models import VectorParams
+
+from github_search_engine import metrics
+from github_search_engine.caches.embedding_cache import EmbeddingCache
+
+
+if TYPE_CHECKING:
+  import numpy as np
+  from fastembed import TextEmbedding
+
+
+DEFAULT_EMBEDDING_MODEL = "snowflake/snowflake-arctic-embed-m"
+
+
+@dataclasses.dataclass(frozen=True)
+class EmbeddingOptions:
+  """How documents are embedded while indexing.
+
+  Attributes:
+      batch_size: The number of documents embedded in one run of the model.
+        Default is 64.
+      parallel: The number of worker processes embedding documents, each
+        with its own copy of the model. Default is 1, which embeds in the
+        calling process. 0 starts one process per CPU.
+      threads: The number of threads of each ONNX Runtime session, used both
+        within and across operators. Default is None, which lets ONNX Runtime
+        use every core in process, and shares the cores between the worker
+        processes otherwise.
+  """
+
+  batch_size: int = 64
+  parallel: int = 1
+  threads: int | None = None
+
+  def __post_init__(self):
+    if self.batch_size < 1:
+      raise ValueError("The embedding batch size must be at least 1.")
+    if self.parallel < 0:
+      raise ValueError("The number of embedding processes cannot be negative.")
+    if self.threads is not None and self.threads < 1:
+      raise ValueError("The number of embedding threads must be at least 1.")
+
+  @property
+  def processes(self) -> int:
+    """The number of worker processes, or 1 when embedding in process."""
+    return self.parallel or os.cpu_count() or 1
+
+
+def _load_model(
+  model_name: str, threads: int | None = None
+) -> "TextEmbedding":
+  import onnxruntime
+  from fastembed import TextEmbedding
+
+  return TextEmbedding(
+    model_name=model_name,
+    threads=threads,
+    providers=onnxruntime.get_available_providers(),
+  )
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+  # ONNX Runtime is not fork-safe, and the calling process runs threads.
+  return multiprocessing.get_context(
+    "forkserver"
+    if "forkserver" in multiprocessing.get_all_start_methods()
+    else "spawn"
+  )
+
+
+# The model of a worker process, loaded once when the process starts.
+_worker_model: "TextEmbedding | None" = None
+
+
+def _initialise_worker(model_name: str, threads: int | None):
+  global _worker_model
+  _worker_model = _load_model(model_name, threads)
+
+
+def _embed_in_worker(
+  documents: Sequence[str], batch_size: int
+) -> "np.ndarray":
+  import numpy as np
+
+  return np.stack(
+    list(_worker_model.passage_embed(documents, batch_size=batch_size))
+  )
+
+
+class EmbeddingModel:
+  def __init__(
+    self,
+    model_name: str = DEFAULT_EMBEDDING_MODEL,
+    options: EmbeddingOptions | None = None,
+    cache: EmbeddingCache | None = None,
+  ):
+    """A dense text embedding model running locally through ONNX.
+
+    Vectors are named and configured the same way as ``QdrantClient.add``
+    does, so collections can be shared with clients embedding through Qdrant's
+    fastembed integration. The model is only loaded when it is first used.
+
+    With ``options.parallel`` worker processes, documents are split between
+    the workers of a pool started on first use and kept until :meth:`close`.
+    Unlike fastembed's own ``parallel`` argument, which starts a new pool and
+    loads the model again on every call, each worker loads the model once.
+    Queries are always embedded in the calling process.
+
+    With a cache, documents whose text was already embedded by this model
+    reuse the cached vector, and only the others run through the model.
+
+    Args:
+        model_name: The name of a fastembed text embedding model. Default is
+          "snowflake/snowflake-arctic-embed-m".
+        options: How documents are embedded. Default is None, which embeds
+          batches of 64 documents in process.
+        cache: The cache of document embeddings. Default is None, which
+          embeds every document.
+    """
+    self.model_name = model_name
+    self.options = options or EmbeddingOptions()
+    self.cache = cache
+    self._model: TextEmbedding | None = None
+    self._executor: ProcessPoolExecutor | None = None
+
+  def load(self) -> "TextEmbedding":
+    """Load the model now rather than on first use, and return it."""
+    if self._model is None:
+      self._model = _load_model(self.model_name, self.options.threads)
+    return self._model
+
+  def _worker_pool(self) -> ProcessPoolExecutor:
+    if self._executor is None:
+      processes = self.options.processes
+      self._executor = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=_pool_context(),
+        initializer=_initialise_worker,
+        initargs=(
+          self.model_name,
+          self.options.threads or max(1, (os.cpu_count() or 1) // processes),
+        ),
+      )
+    return self._executor
+
+  @property
+  def documents_per_round(self) -> int:
+    """The number of documents keeping every worker busy for one batch."""
+    return self.options.batch_size * self.options.processes
+
+  def close(self):
+    """Stop the worker processes, if any were started."""
+    if self._executor is not None:
+      self._executor.shutdown()
+      self._executor = None
+
+  @property
+  def model(self) -> "TextEmbedding":
+    """The fastembed model, loaded on first access."""
+    return self.load()
+
+  @property
+  def vector_name(self) -> str:
+    """The name of the vector field holding this model's embeddings."""
+    return f"fast-{self.model_name.split('/')[-1].lower()}"
+
+  @property
+  def vector_params(self) -> VectorParams:
+    """The configuration of the vector field holding the embeddings."""
+    from fastembed import TextEmbedding
+
+    (description,) = (
+      model
+      for model in TextEmbedding.list_supported_models()
+      if model["model"] == self.model_name
+    )
+    return VectorParams(size=description["dim"], distance=Distance.COSINE)
+
+  def embed_documents(
+    self, documents: Sequence[str], batch_size: int | None = None
+  ) -> list[list[float]]:
+    """Embed documents to be stored in the vector database.
+
+    Args:
+        documents: The documents to embed.
+        batch_size: The number of documents embedded at once. Default is
+          None, which uses ``options.batch_size``.
+
+    Returns:
+        One embedding per document.
+    """
+    if self.cache is None:
+      return self._embed_documents(documents, batch_size)
+
+    keys = [
+      self.cache.make_key(document, self.model_name) for document in documents
+    ]
+    vectors = self.cache.get_many(keys)
+    missing = {
+      key: document
+      for key, document in zip(keys, documents)
+      if key not in vectors
+    }
+    if missing:
+      embedded = dict(
+        zip(
+          missing,
+          self._embed_documents(list(missing.values()), batch_size),
+        )
+      )
+      self.cache.set_many(embedded)
+      vectors.update(embedded)
+    return [vectors[key] for key in keys]
+
+  def _embed_documents(
+    self, documents: Sequence[str], batch_size: int | None
+  ) -> list[list[float]]:
+    batch_size = batch_size or self.options.batch_size
+    metrics.EMBEDDING_BATCH_SIZE.observe(len(documents))
+    with metrics.stage("embed_documents"):
+      if self.options.processes == 1 or len(documents) <= 1:
+        return [
+          vector.tolist()
+          for vector in self.model.passage_embed(
+            documents, batch_size=batch_size
+          )
+        ]
+      # Split the documents evenly so that small calls still use every
+      # worker.
+      chunk_size = min(
+        batch_size, math.ceil(len(documents) / self.options.processes)
+      )
+      chunks = [
+        documents[start : start + chunk_size]
+        for start in range(0, len(documents), chunk_size)
+      ]
+      return [
+        vector
+        for vectors in self._worker_pool().map(
+          _embed_in_worker, chunks, [batch_size] * len(chunks)
+        )
+        for vector in vectors.tolist()
+      ]
+
+  def embed_query(self, query: str) -> list[float]:
+    """Embed a search query.
+
+    Args:
+        query: The query to embed.
+
+    Returns:
+        The embedding of the query.
+    """
+    with metrics.stage("embed_query"):
+      (vector,) = self.model.query_embed(query)
+    return vector.tolist()
+
+  def embed_queries(self, queries: Sequence[str]) -> list[list[float]]:
+    """Embed several search queries in one call of the model.
+
+    Args:
+        queries: The queries to embed.
+
+    Returns:
+        One embedding per query.
+    """
+    metrics.EMBEDDING_BATCH_SIZE.observe(len(queries))
+    with metrics.stage("embed_queries"):
+      return [
+        vector.tolist()
+        for vector in self.model.query_embed(queries, batch_size=len(queries))
+      ]
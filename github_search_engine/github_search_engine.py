@@ -1,52 +1,760 @@
+import asyncio
+import dataclasses
 import inspect
 import logging
 import sys
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Coroutine
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+from typing import TypeVar
 
 import chevron
-import onnxruntime
 from githubkit.versions.v2022_11_28.models import Issue
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import QueryResponse
+from githubkit.versions.v2022_11_28.models import IssueComment
+from qdrant_client.fastembed_common import QueryResponse
+from qdrant_client.http.models import ExtendedPointId
+from qdrant_client.http.models import Filter
+from qdrant_client.http.models import Fusion
+from qdrant_client.http.models import FusionQuery
+from qdrant_client.http.models import OverwritePayloadOperation
+from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import Prefetch
+from qdrant_client.http.models import QueryRequest
+from qdrant_client.http.models import ScoredPoint
+from qdrant_client.http.models import SearchParams
+from qdrant_client.http.models import SetPayload
+from qdrant_client.http.models import SetPayloadOperation
+from qdrant_client.http.models import SparseVector
 
-from github_search_engine.clients.github_client_manager import (
-  GithubClientManager,
-)
-from github_search_engine.clients.ollama_client_manager import (
-  OllamaClientManager,
+from github_search_engine.caches.summary_cache import SummaryCache
+from github_search_engine.collection_options import CollectionOptions
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.embedding import EmbeddingOptions
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.search_filter import SearchFilter
+from github_search_engine.snapshot import Snapshot
+from github_search_engine.sparse import SparseEncoder
+
+
+# GitHub owners cannot contain underscores, so this never clashes with a
+# repository collection.
+INDEX_STATE_COLLECTION = "_github_search_engine_index_state"
+
+DEFAULT_INDEX_BATCH_SIZE = 64
+DEFAULT_MAX_PENDING_BATCHES = 2
+# Comments are not embedded, so they are stored in larger batches.
+COMMENTS_BATCH_SIZE = 512
+DEFAULT_SUMMARY_CONCURRENCY = 4
+
+SEARCH_MODES = ("dense", "sparse", "hybrid")
+DEFAULT_SEARCH_MODE = "dense"
+SEARCH_LIMIT = 5
+# The minimum cosine similarity of dense search results.
+DENSE_SCORE_THRESHOLD = 0.8
+# The minimum BM25 score of sparse search results. A single matching token
+# scores about its inverse document frequency, which is above 1 for tokens in
+# less than a third of the issues, so results only sharing common words with
+# the query are dropped.
+SPARSE_SCORE_THRESHOLD = 1.0
+# The number of candidates of each retriever fused into hybrid results.
+HYBRID_PREFETCH_LIMIT = 20
+
+SUMMARY_PROMPT_TEMPLATE = inspect.cleandoc(
+  """
+  Please briefly summarise the content and discussion of the following github issues.
+  Keep it short, concise and to the point and explain how it relates to '{{originalQuery}}'
+  Do not write headings or titles, simply summarize into a single 2-3 sentence paragraph.
+
+    # {{issue.title}}
+    {{issue.body}}
+
+    Comments:
+    {{#comments}}
+    * {{body}}
+    {{/comments}}
+  """
 )
 
 
+# Version 1 payloads, stored without a version, were full ``Issue`` dumps.
+# Version 2 payloads lacked has_body.
+PAYLOAD_SCHEMA_VERSION = 3
+ISSUE_PAYLOAD_FIELDS = ("number", "title", "body", "html_url", "updated_at")
+
+
+def _field(issue: dict[str, Any], name: str) -> Any:
+  """Return a field of a dumped issue, or None if it is empty or unset."""
+  value = issue.get(name)
+  # Version 1 payloads stored unset fields as "<UNSET>".
+  if not value or value == "<UNSET>":
+    return None
+  return value
+
+
+def _isoformat(value: datetime | str | None) -> str | None:
+  if isinstance(value, str):
+    # Version 1 payloads stored timestamps in the JSON format of GitHub.
+    value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+  return value.isoformat() if value else None
+
+
+def _login(user: dict[str, Any] | None) -> str | None:
+  return user["login"] if user else None
+
+
+# Optional payload fields, extracted from a dumped issue.
+EXTRA_PAYLOAD_FIELDS: dict[str, Callable[[dict[str, Any]], Any]] = {
+  "state": lambda issue: _field(issue, "state"),
+  "labels": lambda issue: [
+    label if isinstance(label, str) else label["name"]
+    for label in _field(issue, "labels") or []
+  ],
+  "user": lambda issue: _login(_field(issue, "user")),
+  "assignees": lambda issue: [
+    _login(assignee) for assignee in _field(issue, "assignees") or []
+  ],
+  "milestone": lambda issue: (
+    issue["milestone"]["title"] if _field(issue, "milestone") else None
+  ),
+  "comments": lambda issue: _field(issue, "comments") or 0,
+  "reactions": lambda issue: (
+    issue["reactions"]["total_count"] if _field(issue, "reactions") else 0
+  ),
+  "author_association": lambda issue: _field(issue, "author_association"),
+  "is_pull_request": lambda issue: _field(issue, "pull_request") is not None,
+  "created_at": lambda issue: _isoformat(_field(issue, "created_at")),
+  "closed_at": lambda issue: _isoformat(_field(issue, "closed_at")),
+}
+
+T = TypeVar("T")
+
+
+def index_state_id(collection_name: str) -> str:
+  """Return the id of the point holding the index state of a collection."""
+  return str(uuid.uuid5(uuid.NAMESPACE_URL, collection_name))
+
+
+def comments_collection_name(collection_name: str) -> str:
+  """Return the name of the collection storing the comments of a collection."""
+  # Repository names cannot contain slashes, so this never clashes with a
+  # repository collection.
+  return f"{collection_name}/comments"
+
+
+def comment_payload(comment: IssueComment) -> dict[str, Any]:
+  """Build the payload stored for an issue comment.
+
+  Args:
+      comment: The issue comment.
+
+  Returns:
+      The compact payload of the comment.
+  """
+  return {
+    "issue_number": int(comment.issue_url.rsplit("/", 1)[-1]),
+    "body": comment.body or "",
+    "created_at": comment.created_at.isoformat(),
+    "updated_at": comment.updated_at.isoformat(),
+    "reactions": comment.reactions.total_count if comment.reactions else 0,
+  }
+
+
+def compact_payload(
+  issue: dict[str, Any], payload_fields: Sequence[str] = ()
+) -> dict[str, Any]:
+  """Build the payload stored for an issue.
+
+  Only the fields read by search and summarisation are stored, plus the
+  optional fields asked for, which keeps each point an order of magnitude
+  smaller than a full dump of the issue.
+
+  Args:
+      issue: The dumped issue, or the payload of a version 1 point.
+      payload_fields: The names of the optional fields to store, from
+        ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+
+  Returns:
+      The compact payload of the issue.
+  """
+  body = _field(issue, "body") or ""
+  payload = {
+    "schema_version": PAYLOAD_SCHEMA_VERSION,
+    "number": issue["number"],
+    "title": issue["title"],
+    "body": body,
+    "has_body": bool(body),
+    "html_url": issue["html_url"],
+    "updated_at": _isoformat(issue["updated_at"]),
+  }
+  for field in payload_fields:
+    payload[field] = EXTRA_PAYLOAD_FIELDS[field](issue)
+  return payload
+
+
+def issue_payload(
+  issue: Issue, payload_fields: Sequence[str] = ()
+) -> dict[str, Any]:
+  """Build the payload stored for an issue.
+
+  Args:
+      issue: The issue.
+      payload_fields: The names of the optional fields to store, from
+        ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+
+  Returns:
+      The compact payload of the issue.
+  """
+  return compact_payload(
+    issue.model_dump(include={*ISSUE_PAYLOAD_FIELDS, *payload_fields}),
+    payload_fields,
+  )
+
+
+def migrate_payload_operation(
+  point_id: ExtendedPointId,
+  payload: dict[str, Any],
+  payload_fields: Sequence[str] = (),
+) -> OverwritePayloadOperation | SetPayloadOperation:
+  """Return the update bringing the payload of a point to the current schema.
+
+  Args:
+      point_id: The id of the point.
+      payload: The current payload of the point.
+      payload_fields: The optional fields kept when rewriting a version 1
+        payload, from ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+
+  Returns:
+      The operation updating the payload.
+  """
+  if payload.get("schema_version") == 2:
+    return SetPayloadOperation(
+      set_payload=SetPayload(
+        payload={
+          "schema_version": PAYLOAD_SCHEMA_VERSION,
+          "has_body": bool(payload.get("body")),
+        },
+        points=[point_id],
+      )
+    )
+  return OverwritePayloadOperation(
+    overwrite_payload=SetPayload(
+      payload=compact_payload(payload, payload_fields),
+      points=[point_id],
+    )
+  )
+
+
+def validate_search_mode(mode: str):
+  """Raise a ValueError if a search mode is unknown."""
+  if mode not in SEARCH_MODES:
+    raise ValueError(
+      f"Unknown search mode: {mode}. Available modes are: "
+      f"{', '.join(SEARCH_MODES)}."
+    )
+
+
+def search_query_arguments(
+  mode: str,
+  embedding_model: EmbeddingModel,
+  dense_vector: list[float] | None,
+  sparse_encoder: SparseEncoder,
+  sparse_vector: SparseVector | None,
+  query_filter: Filter,
+  search_params: SearchParams | None,
+) -> dict[str, Any]:
+  """Return the arguments of the ``query_points`` call running a search.
+
+  Dense and sparse results must score above ``DENSE_SCORE_THRESHOLD`` and
+  ``SPARSE_SCORE_THRESHOLD`` respectively. Hybrid searches fetch the candidates of both
+  retrievers and fuse their rankings with reciprocal rank fusion, all in one
+  request.
+
+  Args:
+      mode: The search mode, from ``SEARCH_MODES``.
+      embedding_model: The model of the dense vectors.
+      dense_vector: The dense embedding of the query, unless the mode is
+        "sparse".
+      sparse_encoder: The encoder of the sparse vectors.
+      sparse_vector: The sparse encoding of the query, unless the mode is
+        "dense".
+      query_filter: The filter the results must match.
+      search_params: The parameters of the dense search.
+
+  Returns:
+      The keyword arguments of ``query_points``, besides the name of the
+      collection.
+  """
+  dense_query = {
+    "query": dense_vector,
+    "using": embedding_model.vector_name,
+    "score_threshold": DENSE_SCORE_THRESHOLD,
+  }
+  sparse_query = {
+    "query": sparse_vector,
+    "using": sparse_encoder.vector_name,
+    "score_threshold": SPARSE_SCORE_THRESHOLD,
+  }
+  if mode == "dense":
+    return {
+      **dense_query,
+      "query_filter": query_filter,
+      "limit": SEARCH_LIMIT,
+      "search_params": search_params,
+    }
+  if mode == "sparse":
+    return {
+      **sparse_query,
+      "query_filter": query_filter,
+      "limit": SEARCH_LIMIT,
+    }
+  return {
+    "prefetch": [
+      Prefetch(
+        **dense_query,
+        filter=query_filter,
+        params=search_params,
+        limit=HYBRID_PREFETCH_LIMIT,
+      ),
+      Prefetch(
+        **sparse_query, filter=query_filter, limit=HYBRID_PREFETCH_LIMIT
+      ),
+    ],
+    "query": FusionQuery(fusion=Fusion.RRF),
+    "limit": SEARCH_LIMIT,
+  }
+
+
+def search_query_request(arguments: dict[str, Any]) -> QueryRequest:
+  """Return the request of a batch query running one search.
+
+  Args:
+      arguments: The arguments of the search, from
+        :func:`search_query_arguments`.
+
+  Returns:
+      The request, for ``query_batch_points``.
+  """
+  arguments = dict(arguments)
+  return QueryRequest(
+    filter=arguments.pop("query_filter", None),
+    params=arguments.pop("search_params", None),
+    with_payload=True,
+    **arguments,
+  )
+
+
+def validate_payload_fields(payload_fields: Sequence[str]):
+  """Raise a ValueError if an optional payload field is unknown."""
+  unknown_fields = set(payload_fields) - EXTRA_PAYLOAD_FIELDS.keys()
+  if unknown_fields:
+    raise ValueError(
+      f"Unknown payload fields: {', '.join(sorted(unknown_fields))}. "
+      f"Available fields are: {', '.join(EXTRA_PAYLOAD_FIELDS)}."
+    )
+
+
+def query_response(point: ScoredPoint) -> QueryResponse:
+  """Convert a point returned by a Qdrant query into a search result."""
+  return QueryResponse(
+    id=point.id,
+    embedding=None,
+    sparse_embedding=None,
+    metadata=point.payload,
+    document=point.payload.get("document", ""),
+    score=point.score,
+  )
+
+
+def search_results(points: Sequence[ScoredPoint]) -> list[QueryResponse]:
+  """Convert the points returned by a Qdrant query into search results."""
+  results = [query_response(point) for point in points]
+
+  # Points stored before has_body existed are not filtered by the query.
+  return [result for result in results if result.metadata["body"]]
+
+
+def search_result_dict(result: QueryResponse) -> dict[str, Any]:
+  """Return a JSON serialisable view of a search result, without its body."""
+  result_dict = {
+    field: result.metadata.get(field)
+    for field in ("number", "title", "html_url", "updated_at")
+  }
+  if "repository" in result.metadata:
+    result_dict["repository"] = result.metadata["repository"]
+  result_dict["score"] = result.score
+  return result_dict
+
+
+def render_summary_prompt(
+  issue_metadata: dict[str, Any],
+  comments: list[dict[str, Any]],
+  query: str,
+  text_normalizer: TextNormalizer | None = None,
+) -> str:
+  """Render the prompt asking the LLM to summarise an issue.
+
+  Args:
+      issue_metadata: The payload of the issue.
+      comments: The comments of the issue in chronological order, each with a
+        'body'.
+      query: The original query to relate the issue to.
+      text_normalizer: How the body and comments are cleaned up, and which
+        comments fit, before being inlined. Default is None, which inlines
+        them as they are.
+
+  Returns:
+      The summarisation prompt.
+  """
+  if text_normalizer is not None:
+    issue_metadata = {
+      **issue_metadata,
+      "body": text_normalizer.prompt_text(issue_metadata.get("body")),
+    }
+    comments = text_normalizer.prompt_comments(comments)
+  return chevron.render(
+    template=SUMMARY_PROMPT_TEMPLATE,
+    data={
+      "issue": issue_metadata,
+      "comments": comments,
+      "originalQuery": query,
+    },
+  )
+
+
+def summary_prompt_version(text_normalizer: TextNormalizer) -> str:
+  """Return what identifies the prompts of a normaliser in summary caches."""
+  return f"{SUMMARY_PROMPT_TEMPLATE}\n{text_normalizer!r}"
+
+
+def format_summary(issue_metadata: dict[str, Any], summary: str) -> str:
+  """Prefix the summary of an issue with a link to the issue.
+
+  Args:
+      issue_metadata: The payload of the issue.
+      summary: The summary generated by the LLM.
+
+  Returns:
+      The summary of the issue, as markdown.
+  """
+  summary = f"""
+  # Issue [#{issue_metadata["number"]}]({issue_metadata["html_url"]})
+
+  {summary}
+  """
+  return inspect.cleandoc(summary)
+
+
+@dataclasses.dataclass
+class IndexProgress:
+  """The progress of an indexing run.
+
+  Attributes:
+      phase: The current phase of the run, one of "pending",
+        "fetching_issues", "fetching_comments" and "done".
+      issues_fetched: The number of issues retrieved from GitHub.
+      issues_embedded: The number of issues embedded.
+      issues_upserted: The number of issues stored in the database.
+      comments_fetched: The number of comments retrieved from GitHub.
+      comments_upserted: The number of comments stored in the database.
+      started_at: The time the run started, as given by ``time.monotonic``.
+      finished_at: The time the run finished, as given by ``time.monotonic``.
+  """
+
+  phase: str = "pending"
+  issues_fetched: int = 0
+  issues_embedded: int = 0
+  issues_upserted: int = 0
+  comments_fetched: int = 0
+  comments_upserted: int = 0
+  started_at: float = dataclasses.field(default_factory=time.monotonic)
+  finished_at: float | None = None
+
+  @property
+  def elapsed_seconds(self) -> float:
+    """The duration of the run so far."""
+    end = time.monotonic() if self.finished_at is None else self.finished_at
+    return end - self.started_at
+
+  @property
+  def issues_per_second(self) -> float:
+    """The number of issues stored per second."""
+    elapsed = self.elapsed_seconds
+    return self.issues_upserted / elapsed if elapsed > 0 else 0.0
+
+  def count_issue_fetched(self) -> None:
+    """Record that an issue was retrieved from GitHub."""
+    self.issues_fetched += 1
+
+  def count_comment_fetched(self) -> None:
+    """Record that a comment was retrieved from GitHub."""
+    self.comments_fetched += 1
+
+  def to_dict(self) -> dict[str, Any]:
+    """Return a JSON serialisable view of the progress."""
+    return {
+      "phase": self.phase,
+      "issues_fetched": self.issues_fetched,
+      "issues_embedded": self.issues_embedded,
+      "issues_upserted": self.issues_upserted,
+      "comments_fetched": self.comments_fetched,
+      "comments_upserted": self.comments_upserted,
+      "elapsed_seconds": self.elapsed_seconds,
+      "issues_per_second": self.issues_per_second,
+    }
+
+
+async def stream_batches(
+  items: AsyncIterator[T],
+  store_batch: Callable[[list[T]], Awaitable[None]],
+  batch_size: int,
+  max_pending_batches: int,
+  description: str,
+  on_fetched: Callable[[], None] | None = None,
+) -> int:
+  """Stream items from GitHub into the database in fixed-size batches.
+
+  While a batch is being stored, the next pages keep being fetched from
+  GitHub. At most ``max_pending_batches`` fetched batches wait to be stored at
+  any time, which keeps memory usage flat regardless of the size of the
+  repository.
+
+  Args:
+      items: The items to store.
+      store_batch: A coroutine function storing a batch of items.
+      batch_size: The number of items stored at once.
+      max_pending_batches: The number of fetched batches allowed to wait
+        before fetching pauses.
+      description: The name of the items, used for logging.
+      on_fetched: A function called each time an item is fetched. Default is
+        None.
+
+  Returns:
+      The number of items stored.
+  """
+  batches: asyncio.Queue[list[T] | None] = asyncio.Queue(
+    maxsize=max_pending_batches
+  )
+
+  async def fetch_batches():
+    batch = []
+    try:
+      async for item in items:
+        if on_fetched is not None:
+          on_fetched()
+        batch.append(item)
+        if len(batch) == batch_size:
+          await batches.put(batch)
+          batch = []
+      if batch:
+        await batches.put(batch)
+    except Exception:
+      # Wake the consumer up, the error is raised when awaiting the fetcher.
+      await batches.put(None)
+      raise
+    await batches.put(None)
+
+  fetcher = asyncio.create_task(fetch_batches())
+  stored_items = 0
+  try:
+    while (batch := await batches.get()) is not None:
+      await store_batch(batch)
+      stored_items += len(batch)
+      logging.info(f"Added {stored_items} {description} to Vector DB")
+    await fetcher
+  finally:
+    fetcher.cancel()
+  return stored_items
+
+
+def stored_issue_document(
+  payload: dict[str, Any], text_normalizer: TextNormalizer
+) -> str:
+  """Return the document embedded for an issue, rebuilt from its payload."""
+  return text_normalizer.issue_document(payload["title"], payload["body"])
+
+
+def check_snapshot_model(snapshot: Snapshot, embedding_model: EmbeddingModel):
+  """Raise a ValueError unless a snapshot matches an embedding model.
+
+  Args:
+      snapshot: The snapshot about to be imported.
+      embedding_model: The embedding model of the search engine.
+  """
+  expected = {embedding_model.vector_name: embedding_model.vector_params.size}
+  if snapshot.dense_vectors != expected:
+    raise ValueError(
+      f"{snapshot.path} was embedded with "
+      f"{snapshot.manifest.get('embedding_model')}, not "
+      f"{embedding_model.model_name}."
+    )
+
+
+def fill_snapshot_vectors(
+  points: list[PointStruct], sparse_name: str, sparse_vectors: bool
+) -> list[PointStruct]:
+  """Fit the vectors of snapshot points to the collection storing them.
+
+  Args:
+      points: A batch of points read from a snapshot, updated in place.
+      sparse_name: The name of the sparse vector.
+      sparse_vectors: Whether the collection stores sparse vectors. If not,
+        the sparse vectors of the snapshot are dropped.
+
+  Returns:
+      The points lacking the sparse vector the collection stores, exported
+      from a dense-only collection.
+  """
+  if not sparse_vectors:
+    for point in points:
+      point.vector.pop(sparse_name, None)
+    return []
+  return [point for point in points if sparse_name not in point.vector]
+
+
 class GithubSearchEngine:
   def __init__(
     self,
     github_access_token: str,
     qdrant_location: str | None = None,
     qdrant_path: str | None = None,
+    summary_cache_size: int = 1024,
+    summary_cache_ttl: float | None = None,
+    github_cache_size: int = 100 * 2**20,
+    embedding_cache_size: int = 100_000,
+    github_base_url: str | None = None,
+    ollama_host: str = "http://localhost:11434",
+    collection_options: CollectionOptions | None = None,
+    shared_collection: str | None = None,
+    embedding_options: EmbeddingOptions | None = None,
+    text_normalizer: TextNormalizer | None = None,
   ):
     """A GithubSearchEngine to search GitHub repositories.
 
     Initializes a client manager for GitHub, Qdrant, and Ollama services, setting up
     logging and database model configuration.
 
+    This is the blocking interface of
+    :class:`~github_search_engine.async_github_search_engine.AsyncGithubSearchEngine`,
+    which runs on an event loop of its own in a background thread. Its
+    methods can thus be called from any thread, and :meth:`index_repository`
+    and :meth:`async_summarise_results` from any event loop. Call
+    :meth:`close` once done with the engine.
+
     Args:
       github_access_token: The GitHub access token for accessing GitHub API.
+        Several comma separated tokens share the requests, each within its
+        own rate limit.
       qdrant_location: The location of the Qdrant server. Default is None.
-      qdrant_path: The path to the Qdrant database. Default is None.
+      qdrant_path: The path to the Qdrant database. Default is None. When set,
+        generated summaries are also cached on disk in this directory.
+      summary_cache_size: The number of summaries cached in memory. Default is
+        1024.
+      summary_cache_ttl: The number of seconds a cached summary stays valid.
+        Default is None, which keeps summaries until they are evicted.
+      github_cache_size: The number of bytes of GitHub responses cached and
+        revalidated with conditional requests, which do not count against
+        the rate limit. Default is 100 MiB.
+      embedding_cache_size: The number of issue embeddings cached by content,
+        so re-indexing unchanged issues skips the model. Default is 100 000.
+      github_base_url: The URL of the GitHub REST API. Default is None, which
+        uses https://api.github.com.
+      ollama_host: The URL of the Ollama server. Default is
+        "http://localhost:11434".
+      collection_options: How the collections of repositories are stored and
+        searched, such as quantization and HNSW parameters. Default is None,
+        which uses Qdrant's defaults.
+      shared_collection: Store every repository in this collection, rather
+        than each repository in a collection of its own, so several
+        repositories can be searched in a single query. Default is None.
+      embedding_options: How issues are embedded while indexing, such as the
+        batch size and the number of worker processes. Default is None,
+        which embeds batches of 64 issues in process.
+      text_normalizer: How issue texts are cleaned up and truncated before
+        being embedded or inlined in summarisation prompts. Default is None,
+        which uses the defaults of ``TextNormalizer``.
     """
-    logging.basicConfig(level=logging.WARNING)
+    # Imported here, as the asynchronous engine is built from the helpers of
+    # this module.
+    from github_search_engine.async_github_search_engine import (
+      AsyncGithubSearchEngine,
+    )
 
-    self._github_client = GithubClientManager(access_token=github_access_token)
-    self._database_client = QdrantClient(
-      location=qdrant_location,
-      path=qdrant_path,
+    self._loop = asyncio.new_event_loop()
+    self._thread = threading.Thread(
+      target=self._loop.run_forever,
+      name="github-search-engine",
+      daemon=True,
     )
-    self._ollama_client = OllamaClientManager()
+    self._thread.start()
+
+    # The clients and caches are created on the loop which uses them.
+    async def create_engine() -> AsyncGithubSearchEngine:
+      return AsyncGithubSearchEngine(
+        github_access_token=github_access_token,
+        qdrant_location=qdrant_location,
+        qdrant_path=qdrant_path,
+        summary_cache_size=summary_cache_size,
+        summary_cache_ttl=summary_cache_ttl,
+        github_cache_size=github_cache_size,
+        embedding_cache_size=embedding_cache_size,
+        github_base_url=github_base_url,
+        ollama_host=ollama_host,
+        collection_options=collection_options,
+        shared_collection=shared_collection,
+        embedding_options=embedding_options,
+        text_normalizer=text_normalizer,
+      )
 
-    self._database_client.set_model(
-      "snowflake/snowflake-arctic-embed-m",
-      providers=onnxruntime.get_available_providers(),
+    self._engine = self._run(create_engine())
+
+  def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the loop of the engine and wait for its result."""
+    future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+    try:
+      return future.result()
+    except BaseException:
+      future.cancel()
+      raise
+
+  async def _run_async(self, coroutine: Coroutine[Any, Any, T]) -> T:
+    """Await a coroutine run on the loop of the engine from another loop."""
+    return await asyncio.wrap_future(
+      asyncio.run_coroutine_threadsafe(coroutine, self._loop)
     )
 
+  def close(self):
+    """Release the database, the embedding workers and the caches.
+
+    The engine cannot be used once closed. Closing it again does nothing.
+    """
+    if self._loop.is_closed():
+      return
+    self._run(self._engine.close())
+    self._loop.call_soon_threadsafe(self._loop.stop)
+    self._thread.join()
+    self._loop.close()
+
+  @property
+  def summary_cache(self) -> SummaryCache:
+    """The cache of generated summaries."""
+    return self._engine.summary_cache
+
+  def load_models(self):
+    """Load the embedding model ahead of its first use.
+
+    Creating the ONNX session takes seconds, so it is otherwise deferred until
+    issues are indexed or searched rather than paid when the engine is
+    created.
+    """
+    self._run(self._engine.load_models())
+
   @staticmethod
   def summarise_issue(issue: Issue) -> str:
     """Construct a summary string from an Issue object.
@@ -73,6 +781,7 @@ class GithubSearchEngine:
     owner: str,
     repository_name: str,
     query: str,
+    max_concurrency: int = DEFAULT_SUMMARY_CONCURRENCY,
   ) -> str:
     """Summarizes the content and discussion of GitHub issues.
 
@@ -80,115 +789,391 @@ class GithubSearchEngine:
     specified query. The summary is concise, devoid of headings or titles, and presented in a
     single 2-3 sentence paragraph.
 
+    This is a blocking wrapper around :meth:`async_summarise_results`. Use the
+    latter from within a running event loop.
+
     Args:
         results: A list of QueryResponse objects containing GitHub issues to summarize.
         owner: The owner of the GitHub repository.
         repository_name: The name of the GitHub repository.
         query: The original query to relate the issues to.
+        max_concurrency: The maximum number of issues summarised at once.
+          Default is 4.
 
     Returns:
         A single string containing the summarized content and discussions of all provided GitHub issues.
     """
-    prompt_template = """
-    Please briefly summarise the content and discussion of the following github issues.
-    Keep it short, concise and to the point and explain how it relates to '{{originalQuery}}'
-    Do not write headings or titles, simply summarize into a single 2-3 sentence paragraph.
-
-      # {{issue.title}}
-      {{issue.body}}
-
-      Comments:
-      {{#comments}}
-      * {{body}}
-      {{/comments}}
-    """
-    prompt_template = inspect.cleandoc(prompt_template)
-    logging.info("Summarising issues")
-    summaries = []
-    for issue in results:
-      summary = self._ollama_client.chat(
-        chevron.render(
-          template=prompt_template,
-          data={
-            "issue": issue.metadata,
-            "comments": [
-              {"body": comment.body}
-              for comment in self._github_client.get_issue_comments(
-                owner=owner,
-                repository_name=repository_name,
-                issue_number=issue.metadata["number"],
-              )
-            ],
-            "originalQuery": query,
-          },
-        )
+    return self._run(
+      self._engine.summarise_results(
+        results,
+        owner,
+        repository_name,
+        query,
+        max_concurrency=max_concurrency,
       )
-      summary = f"""
-      # Issue [#{issue.metadata["number"]}]({issue.metadata["html_url"]})
+    )
+
+  async def async_summarise_results(
+    self,
+    results: list[QueryResponse],
+    owner: str,
+    repository_name: str,
+    query: str,
+    max_concurrency: int = DEFAULT_SUMMARY_CONCURRENCY,
+  ) -> str:
+    """Summarizes the content and discussion of GitHub issues concurrently.
+
+    See :meth:`AsyncGithubSearchEngine.summarise_results
+    <github_search_engine.async_github_search_engine.AsyncGithubSearchEngine.summarise_results>`.
+
+    Args:
+        results: A list of QueryResponse objects containing GitHub issues to summarize.
+        owner: The owner of the GitHub repository.
+        repository_name: The name of the GitHub repository.
+        query: The original query to relate the issues to.
+        max_concurrency: The maximum number of issues summarised at once.
+          Default is 4.
 
-      {summary}
-      """
-      summaries.append(inspect.cleandoc(summary))
-    final_summary = "\n\n".join(summaries)
-    logging.info("Done")
-    return final_summary
+    Returns:
+        A single string containing the summarized content and discussions of all provided GitHub issues.
+    """
+    return await self._run_async(
+      self._engine.summarise_results(
+        results,
+        owner,
+        repository_name,
+        query,
+        max_concurrency=max_concurrency,
+      )
+    )
 
-  async def index_repository(self, owner: str, repository_name: str):
+  async def index_repository(
+    self,
+    owner: str,
+    repository_name: str,
+    incremental: bool = False,
+    batch_size: int | None = None,
+    max_pending_batches: int = DEFAULT_MAX_PENDING_BATCHES,
+    progress: IndexProgress | None = None,
+    payload_fields: Sequence[str] = (),
+  ):
     """Index a GitHub repository.
 
-    Retrieves all issues from the specified repository and index them into a
-    vector database for further processing or querying.
+    See :meth:`AsyncGithubSearchEngine.index_repository
+    <github_search_engine.async_github_search_engine.AsyncGithubSearchEngine.index_repository>`.
 
     Args:
         owner: The owner of the GitHub repository.
         repository_name: The name of the GitHub repository.
+        incremental: Only fetch the issues and comments updated since the
+          repository was last indexed. Default is False.
+        batch_size: The number of issues embedded and upserted at once.
+          Default is None, which uses 64, or enough issues to keep every
+          embedding process busy.
+        max_pending_batches: The number of fetched batches allowed to wait for
+          embedding before fetching pauses. Default is 2.
+        progress: An object updated in place with the progress of the run, so
+          it can be monitored while indexing. Default is None.
+        payload_fields: The optional fields stored with the issues indexed by
+          this run, from ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+
+    Raises:
+        ValueError: If an optional payload field is unknown.
     """
-    logging.info(f"Fetching Issues from {owner}/{repository_name}")
-    issues = await self._github_client.get_repository_issues(
-      owner, repository_name
+    await self._run_async(
+      self._engine.index_repository(
+        owner,
+        repository_name,
+        incremental=incremental,
+        batch_size=batch_size,
+        max_pending_batches=max_pending_batches,
+        progress=progress,
+        payload_fields=payload_fields,
+      )
     )
 
-    logging.info("Adding to Vector DB")
-    self._database_client.add(
-      collection_name=f"{owner}/{repository_name}",
-      documents=[self.summarise_issue(issue) for issue in issues],
-      metadata=[issue.model_dump() for issue in issues],
-    )
-    logging.info("Done")
+  def github_rate_limit(self) -> dict[str, Any]:
+    """Return the GitHub rate limit of the access tokens.
+
+    Returns:
+        The requests left and allowed per window across the tokens, as last
+        reported by GitHub, and the rate limit of each token.
+    """
+    return self._engine.github_rate_limit()
+
+  def repository_exists(self, owner: str, repository_name: str) -> bool:
+    """Whether the repository has been indexed.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository, or "*" for any
+          repository of the owner in the shared collection.
+
+    Returns:
+        True if the collection of the repository exists and, when it is
+        shared, stores some issues of the repository.
+    """
+    return self._run(self._engine.repository_exists(owner, repository_name))
 
   def search(
-    self, owner: str, repository_name: str, text: str
+    self,
+    owner: str,
+    repository_name: str,
+    text: str,
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
   ) -> list[QueryResponse]:
     """Searches for issues in the specified repository that match the given text.
 
     This method searches the database for issues within the given repository that
     match the specified text query. If the repository's collection does not exist
-    in the database, an error is logged and the program exits. The search results
-    are filtered to exclude issues with empty bodies.
+    in the database, an error is logged and the program exits. Issues with empty
+    bodies, and issues not matching the filter, are excluded by the query itself.
 
     Args:
         owner: The owner of the repository.
         repository_name: The name of the repository.
         text: A natural language query to search for within the repository's issues.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense" to search by meaning, "sparse" to search by keywords
+          (BM25), or "hybrid" to fuse both rankings. Collections created
+          before hybrid search only support "dense", which is used instead.
+          Default is "dense".
 
     Returns:
         A list of query responses that match the search criteria.
+
+    Raises:
+        ValueError: If the search mode is unknown.
     """
-    if not self._database_client.collection_exists(
-      collection_name=f"{owner}/{repository_name}",
-    ):
+    validate_search_mode(mode)
+    if not self.repository_exists(owner, repository_name):
       logging.error(
         "DB Collection not found. Try indexing the repository first."
       )
       sys.exit(1)
     else:
-      results = self._database_client.query(
-        collection_name=f"{owner}/{repository_name}",
-        query_text=text,
-        score_threshold=0.8,
-        limit=5,
+      return self.search_repositories(
+        [f"{owner}/{repository_name}"], text, search_filter, mode
       )
 
-      # Filter empty issues
-      results = [result for result in results if result.metadata["body"]]
-      return results
+  def search_repositories(
+    self,
+    repositories: Sequence[str],
+    text: str,
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+  ) -> list[QueryResponse]:
+    """Search the issues of several repositories in a single query.
+
+    Unlike :meth:`search`, a repository which was never indexed simply has no
+    results. The repository of each result is in its "repository" metadata.
+
+    Args:
+        repositories: The repositories to search, as "owner/name", or
+          "owner/*" for every repository of an owner. Several repositories
+          can only be searched in the shared collection.
+        text: A natural language query.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense", "sparse" or "hybrid", as for :meth:`search`. Default
+          is "dense".
+
+    Returns:
+        A list of query responses that match the search criteria.
+
+    Raises:
+        ValueError: If the search mode or a repository is invalid, or if
+          several repositories are searched without a shared collection.
+    """
+    return self._run(
+      self._engine.search_repositories(repositories, text, search_filter, mode)
+    )
+
+  def search_batch(
+    self,
+    repositories: Sequence[str],
+    texts: Sequence[str],
+    search_filter: SearchFilter | None = None,
+    mode: str = DEFAULT_SEARCH_MODE,
+  ) -> list[list[QueryResponse]]:
+    """Run many searches of the same repositories in one round trip.
+
+    The queries are embedded together in one call of the model, and searched
+    with a single Qdrant batch query. Results are not summarised, so bulk
+    retrieval runs at the speed of the vector database.
+
+    Args:
+        repositories: The repositories to search, as for
+          :meth:`search_repositories`.
+        texts: The natural language queries.
+        search_filter: Only return the issues matching this filter. Default is
+          None, which only excludes issues with empty bodies.
+        mode: "dense", "sparse" or "hybrid", as for :meth:`search`. Default
+          is "dense".
+
+    Returns:
+        The results of each query, in the order of the queries.
+
+    Raises:
+        ValueError: If the search mode or a repository is invalid, or if
+          several repositories are searched without a shared collection.
+    """
+    return self._run(
+      self._engine.search_batch(repositories, texts, search_filter, mode)
+    )
+
+  def facet(
+    self,
+    owner: str,
+    repository_name: str,
+    field_name: str,
+    search_filter: SearchFilter | None = None,
+    limit: int = 10,
+  ) -> dict[Any, int]:
+    """Count the issues of a repository by the values of a payload field.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository, or "*" for every
+          repository of the owner in the shared collection.
+        field_name: An indexed payload field, such as "labels" or "state".
+        search_filter: Only count the issues matching this filter. Default is
+          None, which counts every issue with a body.
+        limit: The maximum number of values returned. Default is 10.
+
+    Returns:
+        The number of issues of the most frequent values, by value.
+    """
+    return self._run(
+      self._engine.facet(
+        owner, repository_name, field_name, search_filter, limit
+      )
+    )
+
+  def migrate_payloads(
+    self,
+    owner: str,
+    repository_name: str,
+    payload_fields: Sequence[str] = (),
+    batch_size: int = 256,
+  ) -> int:
+    """Rewrite the payloads of a collection into the compact schema.
+
+    Collections indexed by earlier versions store a full dump of every issue.
+    Their payloads are replaced in place by compact ones, without re-embedding
+    or calling GitHub. Version 2 payloads keep their fields and gain has_body.
+    Points already using the current schema are left untouched, so an
+    interrupted migration can simply be run again. The payload indexes of
+    the collection are created as well.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        payload_fields: The optional fields to keep, from
+          ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+        batch_size: The number of points rewritten at once. Default is 256.
+
+    Returns:
+        The number of migrated points.
+
+    Raises:
+        ValueError: If an optional payload field is unknown.
+    """
+    return self._run(
+      self._engine.migrate_payloads(
+        owner, repository_name, payload_fields, batch_size
+      )
+    )
+
+  def move_to_shared_collection(
+    self,
+    owner: str,
+    repository_name: str,
+    payload_fields: Sequence[str] = (),
+    delete: bool = False,
+    batch_size: int = 256,
+  ) -> int:
+    """Copy the collection of a repository into the shared collection.
+
+    The payloads are first migrated to the current schema, then the points
+    and their comments are copied with their vectors, so nothing is embedded
+    again and GitHub is not called. Sparse vectors missing from collections
+    created before hybrid search are computed from the stored text. Copying
+    is idempotent, so an interrupted move can simply be run again.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        payload_fields: The optional fields to keep when migrating version 1
+          payloads, from ``EXTRA_PAYLOAD_FIELDS``. Default is none.
+        delete: Delete the collections of the repository once copied.
+          Default is False.
+        batch_size: The number of points copied at once. Default is 256.
+
+    Returns:
+        The number of copied issues.
+
+    Raises:
+        ValueError: If the engine has no shared collection, or if the
+          repository has no collection of its own.
+    """
+    return self._run(
+      self._engine.move_to_shared_collection(
+        owner, repository_name, payload_fields, delete, batch_size
+      )
+    )
+
+  def export_snapshot(
+    self,
+    owner: str,
+    repository_name: str,
+    path: str,
+    batch_size: int = 256,
+  ) -> int:
+    """Write the index of a repository into a snapshot directory.
+
+    Vectors are written as stored, in the columnar layout described in
+    :mod:`github_search_engine.snapshot`, so loading the snapshot elsewhere
+    calls neither GitHub nor the embedding model.
+
+    Args:
+        owner: The owner of the repository.
+        repository_name: The name of the repository.
+        path: The directory of the snapshot, which must not exist or be
+          empty.
+        batch_size: The number of points read at once. Default is 256.
+
+    Returns:
+        The number of exported issues.
+
+    Raises:
+        ValueError: If the repository is not indexed, or the directory is not
+          empty.
+    """
+    return self._run(
+      self._engine.export_snapshot(owner, repository_name, path, batch_size)
+    )
+
+  def import_snapshot(self, path: str, batch_size: int = 256) -> str:
+    """Load a snapshot written by :meth:`export_snapshot`.
+
+    The arrays of the snapshot are memory mapped and streamed into the
+    database in batches. Points are upserted, so importing over an index of
+    the same repository updates it in place. The high-water marks are
+    restored, so an incremental run afterwards only fetches what changed
+    since the export.
+
+    Args:
+        path: The directory of the snapshot.
+        batch_size: The number of points stored at once. Default is 256.
+
+    Returns:
+        The full name of the imported repository.
+
+    Raises:
+        ValueError: If the directory holds no snapshot of a supported
+          version, or if the snapshot was embedded with another model.
+    """
+    return self._run(self._engine.import_snapshot(path, batch_size))
@@ -0,0 +1,395 @@
+"""Timings and counters of the search engine, in the Prometheus format.
+
+Every stage of indexing and searching is timed into
+``github_search_engine_stage_seconds``, alongside counters of GitHub requests
+and LLM tokens. The API serves :data:`REGISTRY` on ``/metrics``.
+
+When the ``opentelemetry-api`` package is installed, each stage also runs in
+its own span, so stages show up nested under the request that triggered them.
+"""
+
+import abc
+import bisect
+import contextlib
+import functools
+import inspect
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Iterator
+from collections.abc import Sequence
+from typing import Any
+from typing import TypeVar
+
+
+try:
+  from opentelemetry import trace
+except ImportError:
+  _tracer = None
+else:
+  _tracer = trace.get_tracer("github_search_engine")
+
+
+FunctionT = TypeVar("FunctionT", bound=Callable)
+
+DEFAULT_LATENCY_BUCKETS = (
+  0.005,
+  0.01,
+  0.025,
+  0.05,
+  0.1,
+  0.25,
+  0.5,
+  1,
+  2.5,
+  5,
+  10,
+  30,
+  60,
+)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+  if not labels:
+    return ""
+  escaped_labels = ",".join(
+    f'{name}="{_escape(value)}"' for name, value in labels.items()
+  )
+  return f"{{{escaped_labels}}}"
+
+
+def _escape(value: str) -> str:
+  return (
+    str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+  )
+
+
+def _format_value(value: float) -> str:
+  if value == float("inf"):
+    return "+Inf"
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+  type_name = ""
+
+  def __init__(
+    self, name: str, description: str, labelnames: Sequence[str] = ()
+  ):
+    self.name = name
+    self.description = description
+    self.labelnames = tuple(labelnames)
+    self._lock = threading.Lock()
+
+  def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+    if set(labels) != set(self.labelnames):
+      raise ValueError(
+        f"{self.name} expects the labels {self.labelnames}, got "
+        f"{tuple(labels)}"
+      )
+    return tuple(str(labels[name]) for name in self.labelnames)
+
+  def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+    return dict(zip(self.labelnames, key))
+
+  @abc.abstractmethod
+  def _samples(self) -> Iterator[str]:
+    """Yield the sample lines of the metric, with the lock held."""
+
+  def render(self) -> str:
+    """Return the metric in the Prometheus text exposition format."""
+    with self._lock:
+      samples = list(self._samples())
+    return "\n".join(
+      [
+        f"# HELP {self.name} {self.description}",
+        f"# TYPE {self.name} {self.type_name}",
+        *samples,
+      ]
+    )
+
+
+class Counter(_Metric):
+  """A value which only goes up."""
+
+  type_name = "counter"
+
+  def __init__(
+    self, name: str, description: str, labelnames: Sequence[str] = ()
+  ):
+    super().__init__(name, description, labelnames)
+    self._values: dict[tuple[str, ...], float] = {}
+
+  def inc(self, amount: float = 1, **labels: Any):
+    """Increase the counter of the given labels by ``amount``."""
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def get(self, **labels: Any) -> float:
+    """Return the value of the counter of the given labels."""
+    with self._lock:
+      return self._values.get(self._key(labels), 0)
+
+  def _samples(self):
+    for key, value in self._values.items():
+      labels = _format_labels(self._labels(key))
+      yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge(Counter):
+  """A value which can go up and down."""
+
+  type_name = "gauge"
+
+  def set(self, value: float, **labels: Any):
+    """Set the value of the gauge of the given labels."""
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = value
+
+
+class Histogram(_Metric):
+  """The distribution of observed values, counted into buckets."""
+
+  type_name = "histogram"
+
+  def __init__(
+    self,
+    name: str,
+    description: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+  ):
+    super().__init__(name, description, labelnames)
+    self.buckets = (*sorted(buckets), float("inf"))
+    # The count of each bucket, the sum and the count of the observations.
+    self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+  def observe(self, value: float, **labels: Any):
+    """Record an observation under the given labels."""
+    key = self._key(labels)
+    with self._lock:
+      counts, total, count = self._values.get(
+        key, ([0] * len(self.buckets), 0.0, 0)
+      )
+      counts[bisect.bisect_left(self.buckets, value)] += 1
+      self._values[key] = (counts, total + value, count + 1)
+
+  def count(self, **labels: Any) -> int:
+    """Return the number of observations under the given labels."""
+    with self._lock:
+      return self._values.get(self._key(labels), ([], 0.0, 0))[2]
+
+  def sum(self, **labels: Any) -> float:
+    """Return the sum of the observations under the given labels."""
+    with self._lock:
+      return self._values.get(self._key(labels), ([], 0.0, 0))[1]
+
+  @contextlib.contextmanager
+  def time(self, **labels: Any) -> Iterator[None]:
+    """Observe the number of seconds spent in the block."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - start, **labels)
+
+  def _samples(self):
+    for key, (counts, total, count) in self._values.items():
+      labels = self._labels(key)
+      cumulative_count = 0
+      for bucket, bucket_count in zip(self.buckets, counts):
+        cumulative_count += bucket_count
+        bucket_labels = _format_labels(
+          {**labels, "le": _format_value(float(bucket))}
+        )
+        yield f"{self.name}_bucket{bucket_labels} {cumulative_count}"
+      yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+      yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class MetricsRegistry:
+  def __init__(self):
+    """A collection of metrics rendered together."""
+    self._metrics: dict[str, _Metric] = {}
+
+  def register(self, metric: _Metric) -> _Metric:
+    """Add a metric to the registry and return it."""
+    if metric.name in self._metrics:
+      raise ValueError(f"{metric.name} is already registered")
+    self._metrics[metric.name] = metric
+    return metric
+
+  def render(self) -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    return "".join(f"{metric.render()}\n" for metric in self._metrics.values())
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+  Histogram(
+    "github_search_engine_stage_seconds",
+    "Time spent in each stage of indexing and searching.",
+    ("stage",),
+  )
+)
+GITHUB_REQUESTS = REGISTRY.register(
+  Counter(
+    "github_search_engine_github_requests_total",
+    "Requests sent to the GitHub API.",
+    ("endpoint", "status"),
+  )
+)
+GITHUB_REQUEST_SECONDS = REGISTRY.register(
+  Histogram(
+    "github_search_engine_github_request_seconds",
+    "Latency of the requests sent to the GitHub API.",
+    ("endpoint",),
+  )
+)
+GITHUB_RATE_LIMIT_REMAINING = REGISTRY.register(
+  Gauge(
+    "github_search_engine_github_rate_limit_remaining",
+    "Requests left in the current GitHub rate limit window.",
+    ("resource",),
+  )
+)
+GITHUB_RETRIES = REGISTRY.register(
+  Counter(
+    "github_search_engine_github_retries_total",
+    "GitHub requests retried after a rate limit or a transient error.",
+    ("endpoint", "reason"),
+  )
+)
+GITHUB_CACHE_REQUESTS = REGISTRY.register(
+  Counter(
+    "github_search_engine_github_cache_requests_total",
+    "Cacheable GitHub requests, by whether the cache answered them.",
+    ("result",),
+  )
+)
+EMBEDDING_CACHE_REQUESTS = REGISTRY.register(
+  Counter(
+    "github_search_engine_embedding_cache_requests_total",
+    "Documents looked up in the embedding cache, by whether it held them.",
+    ("result",),
+  )
+)
+NORMALIZED_TOKENS = REGISTRY.register(
+  Counter(
+    "github_search_engine_normalized_tokens_total",
+    "Approximate tokens of issue texts kept or removed by normalisation.",
+    ("target", "result"),
+  )
+)
+WEBHOOK_EVENTS = REGISTRY.register(
+  Counter(
+    "github_search_engine_webhook_events_total",
+    "GitHub webhook events received, by whether they were queued.",
+    ("event", "result"),
+  )
+)
+LLM_TOKENS = REGISTRY.register(
+  Counter(
+    "github_search_engine_llm_tokens_total",
+    "Tokens read and generated by the LLM.",
+    ("direction",),
+  )
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.register(
+  Histogram(
+    "github_search_engine_llm_tokens_per_second",
+    "Generation speed of the LLM.",
+    buckets=(1, 5, 10, 20, 40, 80, 160, 320),
+  )
+)
+LLM_CONTEXT_SIZE = REGISTRY.register(
+  Histogram(
+    "github_search_engine_llm_context_size",
+    "Context window of each LLM call, which sizes its KV cache.",
+    ("call",),
+    buckets=(2048, 4096, 8192, 16384, 32768, 65536, 131072),
+  )
+)
+LLM_CALL_SECONDS = REGISTRY.register(
+  Histogram(
+    "github_search_engine_llm_call_seconds",
+    "Time spent by the LLM loading the model, reading the prompt and "
+    "generating, per call.",
+    ("phase",),
+  )
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.register(
+  Histogram(
+    "github_search_engine_embedding_batch_size",
+    "Number of documents embedded at once.",
+    buckets=(1, 8, 16, 32, 64, 128, 256, 512, 1024),
+  )
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+  Histogram(
+    "github_search_engine_http_request_seconds",
+    "Latency of the requests served by the API.",
+    ("method", "route", "status"),
+  )
+)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+  """Run the block in an OpenTelemetry span, if OpenTelemetry is installed.
+
+  Args:
+      name: The name of the span.
+      **attributes: The attributes of the span.
+  """
+  if _tracer is None:
+    yield
+    return
+  with _tracer.start_as_current_span(name, attributes=attributes):
+    yield
+
+
+@contextlib.contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[None]:
+  """Time a stage of indexing or searching.
+
+  Args:
+      name: The name of the stage, used as the ``stage`` label.
+      **attributes: The attributes of the span of the stage.
+  """
+  with span(f"github_search_engine.{name}", **attributes):
+    with STAGE_SECONDS.time(stage=name):
+      yield
+
+
+def timed(name: str) -> Callable[[FunctionT], FunctionT]:
+  """Time every call of a function or coroutine function as a stage.
+
+  Args:
+      name: The name of the stage, used as the ``stage`` label.
+
+  Returns:
+      A decorator timing the calls of the decorated function.
+  """
+
+  def decorator(function: FunctionT) -> FunctionT:
+    if inspect.iscoroutinefunction(function):
+
+      @functools.wraps(function)
+      async def timed_coroutine_function(*args, **kwargs):
+        with stage(name):
+          return await function(*args, **kwargs)
+
+      return timed_coroutine_function
+
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+      with stage(name):
+        return function(*args, **kwargs)
+
+    return timed_function
+
+  return decorator
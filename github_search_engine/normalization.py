@@ -0,0 +1,272 @@
+import dataclasses
+import re
+from typing import Any
+
+from github_search_engine import metrics
+
+
+# Words and punctuation marks, which approximates the number of tokens of
+# subword tokenizers without loading one.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+HTML_COMMENT = re.compile(r"<!--.*?(?:-->|\Z)", re.DOTALL)
+# Issue forms fill the sections left empty with this placeholder.
+NO_RESPONSE = re.compile(r"^[ \t]*_No response_[ \t]*$", re.MULTILINE)
+DATA_URI = re.compile(r"data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+")
+BASE64_RUN = re.compile(r"[A-Za-z0-9+/]{200,}={0,2}")
+MARKDOWN_IMAGE = re.compile(r"!\[([^\]\n]*)\]\([^)\n]*\)")
+HTML_IMAGE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+DETAILS = re.compile(
+  r"<details>\s*(?:<summary>(.*?)</summary>)?(.*?)</details>",
+  re.DOTALL | re.IGNORECASE,
+)
+FENCE = re.compile(r"^[ \t]*(`{3,}|~{3,})")
+HEADING = re.compile(r"^(#{1,6})[ \t]")
+# Lines of logs and stack traces, collapsed when they run for long.
+LOG_LINE = re.compile(
+  r"^\s*(?:"
+  r"\d{4}-\d{2}-\d{2}[T ]\d"
+  r"|\[?\d{2}:\d{2}:\d{2}"
+  r"|at \S+[(:]"
+  r"|File \".*\", line \d+"
+  r"|Traceback \(most recent call last\)"
+  r"|\[?(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b"
+  r")"
+)
+
+
+def count_tokens(text: str) -> int:
+  """Return the approximate number of tokens of a text."""
+  return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+  """Cut a text after its first ``max_tokens`` approximate tokens."""
+  for index, match in enumerate(TOKEN_PATTERN.finditer(text)):
+    if index == max_tokens:
+      return text[: match.start()].rstrip() + " [truncated]"
+  return text
+
+
+def excerpt(lines: list[str], max_lines: int) -> list[str]:
+  """Keep the first and last lines of a block, marking the omitted ones."""
+  if len(lines) <= max_lines:
+    return lines
+  head = (max_lines + 1) // 2
+  tail = max_lines // 2
+  omitted = len(lines) - head - tail
+  return [
+    *lines[:head],
+    f"... {omitted} lines omitted ...",
+    *lines[len(lines) - tail :],
+  ]
+
+
+@dataclasses.dataclass(frozen=True)
+class TextNormalizer:
+  """How issue texts are cleaned up before being embedded or summarised.
+
+  Issue bodies and comments carry a lot of text which costs embedding and
+  LLM tokens without describing the issue: issue template instructions,
+  pasted logs, stack traces and inline images. Normalising removes the
+  boilerplate, keeps bounded excerpts of long code blocks and logs, and
+  truncates texts to a token budget. Tokens are approximated as words and
+  punctuation marks.
+
+  Attributes:
+      strip_boilerplate: Remove HTML comments, which hold the instructions of
+        issue templates, sections left empty, and inline images. Default is
+        True.
+      max_block_lines: The number of lines kept of each code block, details
+        block and run of log lines, split between its start and its end.
+        Default is 12. None keeps blocks whole.
+      max_document_tokens: The number of tokens of the embedded text of an
+        issue. Default is 512, the context of the embedding model. None
+        keeps the whole text.
+      max_prompt_tokens: The number of tokens of an issue body or comment in
+        the summarisation prompt. Default is 1024. None keeps the whole
+        text.
+      max_comments_tokens: The number of tokens of all the comments of an
+        issue in the summarisation prompt. The most reacted comments, then
+        the newest, are kept first. Default is 2048. None keeps every
+        comment.
+  """
+
+  strip_boilerplate: bool = True
+  max_block_lines: int | None = 12
+  max_document_tokens: int | None = 512
+  max_prompt_tokens: int | None = 1024
+  max_comments_tokens: int | None = 2048
+
+  def normalize(self, text: str | None, max_tokens: int | None = None) -> str:
+    """Clean a text up, and cut it to a token budget.
+
+    Args:
+        text: An issue title, body or comment. None gives an empty text.
+        max_tokens: The number of tokens kept. Default is None, which keeps
+          every token left after cleaning.
+
+    Returns:
+        The normalised text.
+    """
+    if not text:
+      return ""
+    text = text.replace("\r\n", "\n")
+    if self.strip_boilerplate:
+      text = HTML_COMMENT.sub("", text)
+      text = NO_RESPONSE.sub("", text)
+      text = DATA_URI.sub("[image]", text)
+      text = MARKDOWN_IMAGE.sub(
+        lambda match: f"[image: {match[1]}]" if match[1] else "[image]", text
+      )
+      text = HTML_IMAGE.sub("[image]", text)
+      text = BASE64_RUN.sub("[base64]", text)
+    if self.max_block_lines is not None:
+      text = DETAILS.sub(self._collapse_details, text)
+    lines = self._collapse_blocks(text.split("\n"))
+    if self.strip_boilerplate:
+      lines = _remove_empty_sections(lines)
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    if max_tokens is not None:
+      text = truncate_tokens(text, max_tokens)
+    return text
+
+  def _collapse_details(self, match: re.Match) -> str:
+    summary = (match[1] or "").strip()
+    lines = excerpt(match[2].strip().split("\n"), self.max_block_lines)
+    return "\n".join(filter(None, [summary, *lines]))
+
+  def _collapse_blocks(self, lines: list[str]) -> list[str]:
+    """Strip trailing whitespace, and cut long code blocks and logs short."""
+    collapsed = []
+    block: list[str] = []
+    fence = None
+    for line in (line.rstrip() for line in lines):
+      if fence is not None:
+        if line.strip().startswith(fence):
+          collapsed.extend(self._excerpt(block))
+          collapsed.append(line)
+          block, fence = [], None
+        else:
+          block.append(line)
+      elif match := FENCE.match(line):
+        collapsed.extend(self._excerpt(block))
+        collapsed.append(line)
+        block, fence = [], match[1]
+      elif LOG_LINE.match(line) or (block and line.startswith((" ", "\t"))):
+        # Indented lines continue the log lines above them.
+        block.append(line)
+      else:
+        collapsed.extend(self._excerpt(block))
+        collapsed.append(line)
+        block = []
+    collapsed.extend(self._excerpt(block))
+    return collapsed
+
+  def _excerpt(self, lines: list[str]) -> list[str]:
+    if self.max_block_lines is None:
+      return lines
+    return excerpt(lines, self.max_block_lines)
+
+  def issue_document(self, title: str, body: str | None) -> str:
+    """Return the text embedded for an issue.
+
+    Args:
+        title: The title of the issue.
+        body: The body of the issue, if any.
+
+    Returns:
+        The normalised title and body, within ``max_document_tokens``.
+    """
+    raw = f"{title}\n\n{body or ''}"
+    document = self.normalize(raw, self.max_document_tokens)
+    _count_tokens("embedding", raw, document)
+    return document
+
+  def prompt_text(self, text: str | None) -> str:
+    """Return an issue body or comment as inlined in the summarisation prompt.
+
+    Args:
+        text: The body of the issue or comment.
+
+    Returns:
+        The normalised text, within ``max_prompt_tokens``.
+    """
+    normalized = self.normalize(text, self.max_prompt_tokens)
+    _count_tokens("summary", text or "", normalized)
+    return normalized
+
+  def prompt_comments(
+    self, comments: list[dict[str, Any]]
+  ) -> list[dict[str, Any]]:
+    """Return the comments of an issue as inlined in the summarisation prompt.
+
+    Args:
+        comments: The comments of the issue in chronological order, each with
+          a 'body', and optionally 'reactions' and 'created_at'.
+
+    Returns:
+        The comments fitting within ``max_comments_tokens`` once normalised,
+        in chronological order.
+    """
+    normalized = [
+      {
+        **comment,
+        "body": self.normalize(comment.get("body"), self.max_prompt_tokens),
+      }
+      for comment in comments
+    ]
+    kept = set(range(len(normalized)))
+    if self.max_comments_tokens is not None:
+      kept.clear()
+      budget = self.max_comments_tokens
+      for index in sorted(
+        range(len(normalized)),
+        key=lambda index: (
+          normalized[index].get("reactions") or 0,
+          normalized[index].get("created_at") or "",
+          index,
+        ),
+        reverse=True,
+      ):
+        tokens = count_tokens(normalized[index]["body"])
+        if tokens <= budget:
+          kept.add(index)
+          budget -= tokens
+
+    for index, (comment, normalized_comment) in enumerate(
+      zip(comments, normalized)
+    ):
+      _count_tokens(
+        "summary",
+        comment.get("body") or "",
+        normalized_comment["body"] if index in kept else "",
+      )
+    return [
+      comment for index, comment in enumerate(normalized) if index in kept
+    ]
+
+
+def _remove_empty_sections(lines: list[str]) -> list[str]:
+  """Remove the headings of template sections which were left empty."""
+  kept = []
+  for line in reversed(lines):
+    heading = HEADING.match(line)
+    if heading is not None:
+      following = next((line for line in reversed(kept) if line.strip()), None)
+      next_heading = following and HEADING.match(following)
+      if following is None or (
+        next_heading and len(next_heading[1]) <= len(heading[1])
+      ):
+        continue
+    kept.append(line)
+  return kept[::-1]
+
+
+def _count_tokens(target: str, raw: str, normalized: str):
+  raw_tokens = count_tokens(raw)
+  kept_tokens = count_tokens(normalized)
+  metrics.NORMALIZED_TOKENS.inc(kept_tokens, target=target, result="kept")
+  metrics.NORMALIZED_TOKENS.inc(
+    max(raw_tokens - kept_tokens, 0), target=target, result="removed"
+  )
@@ -0,0 +1,221 @@
+import dataclasses
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from qdrant_client.http.models import DatetimeRange
+from qdrant_client.http.models import FieldCondition
+from qdrant_client.http.models import Filter
+from qdrant_client.http.models import KeywordIndexParams
+from qdrant_client.http.models import KeywordIndexType
+from qdrant_client.http.models import MatchAny
+from qdrant_client.http.models import MatchValue
+from qdrant_client.http.models import PayloadSchemaType
+
+
+# Payload fields indexed in every issue collection.
+ISSUE_PAYLOAD_INDEXES = {
+  "has_body": PayloadSchemaType.BOOL,
+  "updated_at": PayloadSchemaType.DATETIME,
+}
+
+# Payload indexes of the optional payload fields, created when they are
+# stored. Fields missing from here, such as reactions, are not filterable.
+EXTRA_PAYLOAD_INDEXES = {
+  "state": PayloadSchemaType.KEYWORD,
+  "labels": PayloadSchemaType.KEYWORD,
+  "user": PayloadSchemaType.KEYWORD,
+  "assignees": PayloadSchemaType.KEYWORD,
+  "milestone": PayloadSchemaType.KEYWORD,
+  "author_association": PayloadSchemaType.KEYWORD,
+  "is_pull_request": PayloadSchemaType.BOOL,
+  "created_at": PayloadSchemaType.DATETIME,
+  "closed_at": PayloadSchemaType.DATETIME,
+}
+
+
+# Payload indexes of the collections shared by several repositories. Points
+# of the same repository are stored together, which keeps the searches of a
+# single repository as fast as in a collection of its own.
+TENANT_PAYLOAD_INDEXES = {
+  "repository": KeywordIndexParams(
+    type=KeywordIndexType.KEYWORD, is_tenant=True
+  ),
+  "owner": PayloadSchemaType.KEYWORD,
+}
+
+
+def tenant_payload(repository: str) -> dict[str, str]:
+  """Return the payload identifying a repository in a shared collection.
+
+  Args:
+      repository: The full name of the repository, as "owner/name".
+
+  Returns:
+      The repository and its owner.
+  """
+  return {"repository": repository, "owner": repository.split("/", 1)[0]}
+
+
+def validate_repositories(repositories: Sequence[str]):
+  """Raise a ValueError unless every repository is "owner/name" or "owner/*".
+
+  Args:
+      repositories: The repositories to search, at least one.
+  """
+  if not repositories:
+    raise ValueError("No repository to search.")
+  for repository in repositories:
+    owner, _, name = repository.partition("/")
+    if not owner or not name or "/" in name:
+      raise ValueError(
+        f"Invalid repository: {repository}. Expected owner/name, or owner/* "
+        "for every repository of an owner."
+      )
+
+
+def payload_indexes(
+  payload_fields: Sequence[str] = (),
+  shared: bool = False,
+) -> dict[str, PayloadSchemaType | KeywordIndexParams]:
+  """Return the payload indexes of a collection storing the given fields.
+
+  Args:
+      payload_fields: The optional payload fields stored in the collection.
+        Default is none.
+      shared: Whether the collection is shared by several repositories.
+        Default is False.
+
+  Returns:
+      The schema of each indexed field, by field name.
+  """
+  return {
+    **(TENANT_PAYLOAD_INDEXES if shared else {}),
+    **ISSUE_PAYLOAD_INDEXES,
+    **{
+      field: EXTRA_PAYLOAD_INDEXES[field]
+      for field in payload_fields
+      if field in EXTRA_PAYLOAD_INDEXES
+    },
+  }
+
+
+def _datetime_range(
+  key: str, after: datetime | None, before: datetime | None
+) -> FieldCondition | None:
+  if after is None and before is None:
+    return None
+  return FieldCondition(key=key, range=DatetimeRange(gte=after, lt=before))
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchFilter:
+  """Restrict a search to the issues matching every given criterion.
+
+  The criteria run inside the Qdrant query, against payload indexes, so a
+  filtered search still returns a full page of results. Apart from
+  ``updated_after`` and ``updated_before``, each criterion reads an optional
+  payload field, which must have been stored when indexing the repository.
+  Issues without the field never match.
+
+  Attributes:
+      state: Only issues in this state, "open" or "closed". Needs the "state"
+        payload field.
+      labels: Only issues with at least one of these labels. Needs the
+        "labels" payload field.
+      user: Only issues opened by this login. Needs the "user" payload field.
+      is_pull_request: Only pull requests if True, only issues if False.
+        Needs the "is_pull_request" payload field.
+      created_after: Only issues created at or after this time. Needs the
+        "created_at" payload field.
+      created_before: Only issues created before this time. Needs the
+        "created_at" payload field.
+      updated_after: Only issues last updated at or after this time.
+      updated_before: Only issues last updated before this time.
+      repositories: Only issues of these repositories, as "owner/name", or
+        "owner/*" for every repository of an owner. Only applies to
+        collections shared by several repositories.
+  """
+
+  state: str | None = None
+  labels: tuple[str, ...] = ()
+  user: str | None = None
+  is_pull_request: bool | None = None
+  created_after: datetime | None = None
+  created_before: datetime | None = None
+  updated_after: datetime | None = None
+  updated_before: datetime | None = None
+  repositories: tuple[str, ...] = ()
+
+  @classmethod
+  def from_dict(cls, values: dict[str, Any]) -> "SearchFilter":
+    """Build a filter from the output of :meth:`to_dict`."""
+    values = dict(values)
+    for field in dataclasses.fields(cls):
+      value = values.get(field.name)
+      if field.name.endswith(("_after", "_before")) and isinstance(value, str):
+        values[field.name] = datetime.fromisoformat(value)
+    values["labels"] = tuple(values.get("labels", ()))
+    values["repositories"] = tuple(values.get("repositories", ()))
+    return cls(**values)
+
+  def to_dict(self) -> dict[str, Any]:
+    """Return a JSON serialisable view of the criteria which are set."""
+    values = {}
+    for field in dataclasses.fields(self):
+      value = getattr(self, field.name)
+      if value is None or value == ():
+        continue
+      if isinstance(value, datetime):
+        value = value.isoformat()
+      values[field.name] = list(value) if isinstance(value, tuple) else value
+    return values
+
+  def to_qdrant_filter(self) -> Filter:
+    """Return the Qdrant filter of the criteria.
+
+    Issues without a description are always excluded.
+    """
+    conditions = [
+      FieldCondition(key=key, match=MatchValue(value=value))
+      for key, value in (
+        ("state", self.state),
+        ("user", self.user),
+        ("is_pull_request", self.is_pull_request),
+      )
+      if value is not None
+    ]
+    if self.labels:
+      conditions.append(
+        FieldCondition(key="labels", match=MatchAny(any=list(self.labels)))
+      )
+    for condition in (
+      _datetime_range("created_at", self.created_after, self.created_before),
+      _datetime_range("updated_at", self.updated_after, self.updated_before),
+    ):
+      if condition is not None:
+        conditions.append(condition)
+    if self.repositories:
+      conditions.append(self._tenant_filter())
+
+    return Filter(
+      must=conditions or None,
+      # Points stored before has_body existed lack it, so they are kept.
+      must_not=[FieldCondition(key="has_body", match=MatchValue(value=False))],
+    )
+
+  def _tenant_filter(self) -> Filter:
+    names = [name for name in self.repositories if not name.endswith("/*")]
+    owners = [
+      name.removesuffix("/*")
+      for name in self.repositories
+      if name.endswith("/*")
+    ]
+    tenants = []
+    if names:
+      tenants.append(
+        FieldCondition(key="repository", match=MatchAny(any=names))
+      )
+    if owners:
+      tenants.append(FieldCondition(key="owner", match=MatchAny(any=owners)))
+    return Filter(should=tenants)
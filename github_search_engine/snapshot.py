@@ -0,0 +1,337 @@
+"""Compact, memory-mapped snapshots of the index of a repository.
+
+A snapshot is a directory holding:
+
+- ``manifest.json``, the header: the format version, the number of points,
+  the layout of every array and the embedding model, written last so an
+  interrupted export is never mistaken for a snapshot.
+- ``ids.bin``, the point ids as little-endian int64.
+- ``<vector name>.bin`` for each dense vector, a contiguous row-major float32
+  matrix with one row per point.
+- ``<vector name>.indptr.bin``, ``.indices.bin`` and ``.values.bin`` for each
+  sparse vector, in compressed sparse row layout.
+- ``payloads.jsonl``, the payload table, one JSON object per point.
+- ``comments.ids.bin`` and ``comments.jsonl``, the stored comments.
+
+Arrays are read through memory maps, so importing a snapshot streams it into
+the database without first loading it into memory.
+"""
+
+import json
+import os
+from collections.abc import Iterator
+from collections.abc import Mapping
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import Record
+from qdrant_client.http.models import SparseVector
+
+
+SNAPSHOT_FORMAT = "github-search-engine-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+ID_DTYPE = np.dtype("<i8")
+VECTOR_DTYPE = np.dtype("<f4")
+SPARSE_INDEX_DTYPE = np.dtype("<u4")
+
+# Payload fields identifying the repository of a point in a shared
+# collection, which depend on where a snapshot is imported.
+TENANT_FIELDS = ("repository", "owner")
+
+
+def point_ids(records: Sequence[Record]) -> np.ndarray:
+  """Return the ids of some points as an array of ``ID_DTYPE``.
+
+  Raises:
+      ValueError: If a point is not keyed by an integer, as the issues indexed
+        by the first versions are keyed by UUID.
+  """
+  for record in records:
+    if not isinstance(record.id, int):
+      raise ValueError(
+        f"Point {record.id} is not keyed by an integer id. Migrate the "
+        "collection before exporting it."
+      )
+  return np.array([record.id for record in records], ID_DTYPE)
+
+
+class SnapshotWriter:
+  def __init__(
+    self,
+    path: str,
+    dense_vectors: Mapping[str, int],
+    sparse_vectors: Sequence[str] = (),
+  ):
+    """Write the points of a repository into a new snapshot directory.
+
+    Args:
+        path: The directory of the snapshot, which must not exist or be
+          empty.
+        dense_vectors: The dimension of each dense vector, by vector name.
+        sparse_vectors: The names of the sparse vectors. Default is none.
+
+    Raises:
+        ValueError: If the directory is not empty.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.listdir(path):
+      raise ValueError(f"{path} is not empty.")
+    self.path = path
+    self.dense_vectors = dict(dense_vectors)
+    self.sparse_vectors = list(sparse_vectors)
+    self.points = 0
+    self.comments = 0
+    self._sparse_offset = {name: 0 for name in self.sparse_vectors}
+    self._files = {}
+    for file_name in (
+      "ids.bin",
+      "payloads.jsonl",
+      "comments.ids.bin",
+      "comments.jsonl",
+      *(f"{name}.bin" for name in self.dense_vectors),
+      *(
+        f"{name}.{part}.bin"
+        for name in self.sparse_vectors
+        for part in ("indptr", "indices", "values")
+      ),
+    ):
+      # Closed by close().
+      self._files[file_name] = open(  # noqa: SIM115
+        os.path.join(path, file_name), "wb"
+      )
+    for name in self.sparse_vectors:
+      np.zeros(1, ID_DTYPE).tofile(self._files[f"{name}.indptr.bin"])
+
+  def add_points(self, records: Sequence[Record]):
+    """Append issues, with their vectors and payloads, to the snapshot."""
+    if not records:
+      return
+    point_ids(records).tofile(self._files["ids.bin"])
+    for name, dimension in self.dense_vectors.items():
+      vectors = np.array(
+        [record.vector[name] for record in records], VECTOR_DTYPE
+      )
+      if vectors.shape != (len(records), dimension):
+        raise ValueError(f"Vectors {name} are not of dimension {dimension}.")
+      vectors.tofile(self._files[f"{name}.bin"])
+    for name in self.sparse_vectors:
+      offsets = []
+      for record in records:
+        sparse_vector = record.vector[name]
+        np.array(sparse_vector.indices, SPARSE_INDEX_DTYPE).tofile(
+          self._files[f"{name}.indices.bin"]
+        )
+        np.array(sparse_vector.values, VECTOR_DTYPE).tofile(
+          self._files[f"{name}.values.bin"]
+        )
+        self._sparse_offset[name] += len(sparse_vector.indices)
+        offsets.append(self._sparse_offset[name])
+      np.array(offsets, ID_DTYPE).tofile(self._files[f"{name}.indptr.bin"])
+    self._write_payloads("payloads.jsonl", records)
+    self.points += len(records)
+
+  def add_comments(self, records: Sequence[Record]):
+    """Append stored comments to the snapshot."""
+    if not records:
+      return
+    point_ids(records).tofile(self._files["comments.ids.bin"])
+    self._write_payloads("comments.jsonl", records)
+    self.comments += len(records)
+
+  def _write_payloads(self, file_name: str, records: Sequence[Record]):
+    self._files[file_name].write(
+      b"".join(
+        json.dumps(
+          {
+            key: value
+            for key, value in record.payload.items()
+            if key not in TENANT_FIELDS
+          }
+        ).encode()
+        + b"\n"
+        for record in records
+      )
+    )
+
+  def close(self):
+    """Close the files, leaving the snapshot incomplete unless finished."""
+    for file in self._files.values():
+      file.close()
+
+  def finish(self, metadata: dict[str, Any]):
+    """Complete the snapshot by writing its manifest.
+
+    Args:
+        metadata: Information about the snapshot stored in the manifest, such
+          as the repository and the embedding model.
+    """
+    self.close()
+    manifest = {
+      "format": SNAPSHOT_FORMAT,
+      "version": SNAPSHOT_VERSION,
+      **metadata,
+      "points": self.points,
+      "comments": self.comments,
+      "id_dtype": ID_DTYPE.str,
+      "dense_vectors": {
+        name: {"dimension": dimension, "dtype": VECTOR_DTYPE.str}
+        for name, dimension in self.dense_vectors.items()
+      },
+      "sparse_vectors": {
+        name: {
+          "non_zeros": self._sparse_offset[name],
+          "index_dtype": SPARSE_INDEX_DTYPE.str,
+          "dtype": VECTOR_DTYPE.str,
+        }
+        for name in self.sparse_vectors
+      },
+    }
+    with open(os.path.join(self.path, MANIFEST_FILE), "w") as file:
+      json.dump(manifest, file, indent=2)
+
+
+class Snapshot:
+  def __init__(self, path: str):
+    """Read a snapshot written by :class:`SnapshotWriter`.
+
+    Args:
+        path: The directory of the snapshot.
+
+    Raises:
+        ValueError: If the directory holds no snapshot, or a snapshot of
+          another version.
+    """
+    self.path = path
+    try:
+      with open(os.path.join(path, MANIFEST_FILE)) as file:
+        self.manifest = json.load(file)
+    except (OSError, ValueError):
+      raise ValueError(f"{path} is not a complete snapshot.") from None
+    if self.manifest.get("format") != SNAPSHOT_FORMAT:
+      raise ValueError(f"{path} is not a snapshot.")
+    if self.manifest.get("version") != SNAPSHOT_VERSION:
+      raise ValueError(
+        f"{path} is a version {self.manifest.get('version')} snapshot, only "
+        f"version {SNAPSHOT_VERSION} is supported."
+      )
+
+  @property
+  def repository(self) -> str:
+    """The full name of the repository of the snapshot."""
+    return self.manifest["repository"]
+
+  @property
+  def dense_vectors(self) -> dict[str, int]:
+    """The dimension of each dense vector, by vector name."""
+    return {
+      name: layout["dimension"]
+      for name, layout in self.manifest["dense_vectors"].items()
+    }
+
+  @property
+  def sparse_vectors(self) -> list[str]:
+    """The names of the sparse vectors."""
+    return list(self.manifest["sparse_vectors"])
+
+  def _array(
+    self, file_name: str, dtype: str, shape: tuple[int, ...]
+  ) -> np.ndarray:
+    if 0 in shape:
+      # Empty files cannot be memory mapped.
+      return np.empty(shape, dtype)
+    return np.memmap(
+      os.path.join(self.path, file_name), dtype=dtype, mode="r", shape=shape
+    )
+
+  def _payloads(self, file_name: str) -> Iterator[dict[str, Any]]:
+    with open(os.path.join(self.path, file_name), "rb") as file:
+      for line in file:
+        yield json.loads(line)
+
+  def iter_points(
+    self, batch_size: int = 256, extra_payload: dict[str, Any] | None = None
+  ) -> Iterator[list[PointStruct]]:
+    """Read the issues of the snapshot in batches.
+
+    Args:
+        batch_size: The number of points per batch. Default is 256.
+        extra_payload: Fields added to the payload of every point, such as
+          the tenant of a shared collection. Default is None.
+
+    Yields:
+        The points of a batch, with every vector stored in the snapshot.
+    """
+    count = self.manifest["points"]
+    ids = self._array("ids.bin", self.manifest["id_dtype"], (count,))
+    dense_vectors = {
+      name: self._array(
+        f"{name}.bin", layout["dtype"], (count, layout["dimension"])
+      )
+      for name, layout in self.manifest["dense_vectors"].items()
+    }
+    sparse_vectors = {
+      name: (
+        self._array(
+          f"{name}.indptr.bin", self.manifest["id_dtype"], (count + 1,)
+        ),
+        self._array(
+          f"{name}.indices.bin", layout["index_dtype"], (layout["non_zeros"],)
+        ),
+        self._array(
+          f"{name}.values.bin", layout["dtype"], (layout["non_zeros"],)
+        ),
+      )
+      for name, layout in self.manifest["sparse_vectors"].items()
+    }
+    payloads = self._payloads("payloads.jsonl")
+    for start in range(0, count, batch_size):
+      stop = min(start + batch_size, count)
+      vectors = [{} for _ in range(start, stop)]
+      for name, matrix in dense_vectors.items():
+        for vector, row in zip(vectors, matrix[start:stop].tolist()):
+          vector[name] = row
+      for name, (indptr, indices, values) in sparse_vectors.items():
+        for vector, index in zip(vectors, range(start, stop)):
+          begin, end = indptr[index], indptr[index + 1]
+          vector[name] = SparseVector(
+            indices=indices[begin:end].tolist(),
+            values=values[begin:end].tolist(),
+          )
+      yield [
+        PointStruct(
+          id=point_id,
+          vector=vector,
+          payload={**next(payloads), **(extra_payload or {})},
+        )
+        for point_id, vector in zip(ids[start:stop].tolist(), vectors)
+      ]
+
+  def iter_comments(
+    self, batch_size: int = 256, extra_payload: dict[str, Any] | None = None
+  ) -> Iterator[list[PointStruct]]:
+    """Read the comments of the snapshot in batches.
+
+    Args:
+        batch_size: The number of comments per batch. Default is 256.
+        extra_payload: Fields added to the payload of every comment. Default
+          is None.
+
+    Yields:
+        The payload-only points of a batch of comments.
+    """
+    count = self.manifest["comments"]
+    ids = self._array("comments.ids.bin", self.manifest["id_dtype"], (count,))
+    payloads = self._payloads("comments.jsonl")
+    for start in range(0, count, batch_size):
+      yield [
+        PointStruct(
+          id=point_id,
+          vector={},
+          payload={**next(payloads), **(extra_payload or {})},
+        )
+        for point_id in ids[start : start + batch_size].tolist()
+      ]
@@ -0,0 +1,115 @@
+import collections
+import re
+import zlib
+from collections.abc import Sequence
+
+from qdrant_client.http.models import Modifier
+from qdrant_client.http.models import SparseVector
+from qdrant_client.http.models import SparseVectorParams
+
+from github_search_engine import metrics
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Function words, which are in almost every issue. Qdrant weighs them down
+# by their inverse document frequency, but never to zero, so a query made
+# of them would still match every document.
+STOPWORDS = frozenset(
+  """
+  a about above after again against all am an and any are as at be because
+  been before being below between both but by can could d did do does doing
+  don down during each few for from further had has have having he her here
+  hers herself him himself his how i if in into is it its itself just ll m
+  me more most my myself no nor not now of off on once only or other our
+  ours ourselves out over own re s same she should so some such t than that
+  the their theirs them themselves then there these they this those through
+  to too under until up ve very was we were what when where which while who
+  whom why will with would you your yours yourself yourselves
+  """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+  """Split a text into lowercase word tokens.
+
+  Punctuation separates tokens, so ``KeyError: 'id'`` gives ``keyerror`` and
+  ``id``, and ``np.frombuffer`` gives ``np`` and ``frombuffer``.
+  """
+  return TOKEN_PATTERN.findall(text.lower())
+
+
+def token_id(token: str) -> int:
+  """Return the stable sparse vector index of a token."""
+  return zlib.crc32(token.encode())
+
+
+class SparseEncoder:
+  def __init__(
+    self,
+    k1: float = 1.2,
+    b: float = 0.75,
+    average_length: float = 256,
+  ):
+    """A BM25 encoder of sparse vectors, computed without any model.
+
+    Documents are encoded into the BM25 term frequency of each token, and
+    queries into the set of their tokens. Qdrant multiplies the matching
+    terms by their inverse document frequency in the collection, which
+    together gives the BM25 score of a document for a query.
+
+    Args:
+        k1: The term frequency saturation of BM25. Default is 1.2.
+        b: How much BM25 normalises by document length. Default is 0.75.
+        average_length: The expected average number of tokens of a
+          document. Default is 256.
+    """
+    self.k1 = k1
+    self.b = b
+    self.average_length = average_length
+
+  @property
+  def vector_name(self) -> str:
+    """The name of the sparse vector field holding the encodings."""
+    return "bm25"
+
+  @property
+  def vector_params(self) -> SparseVectorParams:
+    """The configuration of the sparse vector field."""
+    return SparseVectorParams(modifier=Modifier.IDF)
+
+  def _encode_document(self, document: str) -> SparseVector:
+    tokens = tokenize(document)
+    length_norm = self.k1 * (
+      1 - self.b + self.b * len(tokens) / self.average_length
+    )
+    term_frequencies = collections.Counter(map(token_id, tokens))
+    return SparseVector(
+      indices=list(term_frequencies),
+      values=[
+        frequency * (self.k1 + 1) / (frequency + length_norm)
+        for frequency in term_frequencies.values()
+      ],
+    )
+
+  def embed_documents(self, documents: Sequence[str]) -> list[SparseVector]:
+    """Encode documents to be stored in the vector database.
+
+    Args:
+        documents: The documents to encode.
+
+    Returns:
+        One sparse vector per document.
+    """
+    with metrics.stage("sparse_embed_documents"):
+      return [self._encode_document(document) for document in documents]
+
+  def embed_query(self, text: str) -> SparseVector:
+    """Encode a query to search the stored documents with.
+
+    Stopwords are dropped, so documents only match on the meaningful words
+    of the query.
+    """
+    indices = sorted(
+      {token_id(token) for token in tokenize(text) if token not in STOPWORDS}
+    )
+    return SparseVector(indices=indices, values=[1.0] * len(indices))
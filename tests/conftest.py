@@ -0,0 +1,36 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from github_search_engine import embedding
+from github_search_engine.sparse import tokenize
+
+
+class FakeTextEmbedding:
+  """A bag of words embedding, standing in for the ONNX model."""
+
+  dimension = 768
+
+  def __init__(self, model_name, threads=None):
+    self.model_name = model_name
+
+  def _embed(self, text):
+    vector = np.full(self.dimension, 0.01, dtype=np.float32)
+    for token in tokenize(text):
+      vector[zlib.crc32(token.encode()) % self.dimension] += 1
+    return vector / np.linalg.norm(vector)
+
+  def passage_embed(self, documents, batch_size=256):
+    for document in documents:
+      yield self._embed(document)
+
+  def query_embed(self, query, batch_size=256):
+    for text in [query] if isinstance(query, str) else query:
+      yield self._embed(text)
+
+
+@pytest.fixture
+def fake_embedding(monkeypatch):
+  """Embed with ``FakeTextEmbedding`` rather than the real model."""
+  monkeypatch.setattr(embedding, "_load_model", FakeTextEmbedding)
@@ -0,0 +1,55 @@
+import pytest
+
+
+# The API is an optional extra.
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from github_search_engine._api import api  # noqa: E402
+
+
+class RecordingSearchEngine:
+  def __init__(self):
+    self.searches = []
+    self.summaries = []
+
+  async def search_repositories(
+    self, repositories, text, search_filter=None, mode="dense"
+  ):
+    self.searches.append(repositories)
+    return ["result"]
+
+  async def summarise_results(self, results, owner, repository_name, query):
+    self.summaries.append((owner, repository_name))
+    return f"summary of {query}"
+
+
+@pytest.fixture
+def search_engine(monkeypatch):
+  search_engine = RecordingSearchEngine()
+  monkeypatch.setattr(api, "search_engine", search_engine)
+  return search_engine
+
+
+@pytest.mark.parametrize(
+  "repository, expected",
+  [
+    ("name", ("owner", "name")),
+    ("other-owner/name", ("other-owner", "name")),
+  ],
+)
+def test_search_summarises_the_searched_repository(
+  search_engine, repository, expected
+):
+  # The lifespan is not run, so no engine is built from the environment.
+  client = TestClient(api.api)
+  response = client.get(
+    "/search",
+    params={"owner": "owner", "repository": repository, "query": "crash"},
+  )
+
+  assert response.status_code == 200
+  assert response.json() == "summary of crash"
+  assert search_engine.searches == [["/".join(expected)]]
+  assert search_engine.summaries == [expected]
@@ -0,0 +1,41 @@
+import asyncio
+
+from benchmarks.fakes import FakeGithub
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine.clients.github_client_manager import (
+  GithubClientManager,
+)
+
+
+def test_fake_github_serves_the_synthetic_repository():
+  repository = SyntheticRepository(issues=150, mean_comments=2, seed=1)
+
+  async def fetch(github_client):
+    issues = [
+      issue
+      async for issue in github_client.iter_repository_issues(
+        repository.owner, repository.name
+      )
+    ]
+    updated_issues = [
+      issue
+      async for issue in github_client.iter_repository_issues(
+        repository.owner, repository.name, since=issues[99].updated_at
+      )
+    ]
+    comments = [
+      comment
+      async for comment in github_client.iter_repository_comments(
+        repository.owner, repository.name
+      )
+    ]
+    return issues, updated_issues, comments
+
+  with FakeGithub(repository) as github:
+    github_client = GithubClientManager("token", base_url=github.url)
+    issues, updated_issues, comments = asyncio.run(fetch(github_client))
+
+  assert [issue.number for issue in issues] == list(range(1, 151))
+  assert [issue.number for issue in updated_issues] == list(range(100, 151))
+  assert len(comments) == repository.comments
+  assert comments[-1].issue_url.endswith("/issues/150")
@@ -0,0 +1,55 @@
+import pytest
+from qdrant_client.http.models import BinaryQuantization
+from qdrant_client.http.models import Distance
+from qdrant_client.http.models import ScalarQuantization
+from qdrant_client.http.models import VectorParams
+
+from github_search_engine.collection_options import CollectionOptions
+
+
+VECTOR_PARAMS = VectorParams(size=4, distance=Distance.COSINE)
+
+
+def test_default_options_use_qdrant_defaults():
+  options = CollectionOptions()
+
+  assert options.create_collection_arguments("vector", VECTOR_PARAMS) == {
+    "vectors_config": {"vector": VECTOR_PARAMS},
+    "hnsw_config": None,
+    "quantization_config": None,
+    "on_disk_payload": None,
+  }
+  assert options.search_params() is None
+
+
+def test_quantized_on_disk_collection():
+  options = CollectionOptions(
+    quantization="scalar", on_disk_vectors=True, hnsw_m=32
+  )
+
+  arguments = options.create_collection_arguments("vector", VECTOR_PARAMS)
+
+  assert arguments["vectors_config"]["vector"].on_disk
+  assert isinstance(arguments["quantization_config"], ScalarQuantization)
+  assert arguments["hnsw_config"].m == 32
+  assert isinstance(
+    CollectionOptions(quantization="binary").create_collection_arguments(
+      "vector", VECTOR_PARAMS
+    )["quantization_config"],
+    BinaryQuantization,
+  )
+
+
+def test_search_params():
+  search_params = CollectionOptions(
+    search_ef=128, oversampling=2, rescore=False
+  ).search_params()
+
+  assert search_params.hnsw_ef == 128
+  assert search_params.quantization.oversampling == 2
+  assert not search_params.quantization.rescore
+
+
+def test_unknown_quantization():
+  with pytest.raises(ValueError, match="Unknown quantization"):
+    CollectionOptions(quantization="product")
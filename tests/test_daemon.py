@@ -0,0 +1,212 @@
+import asyncio
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from qdrant_client.fastembed_common import QueryResponse
+
+from github_search_engine.daemon.client import DaemonClient
+from github_search_engine.daemon.client import DaemonError
+from github_search_engine.daemon.server import SearchEngineDaemon
+from github_search_engine.search_filter import SearchFilter
+
+
+class FakeSearchEngine:
+  def __init__(self):
+    self.searches = []
+    self.indexed = []
+    self.release_indexing = threading.Event()
+
+  def load_models(self):
+    pass
+
+  def repository_exists(self, owner, repository_name):
+    return repository_name == "indexed"
+
+  def search_repositories(
+    self, repositories, text, search_filter=None, mode="dense"
+  ):
+    self.searches.append((repositories, text, search_filter, mode))
+    return ["result"] if text != "nothing" else []
+
+  def search_batch(
+    self, repositories, texts, search_filter=None, mode="dense"
+  ):
+    return [
+      [
+        QueryResponse(
+          id=1,
+          embedding=None,
+          sparse_embedding=None,
+          metadata={"number": 1},
+          document="",
+          score=0.5,
+        )
+      ]
+      if text != "nothing"
+      else []
+      for text in texts
+    ]
+
+  async def async_summarise_results(
+    self, results, owner, repository_name, query
+  ):
+    return f"summary of {query}"
+
+  async def index_repository(self, owner, repository_name, progress, **kwargs):
+    self.indexed.append(f"{owner}/{repository_name}")
+    while not self.release_indexing.is_set():
+      await asyncio.sleep(0.01)
+    progress.issues_upserted = 3
+
+
+@pytest.fixture
+def daemon(tmp_path):
+  search_engine = FakeSearchEngine()
+  socket_path = tmp_path / "daemon.sock"
+  daemon = SearchEngineDaemon(
+    search_engine, storage="/db", socket_path=str(socket_path)
+  )
+  loop = asyncio.new_event_loop()
+  thread = threading.Thread(target=loop.run_forever, daemon=True)
+  thread.start()
+  serving = asyncio.run_coroutine_threadsafe(daemon.serve_forever(), loop)
+
+  client = DaemonClient(str(socket_path))
+  deadline = time.monotonic() + 5
+  while client.ping() is None and time.monotonic() < deadline:
+    time.sleep(0.01)
+  yield client, search_engine
+
+  serving.cancel()
+  while socket_path.exists() and time.monotonic() < deadline + 5:
+    time.sleep(0.01)
+  loop.call_soon_threadsafe(loop.stop)
+  thread.join()
+  loop.close()
+  assert not socket_path.exists()
+
+
+def test_socket_is_only_accessible_to_its_owner(daemon):
+  client, _ = daemon
+
+  mode = os.stat(client.socket_path).st_mode
+  assert stat.S_IMODE(mode) == 0o600
+
+
+def test_forwards_searches_to_the_warm_engine(daemon):
+  client, search_engine = daemon
+
+  assert client.ping()["storage"] == "/db"
+  summary = client.request(
+    "search", owner="o", repository_name="indexed", query="crash"
+  )
+  assert summary == "summary of crash"
+  summary = client.request(
+    "search",
+    owner="o",
+    repository_name="indexed",
+    query="nothing",
+    search_filter={"state": "open", "labels": ["bug"]},
+    mode="sparse",
+  )
+  assert summary is None
+  # Searches of several repositories skip the check of a single repository.
+  summary = client.request(
+    "search",
+    owner="o",
+    repository_name="*",
+    query="crash",
+    repositories=["o/*", "other/indexed"],
+  )
+  assert summary == "summary of crash"
+  assert search_engine.searches == [
+    (["o/indexed"], "crash", SearchFilter(), "dense"),
+    (
+      ["o/indexed"],
+      "nothing",
+      SearchFilter(state="open", labels=("bug",)),
+      "sparse",
+    ),
+    (["o/*", "other/indexed"], "crash", SearchFilter(), "dense"),
+  ]
+
+
+def test_forwards_batches_of_searches(daemon):
+  client, _ = daemon
+
+  responses = client.request(
+    "search_batch",
+    repositories=["o/indexed"],
+    queries=["crash", "nothing"],
+    summarise=True,
+  )
+  assert responses == [
+    {
+      "query": "crash",
+      "results": [
+        {
+          "number": 1,
+          "title": None,
+          "html_url": None,
+          "updated_at": None,
+          "score": 0.5,
+        }
+      ],
+      "summary": "summary of crash",
+    },
+    {"query": "nothing", "results": [], "summary": None},
+  ]
+
+
+def test_searches_while_a_repository_is_indexed(daemon):
+  client, search_engine = daemon
+
+  responses = []
+
+  def index():
+    responses.append(
+      client.request("index", owner="o", repository_name="indexed")
+    )
+
+  threads = [threading.Thread(target=index) for _ in range(2)]
+  for thread in threads:
+    thread.start()
+  deadline = time.monotonic() + 5
+  while not search_engine.indexed and time.monotonic() < deadline:
+    time.sleep(0.01)
+
+  summary = client.request(
+    "search", timeout=5, owner="o", repository_name="indexed", query="crash"
+  )
+  assert summary == "summary of crash"
+  assert not responses
+
+  # Leave the second index request time to reach the daemon.
+  time.sleep(0.1)
+  search_engine.release_indexing.set()
+  for thread in threads:
+    thread.join()
+  # Both requests shared a single crawl of the repository.
+  assert search_engine.indexed == ["o/indexed"]
+  assert len(responses) == 2
+  assert responses[0] == responses[1]
+  assert responses[0]["issues_upserted"] == 3
+
+
+def test_reports_errors_to_the_client(daemon):
+  client, _ = daemon
+
+  with pytest.raises(DaemonError, match="Try indexing"):
+    client.request(
+      "search", owner="o", repository_name="missing", query="crash"
+    )
+  with pytest.raises(DaemonError, match="Unknown command"):
+    client.request("shutdown")
+
+
+def test_ping_without_daemon(tmp_path):
+  assert DaemonClient(str(tmp_path / "missing.sock")).ping() is None
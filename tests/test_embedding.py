@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+
+import pytest
+
+from github_search_engine import embedding
+from github_search_engine.embedding import EmbeddingModel
+from github_search_engine.embedding import EmbeddingOptions
+
+
+def test_embedding_options_size_index_batches():
+  assert EmbeddingModel().documents_per_round == 64
+  options = EmbeddingOptions(batch_size=16, parallel=4)
+  assert EmbeddingModel(options=options).documents_per_round == 16 * 4
+  assert EmbeddingOptions(parallel=0).processes == os.cpu_count()
+
+
+@pytest.mark.parametrize(
+  "arguments",
+  [{"batch_size": 0}, {"parallel": -1}, {"threads": 0}],
+)
+def test_embedding_options_reject_out_of_range_values(arguments):
+  with pytest.raises(ValueError):
+    EmbeddingOptions(**arguments)
+
+
+def test_worker_pool_embeds_like_the_calling_process(
+  fake_embedding, monkeypatch
+):
+  # Forked workers inherit the fake model, which a fresh interpreter would
+  # not.
+  monkeypatch.setattr(
+    embedding, "_pool_context", lambda: multiprocessing.get_context("fork")
+  )
+  documents = [f"crash number {number} in the parser" for number in range(7)]
+  expected = EmbeddingModel().embed_documents(documents)
+
+  model = EmbeddingModel(options=EmbeddingOptions(batch_size=2, parallel=2))
+  try:
+    assert model.embed_documents(documents) == expected
+    # Documents were embedded by the workers, not in this process.
+    assert model._model is None
+    assert model._executor is not None
+    # A single document is not worth a round trip to a worker.
+    assert model.embed_documents(documents[:1]) == expected[:1]
+  finally:
+    model.close()
+  assert model._executor is None
@@ -0,0 +1,66 @@
+import numpy as np
+
+from github_search_engine.caches.embedding_cache import EmbeddingCache
+from github_search_engine.embedding import EmbeddingModel
+
+
+class CountingModel:
+  def __init__(self):
+    self.documents = []
+
+  def passage_embed(self, documents, batch_size):
+    for document in documents:
+      self.documents.append(document)
+      yield np.full(3, len(document), dtype=np.float32)
+
+
+def test_embedding_cache_reuses_vectors_of_unchanged_text(tmp_path):
+  path = str(tmp_path / "embedding_cache.sqlite3")
+  embedding_model = EmbeddingModel(cache=EmbeddingCache(path))
+  embedding_model._model = model = CountingModel()
+
+  first = embedding_model.embed_documents(["a", "bb", "a"])
+  embedding_model.cache.close()
+
+  # A new cache reads the vectors stored by the previous one.
+  embedding_model.cache = EmbeddingCache(path)
+  second = embedding_model.embed_documents(["a ", "ccc", "bb"])
+
+  assert first == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+  assert second == [[1.0] * 3, [3.0] * 3, [2.0] * 3]
+  assert model.documents == ["a", "bb", "ccc"]
+  assert embedding_model.cache.hits == 2
+
+
+def test_embedding_cache_is_keyed_by_model_and_evicts_old_entries():
+  cache = EmbeddingCache(max_size=2)
+  assert cache.make_key("text", "a") != cache.make_key("text", "b")
+  assert cache.make_key("some  text\n", "a") == cache.make_key("some text", "a")
+
+  cache.set_many({"1": [1.0], "2": [2.0]})
+  cache.get_many(["1"])
+  cache.set_many({"3": [3.0]})
+
+  assert cache.size == 2
+  assert cache.get_many(["1", "2", "3"]) == {"1": [1.0], "3": [3.0]}
+
+
+def test_embedding_cache_counts_its_entries(tmp_path):
+  path = str(tmp_path / "embeddings.sqlite3")
+  cache = EmbeddingCache(path, max_size=3)
+  cache.set_many({"1": [1.0], "2": [2.0]})
+  # Replacing a vector does not count it twice.
+  cache.set_many({"2": [2.5]})
+  cache.set_many({"3": [3.0]})
+  assert cache.size == 3
+  cache.close()
+
+  cache = EmbeddingCache(path, max_size=3)
+  assert cache.size == 3
+  cache.set_many({"4": [4.0], "5": [5.0]})
+  assert cache.size == 3
+  assert cache.get_many(["1", "2", "3", "4", "5"]) == {
+    "3": [3.0],
+    "4": [4.0],
+    "5": [5.0],
+  }
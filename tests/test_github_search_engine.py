@@ -1,4 +1,632 @@
+import asyncio
+import re
+import time
+import uuid
+from datetime import datetime
+
 import pytest
+from githubkit.versions.v2022_11_28.models import Issue
+from githubkit.versions.v2022_11_28.models import IssueComment
+from qdrant_client.fastembed_common import QueryResponse
+from qdrant_client.http.models import PointStruct
+
+from benchmarks.fakes import FakeGithub
+from benchmarks.fakes import FakeOllama
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine.async_github_search_engine import (
+  AsyncGithubSearchEngine,
+)
+from github_search_engine.github_search_engine import GithubSearchEngine
+from github_search_engine.github_search_engine import PAYLOAD_SCHEMA_VERSION
+from github_search_engine.github_search_engine import IndexProgress
+from github_search_engine.github_search_engine import comment_payload
+from github_search_engine.github_search_engine import comments_collection_name
+from github_search_engine.github_search_engine import issue_payload
+from github_search_engine.github_search_engine import stream_batches
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.search_filter import tenant_payload
+
 
 def test_always_true():
     assert True
+
+
+async def numbers(count, fetched=None):
+  for number in range(count):
+    if fetched is not None:
+      fetched.append(number)
+    await asyncio.sleep(0)
+    yield number
+
+
+def test_stream_batches_stores_batches_in_order():
+  stored = []
+
+  async def store_slowly(batch):
+    await asyncio.sleep(0.01)
+    stored.append(batch)
+
+  count = asyncio.run(
+    stream_batches(
+      numbers(10),
+      store_slowly,
+      batch_size=3,
+      max_pending_batches=1,
+      description="numbers",
+    )
+  )
+
+  assert count == 10
+  assert stored == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+
+def test_stream_batches_stops_fetching_when_batches_pile_up():
+  fetched = []
+  stored = []
+
+  async def run():
+    release = asyncio.Event()
+
+    async def store_when_released(batch):
+      await release.wait()
+      stored.append(batch)
+
+    streaming = asyncio.create_task(
+      stream_batches(
+        numbers(100, fetched),
+        store_when_released,
+        batch_size=2,
+        max_pending_batches=2,
+        description="numbers",
+      )
+    )
+    for _ in range(100):
+      await asyncio.sleep(0)
+    # One batch being stored, two waiting, and one waiting to be queued.
+    fetched_while_blocked = len(fetched)
+    release.set()
+    return fetched_while_blocked, await streaming
+
+  fetched_while_blocked, count = asyncio.run(run())
+
+  assert fetched_while_blocked == 2 * (2 + 2)
+  assert count == 100
+  assert [number for batch in stored for number in batch] == list(range(100))
+
+
+def test_stream_batches_raises_the_error_of_the_consumer():
+  fetched = []
+
+  async def fail_on_second_batch(batch):
+    if batch[0] > 0:
+      raise RuntimeError("upsert failed")
+
+  with pytest.raises(RuntimeError, match="upsert failed"):
+    asyncio.run(
+      stream_batches(
+        numbers(100, fetched),
+        fail_on_second_batch,
+        batch_size=5,
+        max_pending_batches=1,
+        description="numbers",
+      )
+    )
+  # Fetching stopped with the consumer.
+  assert len(fetched) < 100
+
+
+async def count_points(search_engine, collection_name):
+  response = await search_engine._database_client.count(
+    collection_name, exact=True
+  )
+  return response.count
+
+
+def test_incremental_index_only_fetches_newer_issues(fake_embedding):
+  repository = SyntheticRepository(issues=30, mean_comments=2, seed=1)
+  full_name = f"{repository.owner}/{repository.name}"
+
+  async def index(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    await search_engine.index_repository(
+      repository.owner, repository.name, batch_size=8
+    )
+    first_comments = repository.comments
+    # Ten new issues are opened, and commented, after the first run.
+    github.repository = SyntheticRepository(
+      issues=40, mean_comments=2, seed=1
+    )
+    progress = IndexProgress()
+    await search_engine.index_repository(
+      repository.owner,
+      repository.name,
+      incremental=True,
+      batch_size=8,
+      progress=progress,
+    )
+    points = await count_points(search_engine, full_name)
+    comments = await count_points(
+      search_engine, comments_collection_name(full_name)
+    )
+    high_water_mark = await search_engine._get_high_water_mark(full_name)
+    await search_engine.close()
+    return first_comments, progress, points, comments, high_water_mark
+
+  with FakeGithub(repository) as github:
+    first_comments, progress, points, comments, high_water_mark = (
+      asyncio.run(index(github))
+    )
+
+  new_repository = github.repository
+  # GitHub includes the issues updated at the high-water mark itself.
+  assert progress.issues_fetched == 10 + 1
+  new_comments = new_repository.comments - first_comments
+  assert progress.comments_fetched == new_comments + 1
+  assert points == new_repository.issues
+  assert comments == new_repository.comments
+  assert high_water_mark == datetime.fromisoformat(
+    new_repository.issue("", 40)["updated_at"].replace("Z", "+00:00")
+  )
+
+
+class ConcurrencyTrackingOllama(FakeOllama):
+  def __init__(self, generation_seconds):
+    super().__init__()
+    self.generation_seconds = generation_seconds
+    self.generating = 0
+    self.max_generating = 0
+
+  def handle(self, method, path, query, body, headers):
+    with self._lock:
+      self.generating += 1
+      self.max_generating = max(self.max_generating, self.generating)
+    time.sleep(self.generation_seconds)
+    with self._lock:
+      self.generating -= 1
+    return super().handle(method, path, query, body, headers)
+
+
+def search_result(api_url, repository, number):
+  issue = Issue.model_validate(repository.issue(api_url, number))
+  return QueryResponse(
+    id=issue.id,
+    embedding=None,
+    sparse_embedding=None,
+    metadata=issue_payload(issue),
+    document="",
+    score=1.0,
+  )
+
+
+def test_summaries_keep_the_order_of_the_results(fake_embedding):
+  repository = SyntheticRepository(issues=10, mean_comments=2, seed=1)
+  order = [7, 2, 9, 4, 1, 6]
+
+  with FakeGithub(repository) as github, ConcurrencyTrackingOllama(
+    0.1
+  ) as ollama:
+    search_engine = GithubSearchEngine(
+      "token",
+      qdrant_location=":memory:",
+      github_base_url=github.url,
+      ollama_host=ollama.url,
+    )
+    try:
+      asyncio.run(
+        search_engine.index_repository(repository.owner, repository.name)
+      )
+      results = [
+        search_result(github.url, repository, number) for number in order
+      ]
+      summary = asyncio.run(
+        search_engine.async_summarise_results(
+          results,
+          repository.owner,
+          repository.name,
+          "crash",
+          max_concurrency=2,
+        )
+      )
+    finally:
+      search_engine.close()
+
+  assert [
+    int(number) for number in re.findall(r"Issue \[#(\d+)\]", summary)
+  ] == order
+  assert ollama.requests == len(order)
+  assert ollama.max_generating == 2
+
+
+def most_commented_issue(repository):
+  return max(
+    range(1, repository.issues + 1),
+    key=lambda number: len(repository.issue_comment_indexes(number)),
+  )
+
+
+def test_comments_are_stored_with_their_high_water_mark(fake_embedding):
+  repository = SyntheticRepository(issues=20, mean_comments=3, seed=2)
+  number = most_commented_issue(repository)
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    try:
+      await search_engine.index_repository(repository.owner, repository.name)
+      stored = await search_engine._get_stored_comments(
+        f"{repository.owner}/{repository.name}", number
+      )
+      high_water_mark = await search_engine._get_high_water_mark(
+        f"{repository.owner}/{repository.name}", field="comments_updated_at"
+      )
+    finally:
+      await search_engine.close()
+    return stored, high_water_mark
+
+  with FakeGithub(repository) as github:
+    stored, high_water_mark = asyncio.run(run(github))
+    expected = [
+      comment_payload(
+        IssueComment.model_validate(repository.comment(github.url, index))
+      )
+      for index in repository.issue_comment_indexes(number)
+    ]
+    last_comment = repository.comment(github.url, repository.comments - 1)
+
+  assert len(expected) > 1
+  assert stored == expected
+  assert high_water_mark == datetime.fromisoformat(last_comment["updated_at"])
+
+
+def test_summaries_fetch_comments_missing_from_the_index(fake_embedding):
+  repository = SyntheticRepository(issues=20, mean_comments=3, seed=2)
+  number = most_commented_issue(repository)
+
+  async def run(github, ollama):
+    search_engine = AsyncGithubSearchEngine(
+      "token",
+      qdrant_location=":memory:",
+      github_base_url=github.url,
+      ollama_host=ollama.url,
+    )
+    try:
+      await search_engine.index_repository(repository.owner, repository.name)
+      results = [search_result(github.url, repository, number)]
+
+      requests = github.requests
+      stored_summary = await search_engine.summarise_results(
+        results, repository.owner, repository.name, "crash"
+      )
+      assert github.requests == requests
+
+      # As for a repository indexed before comments were stored.
+      await search_engine._database_client.delete_collection(
+        comments_collection_name(f"{repository.owner}/{repository.name}")
+      )
+      assert (
+        await search_engine._get_stored_comments(
+          f"{repository.owner}/{repository.name}", number
+        )
+        is None
+      )
+      fetched_summary = await search_engine.summarise_results(
+        results, repository.owner, repository.name, "stack"
+      )
+      assert github.requests > requests
+    finally:
+      await search_engine.close()
+    return stored_summary, fetched_summary
+
+  with FakeGithub(repository) as github, FakeOllama() as ollama:
+    stored_summary, fetched_summary = asyncio.run(run(github, ollama))
+
+  # The canned summary gives the length of the prompt, which holds the same
+  # comments either way, and queries of the same length.
+  assert fetched_summary == stored_summary
+
+
+def issue_query(repository, number):
+  return TextNormalizer().issue_document(*repository.issue_text(number))
+
+
+def stored_comments(api_url, repository, number):
+  return [
+    comment_payload(
+      IssueComment.model_validate(repository.comment(api_url, index))
+    )
+    for index in repository.issue_comment_indexes(number)
+  ]
+
+
+def test_repositories_moved_into_a_shared_collection_are_searched_together(
+  fake_embedding, tmp_path
+):
+  alpha = SyntheticRepository(
+    owner="octo", name="alpha", issues=15, mean_comments=2, seed=3
+  )
+  beta = SyntheticRepository(
+    owner="octo",
+    name="beta",
+    issues=15,
+    mean_comments=2,
+    seed=4,
+    id_offset=1000,
+  )
+  alpha_number = most_commented_issue(alpha)
+  beta_number = most_commented_issue(beta)
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_path=str(tmp_path), github_base_url=github.url
+    )
+    try:
+      await search_engine.index_repository(alpha.owner, alpha.name)
+    finally:
+      await search_engine.close()
+
+    github.repository = beta
+    search_engine = AsyncGithubSearchEngine(
+      "token",
+      qdrant_path=str(tmp_path),
+      github_base_url=github.url,
+      shared_collection="issues",
+    )
+    try:
+      moved = await search_engine.move_to_shared_collection(
+        alpha.owner, alpha.name, delete=True
+      )
+      assert moved == alpha.issues
+      assert not await search_engine._database_client.collection_exists(
+        "octo/alpha"
+      )
+      await search_engine.index_repository(beta.owner, beta.name)
+
+      results = {
+        repository.name: await search_engine.search_repositories(
+          ["octo/*"], issue_query(repository, number)
+        )
+        for repository, number in ((alpha, alpha_number), (beta, beta_number))
+      }
+      only_alpha = await search_engine.search_repositories(
+        ["octo/alpha"], issue_query(beta, beta_number)
+      )
+      comments = {
+        repository.name: await search_engine._get_stored_comments(
+          f"octo/{repository.name}", number
+        )
+        for repository, number in ((alpha, alpha_number), (beta, beta_number))
+      }
+      high_water_marks = {
+        repository.name: (
+          await search_engine._get_high_water_mark(f"octo/{repository.name}"),
+          await search_engine._get_high_water_mark(
+            f"octo/{repository.name}", field="comments_updated_at"
+          ),
+        )
+        for repository in (alpha, beta)
+      }
+
+      # The moved repository resumes from its own high-water marks.
+      github.repository = alpha
+      progress = IndexProgress()
+      await search_engine.index_repository(
+        alpha.owner, alpha.name, incremental=True, progress=progress
+      )
+    finally:
+      await search_engine.close()
+    return results, only_alpha, comments, high_water_marks, progress
+
+  with FakeGithub(alpha) as github:
+    results, only_alpha, comments, high_water_marks, progress = asyncio.run(
+      run(github)
+    )
+    expected_comments = {
+      repository.name: [
+        {**comment, **tenant_payload(f"octo/{repository.name}")}
+        for comment in stored_comments(github.url, repository, number)
+      ]
+      for repository, number in ((alpha, alpha_number), (beta, beta_number))
+    }
+    last_updates = {
+      repository.name: (
+        repository.issue(github.url, repository.issues)["updated_at"],
+        repository.comment(github.url, repository.comments - 1)["updated_at"],
+      )
+      for repository in (alpha, beta)
+    }
+
+  for repository, number in ((alpha, alpha_number), (beta, beta_number)):
+    top_result = results[repository.name][0]
+    assert top_result.metadata["repository"] == f"octo/{repository.name}"
+    assert top_result.metadata["number"] == number
+  assert {result.metadata["repository"] for result in only_alpha} <= {
+    "octo/alpha"
+  }
+  assert len(expected_comments["alpha"]) > 1
+  assert comments == expected_comments
+  assert high_water_marks == {
+    name: tuple(datetime.fromisoformat(update) for update in updates)
+    for name, updates in last_updates.items()
+  }
+  assert progress.issues_fetched == 1
+  assert progress.comments_fetched == 1
+
+
+@pytest.mark.parametrize("mode", ["dense", "sparse", "hybrid"])
+def test_search_batch_matches_single_searches(fake_embedding, mode):
+  repository = SyntheticRepository(issues=20, mean_comments=0, seed=5)
+  queries = [issue_query(repository, number) for number in (3, 11, 17)]
+  queries.append("segfault in the worker pool")
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    try:
+      await search_engine.index_repository(repository.owner, repository.name)
+      repositories = [f"{repository.owner}/{repository.name}"]
+      batch = await search_engine.search_batch(
+        repositories, queries, mode=mode
+      )
+      single = [
+        await search_engine.search_repositories(
+          repositories, query, mode=mode
+        )
+        for query in queries
+      ]
+    finally:
+      await search_engine.close()
+    return batch, single
+
+  with FakeGithub(repository) as github:
+    batch, single = asyncio.run(run(github))
+
+  assert len(batch) == len(queries)
+  assert all(batch[:3])
+  for batch_results, single_results in zip(batch, single):
+    assert [result.id for result in batch_results] == [
+      result.id for result in single_results
+    ]
+    assert [result.score for result in batch_results] == pytest.approx(
+      [result.score for result in single_results]
+    )
+
+
+async def seed_baseline_collection(search_engine, api_url, repository, count):
+  """Store issues as the first versions did, through QdrantClient.add."""
+  embedding_model = search_engine._embedding_model
+  issues = [
+    Issue.model_validate(repository.issue(api_url, number))
+    for number in range(1, count + 1)
+  ]
+  documents = [f"{issue.title}\n\n{issue.body}" for issue in issues]
+  await search_engine._database_client.create_collection(
+    f"{repository.owner}/{repository.name}",
+    vectors_config={
+      embedding_model.vector_name: embedding_model.vector_params
+    },
+  )
+  await search_engine._database_client.upsert(
+    f"{repository.owner}/{repository.name}",
+    points=[
+      PointStruct(
+        id=str(uuid.uuid4()),
+        vector={embedding_model.vector_name: vector},
+        payload={"document": document, **issue.model_dump(mode="json")},
+      )
+      for issue, document, vector in zip(
+        issues, documents, embedding_model.embed_documents(documents)
+      )
+    ],
+  )
+
+
+async def stored_points(search_engine, collection_name):
+  records, _ = await search_engine._database_client.scroll(
+    collection_name, limit=1000
+  )
+  return records
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_index_replaces_the_uuid_points_of_baseline_collections(
+  fake_embedding, incremental
+):
+  repository = SyntheticRepository(issues=15, mean_comments=1, seed=6)
+  collection_name = f"{repository.owner}/{repository.name}"
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    try:
+      await seed_baseline_collection(search_engine, github.url, repository, 10)
+      await search_engine.index_repository(
+        repository.owner, repository.name, incremental=incremental
+      )
+      records = await stored_points(search_engine, collection_name)
+      results = await search_engine.search_repositories(
+        [collection_name], issue_query(repository, 4)
+      )
+    finally:
+      await search_engine.close()
+    return records, results
+
+  with FakeGithub(repository) as github:
+    records, results = asyncio.run(run(github))
+
+  assert sorted(record.id for record in records) == list(range(1, 16))
+  assert all(
+    record.payload["schema_version"] == PAYLOAD_SCHEMA_VERSION
+    for record in records
+  )
+  numbers = [result.metadata["number"] for result in results]
+  assert numbers[0] == 4
+  assert len(numbers) == len(set(numbers))
+
+
+def test_migration_rekeys_the_uuid_points_of_baseline_collections(
+  fake_embedding,
+):
+  repository = SyntheticRepository(issues=10, mean_comments=0, seed=6)
+  collection_name = f"{repository.owner}/{repository.name}"
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    try:
+      await seed_baseline_collection(search_engine, github.url, repository, 10)
+      baseline_records, _ = await search_engine._database_client.scroll(
+        collection_name, limit=100, with_vectors=True
+      )
+      vectors = {
+        record.payload["id"]: record.vector for record in baseline_records
+      }
+      migrated = await search_engine.migrate_payloads(
+        repository.owner, repository.name, batch_size=4
+      )
+      records, _ = await search_engine._database_client.scroll(
+        collection_name, limit=100, with_vectors=True
+      )
+    finally:
+      await search_engine.close()
+    return vectors, migrated, records
+
+  with FakeGithub(repository) as github:
+    vectors, migrated, records = asyncio.run(run(github))
+
+  assert migrated == 10
+  assert sorted(record.id for record in records) == list(range(1, 11))
+  assert {record.id: record.vector for record in records} == vectors
+  assert all(
+    record.payload["schema_version"] == PAYLOAD_SCHEMA_VERSION
+    for record in records
+  )
+
+
+def test_export_rejects_baseline_collections(fake_embedding, tmp_path):
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=6)
+
+  async def run(github):
+    search_engine = AsyncGithubSearchEngine(
+      "token", qdrant_location=":memory:", github_base_url=github.url
+    )
+    try:
+      await seed_baseline_collection(search_engine, github.url, repository, 5)
+      with pytest.raises(ValueError, match="Run the migrate command"):
+        await search_engine.export_snapshot(
+          repository.owner, repository.name, str(tmp_path / "snapshot")
+        )
+      await search_engine.migrate_payloads(repository.owner, repository.name)
+      return await search_engine.export_snapshot(
+        repository.owner, repository.name, str(tmp_path / "snapshot")
+      )
+    finally:
+      await search_engine.close()
+
+  with FakeGithub(repository) as github:
+    assert asyncio.run(run(github)) == 5
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+from benchmarks.fakes import FakeGithub
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine.caches.http_cache import HttpCache
+from github_search_engine.clients.github_client_manager import (
+  GithubClientManager,
+)
+
+
+def test_http_cache_serves_not_modified_responses(tmp_path):
+  repository = SyntheticRepository(issues=150, mean_comments=2, seed=1)
+
+  async def fetch_issues(github_client):
+    return [
+      issue.number
+      async for issue in github_client.iter_repository_issues(
+        repository.owner, repository.name
+      )
+    ]
+
+  with FakeGithub(repository, rate_limit=100) as github:
+    path = str(tmp_path / "github_cache.sqlite3")
+    github_client = GithubClientManager(
+      "token", base_url=github.url, http_cache=HttpCache(path)
+    )
+    first_issues = asyncio.run(fetch_issues(github_client))
+    first_comments = github_client.get_issue_comments(
+      repository.owner, repository.name, 1
+    )
+    github_client.http_cache.close()
+    requests = github.requests
+
+    # A new client reads the responses cached by the previous one.
+    github_client = GithubClientManager(
+      "token", base_url=github.url, http_cache=HttpCache(path)
+    )
+    second_issues = asyncio.run(fetch_issues(github_client))
+    second_comments = github_client.get_issue_comments(
+      repository.owner, repository.name, 1
+    )
+
+  assert second_issues == first_issues == list(range(1, 151))
+  assert second_comments == first_comments
+  assert github.not_modified_requests == github.requests - requests
+  assert github_client.http_cache.hit_rate == 1
+  # Not modified responses are not charged to the rate limit.
+  assert github_client.rate_limit()["remaining"] == 100 - requests
+
+
+def test_http_cache_evicts_least_recently_used_responses():
+  repository = SyntheticRepository(issues=5, mean_comments=2, seed=1)
+
+  with FakeGithub(repository) as github:
+    github_client = GithubClientManager(
+      "token", base_url=github.url, http_cache=HttpCache(max_size=8000)
+    )
+    # Each response takes a few kilobytes, so the first ones are evicted.
+    for issue_number in (1, 2, 3, 4, 5, 5, 1):
+      github_client.get_issue_comments(
+        repository.owner, repository.name, issue_number
+      )
+
+  http_cache = github_client.http_cache
+  assert 0 < http_cache.size <= 8000
+  assert http_cache.hits == 1
+  assert github.not_modified_requests == 1
+
+
+class ThreadRecordingHttpCache(HttpCache):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.threads = set()
+
+  def prepare(self, request):
+    self.threads.add(threading.get_ident())
+    return super().prepare(request)
+
+  def process(self, key, request, response):
+    self.threads.add(threading.get_ident())
+    return super().process(key, request, response)
+
+
+def test_async_requests_use_the_cache_off_the_event_loop(tmp_path):
+  repository = SyntheticRepository(issues=5, mean_comments=2, seed=1)
+
+  async def fetch_twice(github_client):
+    for _ in range(2):
+      await github_client.async_get_issue_comments(
+        owner=repository.owner, repository_name=repository.name, issue_number=1
+      )
+    return threading.get_ident()
+
+  with FakeGithub(repository) as github:
+    http_cache = ThreadRecordingHttpCache(str(tmp_path / "cache.sqlite3"))
+    github_client = GithubClientManager(
+      "token", base_url=github.url, http_cache=http_cache
+    )
+    loop_thread = asyncio.run(fetch_twice(github_client))
+
+  # The second fetch is answered from the cache.
+  assert http_cache.hits == http_cache.misses > 0
+  assert http_cache.threads
+  assert loop_thread not in http_cache.threads
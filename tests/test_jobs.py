@@ -0,0 +1,139 @@
+import asyncio
+
+from github_search_engine._api.jobs import IndexJobScheduler
+from github_search_engine._api.jobs import JobStatus
+
+
+class BlockingSearchEngine:
+  def __init__(self):
+    self.release = asyncio.Event()
+    self.running = set()
+    self.max_running = 0
+    self.indexed = []
+
+  async def index_repository(self, owner, repository_name, **kwargs):
+    repository = f"{owner}/{repository_name}"
+    self.running.add(repository)
+    self.max_running = max(self.max_running, len(self.running))
+    try:
+      await self.release.wait()
+    finally:
+      self.running.discard(repository)
+    self.indexed.append(repository)
+
+
+def test_scheduler_returns_the_active_job_of_a_repository():
+  async def run():
+    search_engine = BlockingSearchEngine()
+    scheduler = IndexJobScheduler(search_engine)
+    job = scheduler.submit("owner", "repository")
+    assert scheduler.submit("owner", "repository", incremental=True) is job
+    other_job = scheduler.submit("owner", "other")
+    assert other_job is not job
+
+    search_engine.release.set()
+    await asyncio.gather(job.task, other_job.task)
+    assert job.status == JobStatus.SUCCEEDED
+    assert search_engine.indexed == ["owner/repository", "owner/other"]
+
+    # A finished repository is indexed again.
+    new_job = scheduler.submit("owner", "repository")
+    assert new_job is not job
+    await new_job.task
+    assert [job.id for job in scheduler.list_jobs()] == [
+      job.id,
+      other_job.id,
+      new_job.id,
+    ]
+    await scheduler.close()
+
+  asyncio.run(run())
+
+
+def test_scheduler_limits_the_jobs_running_at_once():
+  async def run():
+    search_engine = BlockingSearchEngine()
+    scheduler = IndexJobScheduler(search_engine, max_concurrent_jobs=2)
+    jobs = [scheduler.submit("owner", f"repository-{n}") for n in range(5)]
+    await asyncio.sleep(0.01)
+
+    assert [job.status for job in jobs] == [
+      JobStatus.RUNNING,
+      JobStatus.RUNNING,
+      JobStatus.QUEUED,
+      JobStatus.QUEUED,
+      JobStatus.QUEUED,
+    ]
+    search_engine.release.set()
+    await asyncio.gather(*(job.task for job in jobs))
+    assert search_engine.max_running == 2
+    assert all(job.status == JobStatus.SUCCEEDED for job in jobs)
+    await scheduler.close()
+
+  asyncio.run(run())
+
+
+def test_scheduler_cancels_queued_and_running_jobs():
+  async def run():
+    search_engine = BlockingSearchEngine()
+    scheduler = IndexJobScheduler(search_engine, max_concurrent_jobs=1)
+    running_job = scheduler.submit("owner", "running")
+    queued_job = scheduler.submit("owner", "queued")
+    await asyncio.sleep(0.01)
+    assert running_job.status == JobStatus.RUNNING
+
+    assert scheduler.cancel(queued_job.id) is queued_job
+    assert scheduler.cancel(running_job.id) is running_job
+    await asyncio.gather(running_job.task, queued_job.task)
+    assert running_job.status == JobStatus.CANCELLED
+    assert queued_job.status == JobStatus.CANCELLED
+    assert running_job.progress.finished_at is not None
+    assert search_engine.indexed == []
+    assert scheduler.cancel("unknown") is None
+
+    # The repository is no longer active once its job is cancelled, even
+    # before the job started.
+    unstarted_job = scheduler.submit("owner", "running")
+    assert unstarted_job is not running_job
+    scheduler.cancel(unstarted_job.id)
+    await asyncio.gather(unstarted_job.task, return_exceptions=True)
+    assert unstarted_job.status == JobStatus.CANCELLED
+    job = scheduler.submit("owner", "running")
+    assert job is not unstarted_job
+    search_engine.release.set()
+    await job.task
+    assert job.status == JobStatus.SUCCEEDED
+    await scheduler.close()
+
+  asyncio.run(run())
+
+
+def test_scheduler_forgets_the_oldest_finished_jobs():
+  async def run():
+    search_engine = BlockingSearchEngine()
+    search_engine.release.set()
+    scheduler = IndexJobScheduler(search_engine, max_finished_jobs=2)
+    jobs = []
+    for n in range(4):
+      jobs.append(scheduler.submit("owner", f"repository-{n}"))
+      await jobs[-1].task
+
+    # Jobs are forgotten on submission, so the newest one is not counted.
+    assert scheduler.get(jobs[0].id) is None
+    assert [job.id for job in scheduler.list_jobs()] == [
+      job.id for job in jobs[1:]
+    ]
+
+    search_engine.release.clear()
+    active_job = scheduler.submit("owner", "active")
+    assert scheduler.get(jobs[1].id) is None
+    assert scheduler.get(active_job.id) is active_job
+    assert [job.id for job in scheduler.list_jobs()] == [
+      jobs[2].id,
+      jobs[3].id,
+      active_job.id,
+    ]
+    await scheduler.close()
+    assert active_job.status == JobStatus.CANCELLED
+
+  asyncio.run(run())
@@ -0,0 +1,48 @@
+import asyncio
+
+from github_search_engine import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+  histogram = metrics.Histogram(
+    "test_seconds", "A test histogram.", ("stage",), buckets=(0.1, 1)
+  )
+  histogram.observe(0.05, stage="a")
+  histogram.observe(0.5, stage="a")
+  histogram.observe(5, stage="a")
+
+  assert histogram.render().splitlines() == [
+    "# HELP test_seconds A test histogram.",
+    "# TYPE test_seconds histogram",
+    'test_seconds_bucket{stage="a",le="0.1"} 1',
+    'test_seconds_bucket{stage="a",le="1.0"} 2',
+    'test_seconds_bucket{stage="a",le="+Inf"} 3',
+    'test_seconds_sum{stage="a"} 5.55',
+    'test_seconds_count{stage="a"} 3',
+  ]
+  assert histogram.count(stage="a") == 3
+  assert histogram.sum(stage="a") == 5.55
+
+
+def test_counter_escapes_label_values():
+  counter = metrics.Counter("test_total", "A test counter.", ("endpoint",))
+  counter.inc(endpoint='say "hi"')
+  counter.inc(2, endpoint='say "hi"')
+
+  assert counter.get(endpoint='say "hi"') == 3
+  assert 'test_total{endpoint="say \\"hi\\""} 3' in counter.render()
+
+
+def test_timed_records_functions_and_coroutines():
+  @metrics.timed("test_function")
+  def function():
+    return 1
+
+  @metrics.timed("test_coroutine")
+  async def coroutine():
+    return 2
+
+  assert function() == 1
+  assert asyncio.run(coroutine()) == 2
+  assert metrics.STAGE_SECONDS.count(stage="test_function") == 1
+  assert metrics.STAGE_SECONDS.count(stage="test_coroutine") == 1
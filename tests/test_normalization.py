@@ -0,0 +1,68 @@
+from github_search_engine.normalization import TextNormalizer
+from github_search_engine.normalization import count_tokens
+
+
+def test_normalize_strips_template_boilerplate():
+  body = (
+    "<!-- Please fill in every section. -->\n"
+    "### Describe the bug\n\n"
+    "Crash when saving   \n\n\n\n"
+    "![screenshot](data:image/png;base64,iVBORw0KGgo=)\n"
+    "### Additional context\n\n"
+    "_No response_\n"
+  )
+
+  assert TextNormalizer().normalize(body) == (
+    "### Describe the bug\n\nCrash when saving\n\n[image: screenshot]"
+  )
+
+
+def test_normalize_collapses_long_blocks_and_logs():
+  log = "\n".join(
+    f"2024-01-01 10:00:{second:02d} INFO step" for second in range(30)
+  )
+  code = "\n".join(f"line {number}" for number in range(20))
+  text = TextNormalizer(max_block_lines=4).normalize(
+    f"Before\n{log}\nAfter\n```\n{code}\n```"
+  )
+
+  lines = text.split("\n")
+  assert lines[:4] == [
+    "Before",
+    "2024-01-01 10:00:00 INFO step",
+    "2024-01-01 10:00:01 INFO step",
+    "... 26 lines omitted ...",
+  ]
+  assert "After" in lines
+  assert lines[-5:] == [
+    "line 1",
+    "... 16 lines omitted ...",
+    "line 18",
+    "line 19",
+    "```",
+  ]
+
+
+def test_issue_document_fits_the_token_budget():
+  text_normalizer = TextNormalizer(max_document_tokens=10)
+  document = text_normalizer.issue_document("Title", "word " * 100)
+
+  assert document.startswith("Title\n\nword")
+  assert count_tokens(document) <= 10 + 3
+  assert text_normalizer.issue_document("Title", None) == "Title"
+
+
+def test_prompt_comments_keep_the_most_reacted_then_newest_within_budget():
+  comments = [
+    {"body": "old " * 10, "created_at": "2024-01-01", "reactions": 0},
+    {"body": "popular " * 10, "created_at": "2024-01-02", "reactions": 5},
+    {"body": "middle " * 10, "created_at": "2024-01-03", "reactions": 0},
+    {"body": "new " * 10, "created_at": "2024-01-04", "reactions": 0},
+  ]
+  kept = TextNormalizer(max_comments_tokens=25).prompt_comments(comments)
+
+  assert [comment["created_at"] for comment in kept] == [
+    "2024-01-02",
+    "2024-01-04",
+  ]
+  assert len(TextNormalizer().prompt_comments(comments)) == 4
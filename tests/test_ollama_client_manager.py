@@ -0,0 +1,25 @@
+from benchmarks.fakes import FakeOllama
+from github_search_engine.clients.ollama_client_manager import (
+  OllamaClientManager,
+)
+from github_search_engine.clients.ollama_client_manager import context_size
+
+
+def test_context_size_rounds_prompts_up_to_a_bucket():
+  assert context_size("word " * 10, 512, 128_000) == (4096, 10)
+  assert context_size("word " * 5000, 512, 128_000) == (8192, 5000)
+  assert context_size("word " * 100_000, 512, 128_000) == (128_000, 100_000)
+  assert context_size("word " * 5000, 512, 6000) == (6000, 5000)
+
+
+def test_chat_asks_for_a_small_context_and_records_the_call():
+  with FakeOllama() as ollama:
+    ollama_client = OllamaClientManager(host=ollama.url)
+    ollama_client.chat("Summarise " + "word " * 20_000)
+
+  assert ollama.context_sizes == [32768]
+  [stats] = ollama_client.recent_calls
+  assert stats.call == "generate"
+  assert stats.context_size == 32768
+  assert stats.estimated_prompt_tokens == 20_001
+  assert stats.output_tokens == 16
@@ -0,0 +1,54 @@
+import pytest
+
+from github_search_engine.github_search_engine import PAYLOAD_SCHEMA_VERSION
+from github_search_engine.github_search_engine import compact_payload
+from github_search_engine.github_search_engine import migrate_payload_operation
+from github_search_engine.github_search_engine import validate_payload_fields
+
+
+def test_compact_payload_of_a_version_1_point():
+  payload = {
+    "document": "Crash on start\n\n",
+    "number": 7,
+    "title": "Crash on start",
+    "body": None,
+    "html_url": "https://github.com/o/r/issues/7",
+    "updated_at": "2024-01-02T03:04:05Z",
+    "user": {"login": "octocat", "id": 1},
+    "labels": [{"name": "bug", "color": "f29513"}, "crash"],
+    "reactions": {"total_count": 3, "+1": 3},
+    "pull_request": "<UNSET>",
+  }
+
+  assert compact_payload(
+    payload, ["labels", "user", "reactions", "is_pull_request"]
+  ) == {
+    "schema_version": PAYLOAD_SCHEMA_VERSION,
+    "number": 7,
+    "title": "Crash on start",
+    "body": "",
+    "has_body": False,
+    "html_url": "https://github.com/o/r/issues/7",
+    "updated_at": "2024-01-02T03:04:05+00:00",
+    "labels": ["bug", "crash"],
+    "user": "octocat",
+    "reactions": 3,
+    "is_pull_request": False,
+  }
+
+
+def test_unknown_payload_fields_are_rejected():
+  validate_payload_fields(["labels", "state"])
+  with pytest.raises(ValueError, match="Unknown payload fields: nope"):
+    validate_payload_fields(["labels", "nope"])
+
+
+def test_version_2_payloads_gain_has_body():
+  operation = migrate_payload_operation(
+    1, {"schema_version": 2, "body": "Details", "labels": ["bug"]}
+  )
+
+  assert operation.set_payload.payload == {
+    "schema_version": PAYLOAD_SCHEMA_VERSION,
+    "has_body": True,
+  }
@@ -0,0 +1,61 @@
+import pytest
+from githubkit import GitHub
+from githubkit.exception import RequestFailed
+
+from benchmarks.fakes import FakeGithub
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine.clients.request_scheduler import RequestScheduler
+
+
+def make_scheduler(github: FakeGithub, tokens: list[str], **kwargs):
+  clients = [
+    GitHub(auth=token, base_url=github.url, auto_retry=False)
+    for token in tokens
+  ]
+  return RequestScheduler(clients, **kwargs)
+
+
+def list_issues(scheduler: RequestScheduler, repository: SyntheticRepository):
+  return scheduler.schedule(
+    "list_repository_issues",
+    lambda client: client.rest.issues.list_for_repo,
+  )(owner=repository.owner, repo=repository.name, per_page=1)
+
+
+def test_request_scheduler_shares_requests_between_tokens():
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=1)
+
+  with FakeGithub(repository, rate_limit=3) as github:
+    scheduler = make_scheduler(github, ["first", "second"])
+    for _ in range(6):
+      list_issues(scheduler, repository)
+
+  assert github.rate_limited_requests == 0
+  quota = scheduler.quota()
+  assert quota["remaining"] == 0
+  assert quota["limit"] == 6
+  assert [token["remaining"] for token in quota["tokens"]] == [0, 0]
+
+
+def test_request_scheduler_retries_server_errors():
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=1)
+
+  with FakeGithub(repository, error_rate=0.5, seed=3) as github:
+    scheduler = make_scheduler(
+      github, ["token"], max_retries=20, backoff=0.001
+    )
+    responses = [list_issues(scheduler, repository) for _ in range(10)]
+
+  assert github.failed_requests > 0
+  assert all(response.status_code == 200 for response in responses)
+
+
+def test_request_scheduler_gives_up_after_max_retries():
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=1)
+
+  with FakeGithub(repository, error_rate=1) as github:
+    scheduler = make_scheduler(github, ["token"], max_retries=2, backoff=0)
+    with pytest.raises(RequestFailed):
+      list_issues(scheduler, repository)
+
+  assert github.failed_requests == 3
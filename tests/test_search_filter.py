@@ -0,0 +1,83 @@
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+from qdrant_client.http.models import DatetimeRange
+from qdrant_client.http.models import FieldCondition
+from qdrant_client.http.models import Filter
+from qdrant_client.http.models import MatchAny
+from qdrant_client.http.models import MatchValue
+
+from github_search_engine.search_filter import SearchFilter
+from github_search_engine.search_filter import payload_indexes
+from github_search_engine.search_filter import validate_repositories
+
+
+HAS_NO_BODY = FieldCondition(key="has_body", match=MatchValue(value=False))
+
+
+def test_empty_filter_only_excludes_issues_without_body():
+  qdrant_filter = SearchFilter().to_qdrant_filter()
+
+  assert qdrant_filter.must is None
+  assert qdrant_filter.must_not == [HAS_NO_BODY]
+
+
+def test_filter_conditions():
+  created_after = datetime(2024, 1, 1, tzinfo=timezone.utc)
+  qdrant_filter = SearchFilter(
+    state="open",
+    labels=("bug", "crash"),
+    is_pull_request=False,
+    created_after=created_after,
+  ).to_qdrant_filter()
+
+  assert qdrant_filter.must == [
+    FieldCondition(key="state", match=MatchValue(value="open")),
+    FieldCondition(key="is_pull_request", match=MatchValue(value=False)),
+    FieldCondition(key="labels", match=MatchAny(any=["bug", "crash"])),
+    FieldCondition(key="created_at", range=DatetimeRange(gte=created_after)),
+  ]
+
+
+def test_filter_round_trips_through_json():
+  search_filter = SearchFilter(
+    labels=("bug",),
+    updated_before=datetime(2024, 1, 1, tzinfo=timezone.utc),
+  )
+
+  assert search_filter.to_dict() == {
+    "labels": ["bug"],
+    "updated_before": "2024-01-01T00:00:00+00:00",
+  }
+  assert SearchFilter.from_dict(search_filter.to_dict()) == search_filter
+
+
+def test_only_stored_fields_are_indexed():
+  assert set(payload_indexes(["labels", "reactions"])) == {
+    "has_body",
+    "updated_at",
+    "labels",
+  }
+
+
+def test_repositories_match_names_or_owners():
+  qdrant_filter = SearchFilter(
+    repositories=("a/one", "a/two", "b/*")
+  ).to_qdrant_filter()
+
+  assert qdrant_filter.must == [
+    Filter(
+      should=[
+        FieldCondition(key="repository", match=MatchAny(any=["a/one", "a/two"])),
+        FieldCondition(key="owner", match=MatchAny(any=["b"])),
+      ]
+    )
+  ]
+  assert "repository" in payload_indexes(shared=True)
+
+
+@pytest.mark.parametrize("repository", ["a", "a/", "/b", "a/b/c"])
+def test_invalid_repositories(repository):
+  with pytest.raises(ValueError, match="Invalid repository"):
+    validate_repositories(["a/b", repository])
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+from qdrant_client.http.models import Record
+from qdrant_client.http.models import SparseVector
+
+from github_search_engine.snapshot import Snapshot
+from github_search_engine.snapshot import SnapshotWriter
+
+
+def test_snapshot_round_trip(tmp_path):
+  rng = np.random.default_rng(0)
+  records = [
+    Record(
+      id=issue_id,
+      vector={
+        "dense": rng.random(4, dtype=np.float32).tolist(),
+        "sparse": SparseVector(
+          indices=list(range(issue_id % 3)),
+          values=[0.5] * (issue_id % 3),
+        ),
+      },
+      payload={"number": issue_id, "repository": "acme/one", "owner": "acme"},
+    )
+    for issue_id in range(1, 8)
+  ]
+  path = tmp_path / "snapshot"
+  writer = SnapshotWriter(str(path), {"dense": 4}, ["sparse"])
+  writer.add_points(records[:5])
+  writer.add_points(records[5:])
+  writer.finish({"repository": "acme/one"})
+
+  with pytest.raises(ValueError, match="not empty"):
+    SnapshotWriter(str(path), {"dense": 4})
+
+  snapshot = Snapshot(str(path))
+  assert snapshot.repository == "acme/one"
+  assert snapshot.dense_vectors == {"dense": 4}
+  batches = list(snapshot.iter_points(batch_size=3, extra_payload={"x": 1}))
+  assert [len(batch) for batch in batches] == [3, 3, 1]
+  points = [point for batch in batches for point in batch]
+  for record, point in zip(records, points):
+    assert point.id == record.id
+    assert point.vector["dense"] == pytest.approx(record.vector["dense"])
+    assert point.vector["sparse"] == record.vector["sparse"]
+    # Tenant fields are replaced by those of the importing collection.
+    assert point.payload == {"number": record.id, "x": 1}
+  assert list(snapshot.iter_comments()) == []
+
+
+def test_snapshot_rejects_incomplete_and_unknown_versions(tmp_path):
+  writer = SnapshotWriter(str(tmp_path), {"dense": 4})
+  writer.close()
+  with pytest.raises(ValueError, match="not a complete snapshot"):
+    Snapshot(str(tmp_path))
+
+  manifest = {"format": "github-search-engine-snapshot", "version": 99}
+  (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+  with pytest.raises(ValueError, match="version 99"):
+    Snapshot(str(tmp_path))
+
+
+def test_snapshot_rejects_uuid_point_ids(tmp_path):
+  writer = SnapshotWriter(str(tmp_path), {"dense": 2})
+  record = Record(
+    id="0b7c6a4e-6f3c-4d4c-9d5e-2b1f0c8a9e77",
+    vector={"dense": [0.5, 0.5]},
+    payload={"number": 1},
+  )
+  with pytest.raises(ValueError, match="not keyed by an integer id"):
+    writer.add_points([record])
+  with pytest.raises(ValueError, match="not keyed by an integer id"):
+    writer.add_comments([record])
+  writer.close()
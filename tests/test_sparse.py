@@ -0,0 +1,42 @@
+from github_search_engine.sparse import SparseEncoder
+from github_search_engine.sparse import token_id
+from github_search_engine.sparse import tokenize
+
+
+def test_tokenize_splits_identifiers_and_errors():
+  assert tokenize("KeyError: 'id' in np.frombuffer") == [
+    "keyerror",
+    "id",
+    "in",
+    "np",
+    "frombuffer",
+  ]
+
+
+def test_repeated_terms_saturate():
+  encoder = SparseEncoder()
+
+  vector = encoder.embed_documents(["crash crash crash hang"])[0]
+  weights = dict(zip(vector.indices, vector.values))
+
+  assert weights[token_id("hang")] < weights[token_id("crash")]
+  assert weights[token_id("crash")] < 3 * weights[token_id("hang")]
+  assert weights[token_id("crash")] < encoder.k1 + 1
+
+
+def test_query_weighs_each_token_once():
+  vector = SparseEncoder().embed_query("Crash startup crash")
+
+  assert sorted(vector.indices) == sorted(
+    {token_id("crash"), token_id("startup")}
+  )
+  assert vector.values == [1.0, 1.0]
+
+
+def test_query_drops_stopwords():
+  vector = SparseEncoder().embed_query("Why does it crash on the startup?")
+
+  assert sorted(vector.indices) == sorted(
+    {token_id("crash"), token_id("startup")}
+  )
+  assert SparseEncoder().embed_query("how do I do this").indices == []
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from github_search_engine.caches.summary_cache import SummaryCache
+
+
+def test_key_ignores_query_case_and_whitespace():
+  key = SummaryCache.make_key(1, "2024-01-01", "Can I use  async?", "m", "t")
+  assert key == SummaryCache.make_key(
+    1, "2024-01-01", " can i use async? ", "m", "t"
+  )
+  assert key != SummaryCache.make_key(
+    1, "2024-01-02", "can i use async?", "m", "t"
+  )
+
+
+def test_lru_eviction_and_counters():
+  cache = SummaryCache(max_size=2)
+  cache.set("a", "summary a")
+  cache.set("b", "summary b")
+  assert cache.get("a") == "summary a"
+  cache.set("c", "summary c")
+
+  assert cache.get("b") is None
+  assert cache.get("c") == "summary c"
+  assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+  path = str(tmp_path / "summaries.sqlite3")
+  cache = SummaryCache(path=path)
+  cache.set("a", "summary a")
+  cache.close()
+
+  assert SummaryCache(path=path).get("a") == "summary a"
+
+
+def test_expired_entries_are_missing():
+  cache = SummaryCache(ttl=-1)
+  cache.set("a", "summary a")
+  assert cache.get("a") is None
+
+
+class ThreadRecordingSummaryCache(SummaryCache):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.threads = set()
+
+  def get(self, key):
+    self.threads.add(threading.get_ident())
+    return super().get(key)
+
+  def set(self, key, summary):
+    self.threads.add(threading.get_ident())
+    super().set(key, summary)
+
+
+def test_async_methods_use_the_disk_tier_off_the_event_loop(tmp_path):
+  async def round_trip(cache):
+    await cache.async_set("a", "summary a")
+    return await cache.async_get("a"), threading.get_ident()
+
+  cache = ThreadRecordingSummaryCache(path=str(tmp_path / "summaries.sqlite3"))
+  summary, loop_thread = asyncio.run(round_trip(cache))
+  assert summary == "summary a"
+  assert cache.threads and loop_thread not in cache.threads
+
+  # Without a disk tier, nothing blocks and the loop answers itself.
+  cache = ThreadRecordingSummaryCache()
+  summary, loop_thread = asyncio.run(round_trip(cache))
+  assert summary == "summary a"
+  assert cache.threads == {loop_thread}
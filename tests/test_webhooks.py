@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import hmac
+
+from benchmarks.fakes import SyntheticRepository
+from github_search_engine._api.webhooks import WebhookQueue
+from github_search_engine._api.webhooks import verify_signature
+
+
+API_URL = "https://api.github.com"
+
+
+class RecordingSearchEngine:
+  def __init__(self):
+    self.updates = []
+    self.deletions = []
+
+  async def update_issue(self, owner, repository_name, issue_number, **kwargs):
+    self.updates.append((f"{owner}/{repository_name}", issue_number, kwargs))
+    return True
+
+  async def delete_issue(self, owner, repository_name, issue_number):
+    self.deletions.append((f"{owner}/{repository_name}", issue_number))
+    return True
+
+
+def test_verify_signature():
+  body = b'{"action": "opened"}'
+  digest = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+
+  assert verify_signature("secret", body, f"sha256={digest}")
+  assert not verify_signature("other", body, f"sha256={digest}")
+  assert not verify_signature("secret", body + b" ", f"sha256={digest}")
+  assert not verify_signature("secret", body, digest)
+  assert not verify_signature("secret", body, None)
+
+
+def test_webhook_queue_coalesces_the_events_of_an_issue():
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=1)
+  full_name = {"full_name": f"{repository.owner}/{repository.name}"}
+  search_engine = RecordingSearchEngine()
+
+  def comment_event(comment_id, action="created"):
+    comment = repository.comment(API_URL, 0)
+    comment["id"] = comment_id
+    comment["issue_url"] = (
+      f"{API_URL}/repos/{repository.owner}/{repository.name}/issues/2"
+    )
+    return {
+      "action": action,
+      "issue": repository.issue(API_URL, 2),
+      "comment": comment,
+      "repository": full_name,
+    }
+
+  async def deliver():
+    queue = WebhookQueue(search_engine, delay=0.05)
+    for comment_id in range(10):
+      assert queue.submit("issue_comment", comment_event(comment_id))
+    assert queue.submit("issue_comment", comment_event(3, action="deleted"))
+    assert queue.submit(
+      "issues",
+      {
+        "action": "deleted",
+        "issue": repository.issue(API_URL, 4),
+        "repository": full_name,
+      },
+    )
+    assert not queue.submit(
+      "pull_request",
+      {
+        "action": "synchronize",
+        "pull_request": {"number": 5},
+        "repository": full_name,
+      },
+    )
+    assert queue.pending == 2
+    await asyncio.sleep(0.2)
+    assert queue.pending == 0
+    await queue.close()
+
+  asyncio.run(deliver())
+
+  [(name, number, changes)] = search_engine.updates
+  assert (name, number) == (full_name["full_name"], 2)
+  assert changes["issue"].number == 2
+  assert [comment.id for comment in changes["comments"]] == [
+    0, 1, 2, 4, 5, 6, 7, 8, 9
+  ]
+  assert changes["deleted_comment_ids"] == [3]
+  assert search_engine.deletions == [(full_name["full_name"], 4)]
+
+
+class SlowSearchEngine:
+  def __init__(self):
+    self.calls = []
+    self.release = asyncio.Event()
+
+  async def update_issue(self, owner, repository_name, issue_number, **kwargs):
+    self.calls.append(("update started", issue_number))
+    await self.release.wait()
+    self.calls.append(("update finished", issue_number))
+    return True
+
+  async def delete_issue(self, owner, repository_name, issue_number):
+    self.calls.append(("delete", issue_number))
+    return True
+
+
+def test_webhook_queue_applies_the_updates_of_an_issue_in_order():
+  repository = SyntheticRepository(issues=5, mean_comments=0, seed=1)
+  full_name = {"full_name": f"{repository.owner}/{repository.name}"}
+  search_engine = SlowSearchEngine()
+
+  def issue_event(action):
+    return {
+      "action": action,
+      "issue": repository.issue(API_URL, 2),
+      "repository": full_name,
+    }
+
+  async def deliver():
+    queue = WebhookQueue(search_engine, delay=0.01)
+    queue.submit("issues", issue_event("edited"))
+    while not search_engine.calls:
+      await asyncio.sleep(0.01)
+
+    # Deleted while the edit is being applied.
+    queue.submit("issues", issue_event("deleted"))
+    await asyncio.sleep(0.1)
+    assert queue.pending == 0
+    assert search_engine.calls == [("update started", 2)]
+
+    search_engine.release.set()
+    await queue.close()
+
+  asyncio.run(deliver())
+
+  assert search_engine.calls == [
+    ("update started", 2),
+    ("update finished", 2),
+    ("delete", 2),
+  ]